@@ -1,7 +1,38 @@
 # src/__init__.py
+"""
+Пакет аналитики Olist.
+
+Подмодули загружаются лениво при первом обращении (src.gmv, src.rfm, ...),
+поэтому `import src` не тянет pandas, plotly, scipy и прочие тяжёлые библиотеки.
+"""
+
+import importlib
+
 __version__ = "0.1.0"
 __all__ = ['db_utils',
             'analyze_missing',
             'data_loader',
            'optimize_data_types',
-           'eda']  # Экспортируемые модули
\ No newline at end of file
+           'eda']  # Экспортируемые модули
+
+_SUBMODULES = {
+    'add_pk', 'analyze_missing', 'arpu', 'benchmarks', 'categorical_features',
+    'chains_validation', 'check_bd', 'cohort_plotly', 'cohorts', 'column_catalog', 'concentration',
+    'corr_features', 'data_loader', 'data_uploader', 'datetime_parsing', 'db_utils', 'dedup',
+    'drivers', 'duckdb_backend', 'export', 'funnel', 'gmv', 'imputation', 'instrumentation', 'ltv',
+    'marts', 'nps', 'numeric_features', 'optimize_data_types', 'outliers', 'pareto',
+    'plot_nps_analysis', 'plotly_config', 'plotly_utils', 'polars_pipeline', 'pretty_table',
+    'query_service', 'rfm', 'scatter_plotly', 'streaming', 'synthetic', 'time_features',
+}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        module = importlib.import_module(f'.{name}', __name__)
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES)
@@ -4,7 +4,10 @@ from sqlalchemy import text, inspect
 from sqlalchemy.engine import Engine
 from typing import Dict, List
 
+from .instrumentation import span, traced
 
+
+@traced('add_constraints_from_dicts')
 def add_constraints_from_dicts(engine: Engine, pk_dict: Dict[str, List[str]], 
                              fk_dict: Dict[str, Dict[str, str]]) -> None:
     """Добавляет первичные и внешние ключи в таблицы базы данных на основе словарей.
@@ -39,7 +42,8 @@ def add_constraints_from_dicts(engine: Engine, pk_dict: Dict[str, List[str]],
             pk_cols = ", ".join(pk_columns)
             sql = f'ALTER TABLE "{table}" ADD PRIMARY KEY ({pk_cols})'
             try:
-                conn.execute(text(sql))
+                with span('add_pk', table=table):
+                    conn.execute(text(sql))
                 print(f"✅ Добавлен PRIMARY KEY для {table}({pk_cols})")
             except Exception as e:
                 print(f"❌ [Ошибка PK] {table}: {e}")
@@ -67,7 +71,8 @@ def add_constraints_from_dicts(engine: Engine, pk_dict: Dict[str, List[str]],
                     REFERENCES "{ref_table}"({ref_column})
                 '''
                 try:
-                    conn.execute(text(sql))
+                    with span('add_fk', table=table, column=col):
+                        conn.execute(text(sql))
                     print(f"✅ Добавлен FK: {table}({col}) → {ref_table}({ref_column})")
                 except Exception as e:
                     print(f"❌ [Ошибка FK] {table}.{col} → {ref_table}.{ref_column}: {e}")
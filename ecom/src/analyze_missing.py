@@ -2,10 +2,6 @@
 
 import pandas as pd
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
-from scipy.stats import pointbiserialr
-import missingno as msno
 
 def analyze_missing(df, show_plot=True, return_df=True, corr_threshold=0.3, excluded_columns=None):
     """
@@ -19,16 +15,25 @@ def analyze_missing(df, show_plot=True, return_df=True, corr_threshold=0.3, excl
         excluded_columns: колонки для исключения
         
     Возвращает:
-        DataFrame с результатами (если return_df=True)
+        DataFrame с результатами (если return_df=True); в attrs['imputation_plan'] —
+        рекомендации в виде {колонка: {'action', 'missing_type', 'group_by'}}
+        для src.imputation
     """
+    from scipy.stats import pointbiserialr
+
     if excluded_columns is None:
         excluded_columns = []
         
     results = []
+    plan = {}
     na_matrix = df.isna()
     
     # Визуализация пропусков
     if show_plot and na_matrix.any().any():
+       # Графические библиотеки импортируются только при отрисовке
+       import matplotlib.pyplot as plt
+       import missingno as msno
+
        msno.matrix(
             df, filter="top", sort=None, figsize=(25, 10),
             color=(0.2, 0.5, 0.75), fontsize=16, labels=None, label_rotation=45, sparkline=False,
@@ -65,7 +70,7 @@ def analyze_missing(df, show_plot=True, return_df=True, corr_threshold=0.3, excl
                     corr = 0  # Для нечисловых колонок упрощаем
                 
                 if abs(corr) > corr_threshold:
-                    corr_features.append(f"{other_col} (r={corr:.2f})")
+                    corr_features.append((other_col, corr))
                     missing_type = "MAR"
             except:
                 continue
@@ -78,7 +83,11 @@ def analyze_missing(df, show_plot=True, return_df=True, corr_threshold=0.3, excl
                 missing_type = "MNAR"
         
         # Генерируем рекомендации
-        action, details = _get_recommendation(col, null_pct, dtype, missing_type, corr_features)
+        corr_features.sort(key=lambda item: -abs(item[1]))
+        action, details = _get_recommendation(
+            col, null_pct, dtype, missing_type, [f"{name} (r={corr:.2f})" for name, corr in corr_features])
+        plan[col] = {'action': action, 'missing_type': missing_type,
+                     'group_by': [name for name, _ in corr_features[:2]]}
         
         results.append({
             'Колонка': col,
@@ -94,7 +103,26 @@ def analyze_missing(df, show_plot=True, return_df=True, corr_threshold=0.3, excl
         return None
     
     # Вывод результатов в компактной таблице
-    return pd.DataFrame(results).sort_values(by='Пропуски', ascending=False) if return_df else None
+    if not return_df:
+        return None
+    result = pd.DataFrame(results).sort_values(by='Пропуски', ascending=False)
+    result.attrs['imputation_plan'] = plan
+    return result
+
+
+def _get_imputation_code(col, dtype, group_col=None):
+    """Строка кода pandas для заполнения колонки по группам связанного признака"""
+    stat = 'median' if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) else 'mode'
+    if group_col is None:
+        if stat == 'median':
+            return f"df['{col}'] = df['{col}'].fillna(df['{col}'].median())"
+        return f"df['{col}'] = df['{col}'].fillna(df['{col}'].mode().iloc[0])"
+    # Связанные признаки числовые (точечно-бисериальная корреляция) — группируем по децилям
+    groups = f"pd.qcut(df['{group_col}'], 10, duplicates='drop')"
+    if stat == 'median':
+        return f"df['{col}'] = df['{col}'].fillna(df.groupby({groups}, observed=True)['{col}'].transform('median'))"
+    return (f"df['{col}'] = df['{col}'].fillna(df.groupby({groups}, observed=True)['{col}']"
+            f".transform(lambda s: s.mode().iloc[0] if s.notna().any() else None))")
 
 def _get_recommendation(col, null_pct, dtype, missing_type, corr_features):
     """Генерирует рекомендации по обработке пропусков"""
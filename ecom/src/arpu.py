@@ -5,8 +5,10 @@ import plotly.graph_objects as go  # Интерактивные графики
 import plotly.io as pio  # Настройки рендеринга
 from plotly.subplots import make_subplots
 
+from .plotly_utils import finish_figure
 
-def plot_arpu_aov_dynamics(df_arpu, custom_palette):
+
+def plot_arpu_aov_dynamics(df_arpu, custom_palette, show=False, as_json=False):
     """
     Визуализирует динамику ARPU и AOV с помесячными приростами (MoM).
 
@@ -20,6 +22,16 @@ def plot_arpu_aov_dynamics(df_arpu, custom_palette):
 
     custom_palette : list
         Цветовая палитра для графиков (например: ['#636EFA', '#EF553B', '#00CC96', '#AB63FA'])
+
+    show : bool
+        Показать фигуру сразу (по умолчанию фигура только возвращается)
+
+    as_json : bool
+        Вернуть также компактный JSON фигуры
+
+    Возвращает:
+    -----------
+    go.Figure или (go.Figure, str)
     """
 
     # Расчёт приростов
@@ -90,4 +102,4 @@ def plot_arpu_aov_dynamics(df_arpu, custom_palette):
     fig.update_yaxes(title_text='ARPU / AOV (₽)', row=1, col=1)
     fig.update_yaxes(title_text='Прирост (%)', row=2, col=1)
 
-    fig.show()
+    return finish_figure(fig, show=show, as_json=as_json)
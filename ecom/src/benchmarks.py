@@ -0,0 +1,535 @@
+# src.benchmarks.py
+"""
+Замеры построения дашбордов и пайплайна на синтетических данных растущего размера.
+
+Каждый построитель вызывается с show=False, поэтому рендерер не нужен:
+меряется только построение фигуры, сериализация в JSON и размер HTML.
+Результаты сравниваются с сохранённым baseline, чтобы ловить регрессии.
+
+Пайплайн (загрузка CSV, оптимизация типов, проверка ключей, RFM, когорты,
+LTV, концентрация, воронка, NPS) меряется на синтетическом Olist
+(src.synthetic) в масштабе 1×, 10×, 100×; результаты дописываются в JSON lines
+с версией пакета и коммитом, чтобы сравнивать версии между собой.
+
+Запуск:
+    python -m src.benchmarks                 # замер и сравнение с baseline
+    python -m src.benchmarks --save-baseline # сохранить текущие замеры как baseline
+    python -m src.benchmarks --imports       # проверка бюджета времени импорта
+    python -m src.benchmarks --pipeline --scale 1 10   # пайплайн на синтетическом Olist
+    python -m src.benchmarks --compare       # сравнение записанных прогонов
+    python -m src.benchmarks --imputation    # заполнение пропусков на широких таблицах
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+
+from . import __version__
+from .arpu import plot_arpu_aov_dynamics
+from .chains_validation import validate_foreign_keys
+from .cohort_plotly import plot_cohort_analysis
+from .cohorts import CohortMatrix
+from .concentration import lorenz_curve
+from .data_loader import load_and_inspect
+from .funnel import conversion_curve, lead_lags
+from .gmv import plot_gmv_dynamics
+from .imputation import MissingImputer
+from .instrumentation import Tracer
+from .ltv import cohort_ltv, plot_cohort_ltv_analysis
+from .nps import NPSAggregator
+from .optimize_data_types import optimize_data_type
+from .pareto import plot_gmv_concentration
+from .plot_nps_analysis import plot_nps_analysis
+from .plotly_utils import benchmark_figure
+from .rfm import rfm_aggregate, score_rfm
+from .scatter_plotly import scatter_quadrant_plot
+from .synthetic import OLIST_FOREIGN_KEYS, STATES, choice, generate_olist, write_tables
+
+PALETTE = ['#636EFA', '#EF553B', '#00CC96', '#AB63FA']
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+BASELINE_PATH = 'benchmarks_baseline.json'
+RESULTS_PATH = 'benchmark_results.jsonl'
+PIPELINE_SCALES = (1,)
+IMPUTATION_WIDTHS = (10, 100, 500)
+
+# Импорт для пакетной загрузки данных не должен тянуть графику и статистику
+IMPORT_MODULES = ('src', 'src.data_uploader')
+IMPORT_BUDGET_S = 1.5
+
+
+# ----------------------------------------------------------------------
+# Синтетические данные: n — число точек основного ряда
+# ----------------------------------------------------------------------
+def _series_months(n):
+    return pd.date_range('2016-01-01', periods=n, freq='h')
+
+
+def synthetic_gmv(n, rng):
+    gmv = rng.lognormal(13, 0.3, n)
+    return pd.DataFrame({
+        'month': _series_months(n),
+        'gmv': gmv,
+        'gmv_mom_growth': (pd.Series(gmv).pct_change().fillna(0) * 100).round(2),
+    })
+
+
+def synthetic_arpu(n, rng):
+    return pd.DataFrame({
+        'month': _series_months(n),
+        'arpu': rng.normal(160, 15, n),
+        'aov': rng.normal(140, 10, n),
+    })
+
+
+def synthetic_nps(n, rng):
+    reviews = rng.integers(500, 5000, n)
+    promoters = (reviews * rng.uniform(0.5, 0.65, n)).astype(int)
+    detractors = (reviews * rng.uniform(0.1, 0.2, n)).astype(int)
+    return pd.DataFrame({
+        'month': _series_months(n),
+        'nps_proxy': (promoters - detractors) * 100 / reviews,
+        'response_rate': rng.uniform(90, 99, n),
+        'detractors': detractors,
+        'neutrals': reviews - promoters - detractors,
+        'promoters': promoters,
+    })
+
+
+def _cohort_grid(n):
+    """Когорты × месяцы жизни (треугольник) примерно на n ячеек."""
+    cohorts = max(int(np.sqrt(2 * n)), 2)
+    cohort_idx, lifetime = np.triu_indices(cohorts)
+    lifetime = lifetime - cohort_idx
+    months = pd.date_range('2000-01-01', periods=cohorts, freq='MS')
+    return months[cohort_idx], lifetime
+
+
+def synthetic_cohorts(n, rng):
+    cohort_month, lifetime = _cohort_grid(n)
+    return pd.DataFrame({
+        'cohort_month': cohort_month,
+        'lifetime_month': lifetime,
+        'cohort_size': 1000,
+        'retention_rate': np.where(lifetime == 0, 1.0, rng.uniform(0, 0.1, len(lifetime))),
+    })
+
+
+def synthetic_ltv(n, rng):
+    cohort_month, lifetime = _cohort_grid(n)
+    df = pd.DataFrame({'cohort_month': cohort_month, 'lifetime_month': lifetime,
+                       'revenue': rng.lognormal(8, 1, len(lifetime))})
+    df['cumulative_gmv'] = df.groupby('cohort_month')['revenue'].cumsum()
+    df['cumulative_ltv'] = df['cumulative_gmv'] / 100
+    return df
+
+
+def synthetic_concentration(n, rng):
+    return lorenz_curve(rng.pareto(1.2, n) * 1000, np.arange(n).astype(str))
+
+
+def synthetic_quadrant(n, rng):
+    return pd.DataFrame({
+        'x': rng.normal(0, 1, n),
+        'y': rng.normal(0, 1, n),
+        'category': rng.choice([f'cat_{i}' for i in range(70)], n),
+    })
+
+
+# Построитель: (генератор данных, вызов построителя)
+BUILDERS = {
+    'gmv': (synthetic_gmv, lambda df: plot_gmv_dynamics(df, PALETTE)),
+    'arpu': (synthetic_arpu, lambda df: plot_arpu_aov_dynamics(df, PALETTE)),
+    'nps': (synthetic_nps, lambda df: plot_nps_analysis(df)),
+    'cohorts': (synthetic_cohorts, lambda df: plot_cohort_analysis(df)),
+    'ltv': (synthetic_ltv, lambda df: plot_cohort_ltv_analysis(df, PALETTE)),
+    'pareto': (synthetic_concentration, lambda df: plot_gmv_concentration(df, PALETTE)),
+    'quadrant': (synthetic_quadrant, lambda df: scatter_quadrant_plot(df, 'x', 'y')),
+}
+
+
+def run_plot_benchmarks(sizes=DEFAULT_SIZES, builders=None, repeat=3, random_state=42, verbose=True):
+    """
+    Замеряет построители на данных размера sizes.
+
+    Возвращает:
+    -----------
+    pd.DataFrame: builder, n, build_s, to_json_s, html_bytes, points, traces
+    """
+    rng = np.random.default_rng(random_state)
+    rows = []
+    for name in builders or list(BUILDERS):
+        make_data, build = BUILDERS[name]
+        for n in sizes:
+            data = make_data(n, rng)
+            rows.append({'builder': name, 'n': n, **benchmark_figure(build, data, repeat=repeat)})
+
+    results = pd.DataFrame(rows)
+    if verbose:
+        print("\n⏱️ Построение фигур:")
+        print(tabulate(results, headers='keys', tablefmt='Pretty_Table', showindex=False))
+    return results
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    """Сохраняет замеры как baseline."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results.to_dict(orient='records'), f, ensure_ascii=False, indent=2)
+
+
+def check_regressions(results, path=BASELINE_PATH, time_tolerance=1.5, size_tolerance=1.1,
+                      min_time_s=0.05):
+    """
+    Сравнивает замеры с baseline.
+
+    Регрессия — время построения выросло больше чем в time_tolerance раз
+    (для замеров дольше min_time_s) или HTML вырос больше чем в size_tolerance раз.
+
+    Возвращает:
+    -----------
+    pd.DataFrame: строки с регрессиями (пустой, если их нет или baseline отсутствует)
+    """
+    if not os.path.exists(path):
+        print(f"⚠️ Baseline {path} не найден — сравнение пропущено")
+        return pd.DataFrame()
+
+    with open(path, encoding='utf-8') as f:
+        baseline = pd.DataFrame(json.load(f))
+    merged = results.merge(baseline, on=['builder', 'n'], suffixes=('', '_baseline'))
+    slow = (merged['build_s'] > merged['build_s_baseline'] * time_tolerance) & (merged['build_s'] > min_time_s)
+    large = merged['html_bytes'] > merged['html_bytes_baseline'] * size_tolerance
+    regressions = merged.loc[slow | large, ['builder', 'n', 'build_s', 'build_s_baseline',
+                                            'html_bytes', 'html_bytes_baseline']]
+    if regressions.empty:
+        print("✅ Регрессий нет")
+    else:
+        print("❌ Регрессии построения фигур:")
+        print(tabulate(regressions, headers='keys', tablefmt='Pretty_Table', showindex=False))
+    return regressions
+
+
+def measure_import_time(modules=IMPORT_MODULES, repeat=3):
+    """
+    Время холодного импорта модулей в отдельном процессе (лучшее из repeat).
+
+    Возвращает:
+    -----------
+    tuple: (секунды, список самых дорогих импортов из -X importtime)
+    """
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {', '.join(modules)}; "
+        "print(time.perf_counter() - start)"
+    )
+    best, report = None, None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=package_root,
+                              capture_output=True, text=True, check=True)
+        elapsed = float(proc.stdout.strip().splitlines()[-1])
+        if best is None or elapsed < best:
+            best, report = elapsed, proc.stderr
+    return best, _slowest_imports(report)
+
+
+def _slowest_imports(importtime_log, top=10):
+    """Разбирает вывод -X importtime: (модуль, кумулятивное время, с)."""
+    rows = []
+    for line in importtime_log.splitlines():
+        parts = line.split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        rows.append((parts[2].strip(), int(parts[1]) / 1e6))
+    return sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+
+
+def check_import_budget(budget_s=IMPORT_BUDGET_S, modules=IMPORT_MODULES):
+    """Проверяет, что импорт modules укладывается в budget_s секунд."""
+    elapsed, slowest = measure_import_time(modules)
+    if elapsed <= budget_s:
+        print(f"✅ Импорт {', '.join(modules)}: {elapsed:.3f} с (бюджет {budget_s} с)")
+        return True
+    print(f"❌ Импорт {', '.join(modules)}: {elapsed:.3f} с — бюджет {budget_s} с превышен")
+    print(tabulate(slowest, headers=['Модуль', 'Кумулятивно, с'], tablefmt='Pretty_Table'))
+    return False
+
+
+# ----------------------------------------------------------------------
+# Пайплайн на синтетическом Olist
+# ----------------------------------------------------------------------
+def _delivered_orders(tables):
+    """Доставленные заказы с customer_unique_id и суммой платежей (вход когорт и LTV)."""
+    orders = tables['orders']
+    orders = orders[orders['order_status'] == 'доставлен']
+    totals = tables['order_payments'].groupby('order_id', sort=False)['payment_value'].sum()
+    unique_id = tables['customers'].set_index('customer_id')['customer_unique_id']
+    return pd.DataFrame({
+        'customer_unique_id': orders['customer_id'].map(unique_id).to_numpy(),
+        'order_purchase_timestamp': orders['order_purchase_timestamp'].to_numpy(),
+        'payment_value': orders['order_id'].map(totals).fillna(0).to_numpy(),
+    })
+
+
+def _nps_rows(tables):
+    """Строки в формате NPS_REVIEWS_QUERY (заказ × отзыв × позиция)."""
+    orders = tables['orders']
+    orders = orders.loc[orders['order_status'] == 'доставлен',
+                        ['order_id', 'customer_id', 'order_purchase_timestamp']]
+    return (
+        orders
+        .merge(tables['order_reviews'][['order_id', 'review_id', 'review_score']], on='order_id', how='left')
+        .merge(tables['customers'][['customer_id', 'customer_state']], on='customer_id')
+        .merge(tables['order_items'][['order_id', 'seller_id', 'product_id']], on='order_id', how='left')
+        .merge(tables['products'][['product_id', 'category_name_translated']], on='product_id', how='left')
+        .sort_values(['order_purchase_timestamp', 'order_id'], ignore_index=True)
+    )
+
+
+def pipeline_steps(tables, folder):
+    """
+    Точки входа пакета, которые работают без БД: {имя: функция без аргументов}.
+
+    Подготовка входов (соединения таблиц) выполняется здесь и в замер не входит.
+    """
+    orders = _delivered_orders(tables)
+    nps_rows = _nps_rows(tables)
+    items = tables['order_items']
+    seller_gmv = items.groupby('seller_id', sort=False)['price'].sum()
+
+    def nps():
+        aggregator = NPSAggregator()
+        aggregator.update(nps_rows)
+        return aggregator.monthly()
+
+    def cohorts():
+        matrix = CohortMatrix()
+        matrix.update(orders)
+        return matrix.retention()
+
+    return {
+        'load_and_inspect': lambda: load_and_inspect(folder, verbose=False),
+        'optimize_data_type': lambda: optimize_data_type(tables),
+        'validate_foreign_keys': lambda: validate_foreign_keys(tables, OLIST_FOREIGN_KEYS, verbose=False),
+        'rfm': lambda: score_rfm(rfm_aggregate(tables['orders'], customers=tables['customers'],
+                                               payments=tables['order_payments'])),
+        'cohorts': cohorts,
+        'ltv': lambda: cohort_ltv(orders),
+        'concentration': lambda: lorenz_curve(seller_gmv.to_numpy(), seller_gmv.index.to_numpy()),
+        'funnel': lambda: conversion_curve(lead_lags(tables['marketing_qualified'], tables['closed_deals']),
+                                           by='origin'),
+        'nps': nps,
+    }
+
+
+def run_pipeline_benchmarks(scales=PIPELINE_SCALES, steps=None, repeat=1, random_state=42, verbose=True):
+    """
+    Замеряет точки входа пайплайна на синтетическом Olist каждого масштаба.
+
+    Параметры:
+    ----------
+    scales : tuple
+        Множители размера Olist (1, 10, 100)
+    steps : list, optional
+        Подмножество шагов pipeline_steps (по умолчанию — все)
+    repeat : int
+        Повторы; в результат идёт лучший по wall-времени
+
+    Возвращает:
+    -----------
+    pd.DataFrame: step, scale, rows (строк во всех таблицах), wall_s, cpu_s, rss_delta_bytes
+    """
+    rows = []
+    for scale in scales:
+        tables = generate_olist(scale, random_state=random_state)
+        n_rows = sum(len(df) for df in tables.values())
+        with tempfile.TemporaryDirectory() as folder:
+            write_tables(tables, folder)
+            available = pipeline_steps(tables, folder)
+            for name in steps or list(available):
+                best = None
+                for _ in range(repeat):
+                    tracer = Tracer()
+                    # Отчёты шагов в stdout не нужны — только время
+                    with contextlib.redirect_stdout(io.StringIO()), tracer.span(name, category='benchmark') as s:
+                        available[name]()
+                    if best is None or s.wall_s < best.wall_s:
+                        best = s
+                rows.append({'step': name, 'scale': scale, 'rows': n_rows, 'wall_s': round(best.wall_s, 4),
+                             'cpu_s': round(best.cpu_s, 4), 'rss_delta_bytes': best.rss_delta})
+
+    results = pd.DataFrame(rows)
+    if verbose:
+        print("\n⏱️ Пайплайн на синтетическом Olist:")
+        print(tabulate(results, headers='keys', tablefmt='Pretty_Table', showindex=False))
+    return results
+
+
+# ----------------------------------------------------------------------
+# Заполнение пропусков на широких таблицах
+# ----------------------------------------------------------------------
+def synthetic_wide(n_rows, n_cols, rng, null_share=0.1):
+    """
+    Широкая таблица: признаки группировки state и price, n_cols числовых колонок
+    с пропусками и план «Заполнить по группам» для каждой из них.
+    """
+    data = {
+        'state': choice(rng, STATES, n_rows),
+        'price': rng.gamma(2.0, 60.0, n_rows),
+    }
+    base = np.log1p(data['price'])
+    for i in range(n_cols):
+        values = base * rng.uniform(0.5, 2.0) + rng.normal(0, 1, n_rows)
+        values[rng.random(n_rows) < null_share] = np.nan
+        data[f'feature_{i}'] = values
+    plan = {f'feature_{i}': {'action': 'Заполнить по группам', 'missing_type': 'MAR',
+                             'group_by': ['state', 'price']} for i in range(n_cols)}
+    return pd.DataFrame(data), plan
+
+
+def _per_column_fill(df, plan, n_bins=10):
+    """Заполнение по колонке за раз (как в коде из рекомендаций analyze_missing) — точка сравнения."""
+    df = df.copy()
+    bins = pd.qcut(df['price'], n_bins, duplicates='drop')
+    for col in plan:
+        df[col] = df[col].fillna(df.groupby(['state', bins], observed=True)[col].transform('median'))
+        df[col] = df[col].fillna(df[col].median())
+    return df
+
+
+def run_imputation_benchmarks(widths=IMPUTATION_WIDTHS, n_rows=50_000, repeat=3, random_state=42, verbose=True):
+    """
+    Сравнивает MissingImputer (один groupby на набор групп) с заполнением по колонке.
+
+    Возвращает:
+    -----------
+    pd.DataFrame: width, rows, method, wall_s, cpu_s
+    """
+    rng = np.random.default_rng(random_state)
+    methods = {
+        'per_column': _per_column_fill,
+        'MissingImputer': lambda df, plan: MissingImputer(plan).fit_transform(df),
+    }
+    rows = []
+    for width in widths:
+        df, plan = synthetic_wide(n_rows, width, rng)
+        for method, fill in methods.items():
+            best = None
+            for _ in range(repeat):
+                tracer = Tracer()
+                with tracer.span(method, category='benchmark') as s:
+                    fill(df, plan)
+                if best is None or s.wall_s < best.wall_s:
+                    best = s
+            rows.append({'width': width, 'rows': n_rows, 'method': method,
+                         'wall_s': round(best.wall_s, 4), 'cpu_s': round(best.cpu_s, 4)})
+
+    results = pd.DataFrame(rows)
+    if verbose:
+        print("\n⏱️ Заполнение пропусков на широких таблицах:")
+        print(tabulate(results, headers='keys', tablefmt='Pretty_Table', showindex=False))
+    return results
+
+
+def _git_commit():
+    """Короткий хэш текущего коммита (None вне git-репозитория)."""
+    try:
+        proc = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        return proc.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def record_results(results, path=RESULTS_PATH, label=None):
+    """
+    Дописывает замеры в JSON lines с версией пакета, коммитом и окружением.
+
+    Параметры:
+    ----------
+    label : str, optional
+        Имя прогона (по умолчанию — версия@коммит)
+    """
+    commit = _git_commit()
+    meta = {
+        'run': label or f"{__version__}@{commit or 'nogit'}",
+        'version': __version__,
+        'commit': commit,
+        'recorded_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+    }
+    with open(path, 'a', encoding='utf-8') as f:
+        for row in results.to_dict(orient='records'):
+            f.write(json.dumps({**meta, **row}, ensure_ascii=False, default=str) + '\n')
+    return meta['run']
+
+
+def compare_results(path=RESULTS_PATH, metric='wall_s', runs=None):
+    """
+    Сравнивает записанные прогоны: шаг × масштаб по строкам, прогоны по колонкам.
+
+    Для повторных прогонов с одним именем берётся последний.
+
+    Возвращает:
+    -----------
+    pd.DataFrame (пустой, если файла нет)
+    """
+    if not os.path.exists(path):
+        print(f"⚠️ Файл замеров {path} не найден")
+        return pd.DataFrame()
+    records = pd.read_json(path, lines=True)
+    if runs is not None:
+        records = records[records['run'].isin(runs)]
+    order = records.drop_duplicates('run', keep='last')['run'].tolist()
+    table = (
+        records.drop_duplicates(['run', 'step', 'scale'], keep='last')
+        .pivot(index=['step', 'scale'], columns='run', values=metric)
+        .reindex(columns=order)
+    )
+    print(f"\n📊 {metric} по прогонам:")
+    print(tabulate(table.reset_index(), headers='keys', tablefmt='Pretty_Table', showindex=False))
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарки пакета")
+    parser.add_argument('--imports', action='store_true', help="проверка бюджета времени импорта")
+    parser.add_argument('--save-baseline', action='store_true', help="сохранить замеры фигур как baseline")
+    parser.add_argument('--pipeline', action='store_true', help="пайплайн на синтетическом Olist")
+    parser.add_argument('--scale', type=float, nargs='+', default=list(PIPELINE_SCALES))
+    parser.add_argument('--label', help="имя прогона в файле замеров")
+    parser.add_argument('--compare', action='store_true', help="сравнить записанные прогоны")
+    parser.add_argument('--imputation', action='store_true', help="заполнение пропусков на широких таблицах")
+    args = parser.parse_args()
+
+    if args.imports:
+        sys.exit(0 if check_import_budget() else 1)
+    if args.compare:
+        compare_results()
+        sys.exit(0)
+    if args.imputation:
+        run_imputation_benchmarks()
+        sys.exit(0)
+    if args.pipeline:
+        scales = [int(s) if float(s).is_integer() else s for s in args.scale]
+        run = record_results(run_pipeline_benchmarks(scales), label=args.label)
+        print(f"💾 Замеры записаны в {RESULTS_PATH} (прогон {run})")
+        sys.exit(0)
+
+    results = run_plot_benchmarks()
+    if args.save_baseline:
+        save_baseline(results)
+        print(f"💾 Baseline сохранён: {BASELINE_PATH}")
+    else:
+        sys.exit(1 if len(check_regressions(results)) else 0)
@@ -1,10 +1,10 @@
 #src.categorical_features.py
 
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from tabulate import tabulate
 
+from .column_catalog import column_catalog
+
 def analyze_categorical_features(
     df_dict,
     top_n=5,
@@ -20,6 +20,9 @@ def analyze_categorical_features(
     - Компактная таблица в grid-формате
     - Автоматические рекомендации
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     if exclude_tables is None:
         exclude_tables = []
     if exclude_columns is None:
@@ -31,11 +34,9 @@ def analyze_categorical_features(
         if table_name in exclude_tables:
             continue
 
-        # Выбор категориальных колонок
-        cat_cols = [
-            col for col in df.select_dtypes(include=['object', 'category', 'string']).columns
-            if (df[col].nunique() <= max_cardinality) and (col not in exclude_columns)
-        ]
+        # Выбор категориальных колонок (идентификаторы *_id не считаются категориями)
+        cat_cols = column_catalog(df).columns(
+            'text', 'category', max_cardinality=max_cardinality, exclude=exclude_columns)
 
         if not cat_cols:
             print(f"\n{'='*125}\nВ таблице {table_name.upper()} нет категориальных признаков\n")
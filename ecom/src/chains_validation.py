@@ -9,6 +9,9 @@
 import pandas as pd
 from typing import Dict, Tuple, Optional, List
 
+from .instrumentation import span, traced
+
+@traced('validate_foreign_keys')
 def validate_foreign_keys(
     df_dict: Dict[str, pd.DataFrame],
     fk_dict: Dict[str, Dict[str, str]],
@@ -79,8 +82,9 @@ def validate_foreign_keys(
                 continue
 
             # Проверяем целостность данных
-            missing_mask = ~df[fk_col].isin(ref_df[ref_col])
-            num_missing = missing_mask.sum()
+            with span('validate_fk', table=table, rows=len(df), relation=relation_key):
+                missing_mask = ~df[fk_col].isin(ref_df[ref_col])
+                num_missing = missing_mask.sum()
             pct_missing = round(100 * num_missing / len(df), 2) if len(df) > 0 else 0
 
             results[relation_key] = (num_missing, pct_missing, table)
@@ -94,16 +98,16 @@ def validate_foreign_keys(
             valid_fk_dict[table] = valid_relations
 
     if verbose:
-        _print_validation_results(results, valid_fk_dict)
+        print_validation_results(results, valid_fk_dict)
 
     return results, valid_fk_dict
 
 
-def _print_validation_results(
+def print_validation_results(
     results: Dict[str, Tuple[Optional[int], Optional[float], str]],
     valid_fk_dict: Dict[str, Dict[str, str]]
 ) -> None:
-    """Выводит результаты валидации в удобочитаемом формате."""
+    """Выводит результаты валидации (формат validate_foreign_keys) в удобочитаемом виде."""
     print("\nВалидация внешних ключей между таблицами:")
     print("=" * 60)
     
@@ -4,6 +4,8 @@ from sqlalchemy import text
 import pandas as pd
 from tabulate import tabulate
 
+from .instrumentation import span, traced
+
 
 def check_table_exists(engine, table_name):
     with engine.connect() as conn:
@@ -29,17 +31,19 @@ def check_missing_values(engine, table_name, df):
     return True
 
 
+@traced('run_validation')
 def run_validation(df_dict, engine):
     print("📌 Старт проверки...")
     results = []
 
     for table_name, df in df_dict.items():
-        result = {
-            "Название таблицы": table_name,
-            "Наличие таблицы": "✅" if check_table_exists(engine, table_name) else "❌",
-            "Совпадение строк": "✅" if check_row_count(engine, table_name, len(df)) else "❌",
-            "Совпадение пропусков": "✅" if check_missing_values(engine, table_name, df) else "❌",
-        }
+        with span('validate_table', table=table_name, rows=len(df)):
+            result = {
+                "Название таблицы": table_name,
+                "Наличие таблицы": "✅" if check_table_exists(engine, table_name) else "❌",
+                "Совпадение строк": "✅" if check_row_count(engine, table_name, len(df)) else "❌",
+                "Совпадение пропусков": "✅" if check_missing_values(engine, table_name, df) else "❌",
+            }
         results.append(result)
 
     report = pd.DataFrame(results)
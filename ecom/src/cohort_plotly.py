@@ -4,23 +4,45 @@ import plotly.graph_objects as go  # Интерактивные графики
 import plotly.io as pio  # Настройки рендеринга
 from plotly.subplots import make_subplots
 import pandas as pd
+import numpy as np
+
+from .cohorts import CohortMatrix
+from .plotly_utils import finish_figure
 
 
 def plot_cohort_analysis(df, 
                          title="Когортный анализ",
                          value_col='retention_rate',
-                         zmax=1,
+                         zmax=None,
                          zmin=0,
                          colorscale='Blues',
                          bar_color=None,
-                         exclude_month_zero=True):  
+                         exclude_month_zero=True,
+                         show=False,
+                         as_json=False):  
     """
     Визуализация когортного анализа с тепловой картой и размерами когорт
     
     Параметры:
     ----------
+    df : pd.DataFrame или CohortMatrix
+        Длинный формат (cohort_month, lifetime_month, cohort_size, value_col)
+        либо готовая матрица когорт — тогда pivot не выполняется
+    zmax : float, optional
+        Верхняя граница цветовой шкалы в единицах value_col (retention_rate —
+        в процентах). По умолчанию и при exclude_month_zero — максимум данных
     exclude_month_zero : bool, optional
         Исключать ли нулевой месяц (по умолчанию True)
+
+    show : bool
+        Показать фигуру сразу (по умолчанию фигура только возвращается)
+
+    as_json : bool
+        Вернуть также компактный JSON фигуры
+
+    Возвращает:
+    -----------
+    go.Figure или (go.Figure, str)
     """
     
         # Автоматический подбор цвета для столбцов
@@ -35,20 +57,32 @@ def plot_cohort_analysis(df,
         except (AttributeError, IndexError, TypeError):
             bar_color = 'black'  # Фолбек
 
+    if isinstance(df, CohortMatrix):
+        # Матрица уже готова: берём массивы напрямую
+        first_col = 1 if exclude_month_zero else 0
+        present = df.sizes > 0
+        cohort_index = df.cohort_months[present]
+        cohort_sizes = pd.Series(df.sizes[present], index=cohort_index)
+        z = df.view(value_col)[present, first_col:]
+        x = df.lifetimes[first_col:]
+        y_index = cohort_index
+    else:
+        # Фильтрация данных
+        if exclude_month_zero:
+            df = df[df['lifetime_month'] > 0]
+            
+        cohort_sizes = df.groupby('cohort_month')['cohort_size'].first()
+        retention_matrix = df.pivot_table(
+            index='cohort_month', 
+            columns='lifetime_month',
+            values=value_col,
+        )
+        z = retention_matrix.values
+        x = retention_matrix.columns
+        y_index = retention_matrix.index
     
-    # Фильтрация данных
-    if exclude_month_zero:
-        df = df[df['lifetime_month'] > 0]
-        
-    cohort_sizes = df.groupby('cohort_month')['cohort_size'].first()
-    retention_matrix = df.pivot_table(
-        index='cohort_month', 
-        columns='lifetime_month',
-        values=value_col,
-    )
-    
-    if exclude_month_zero:
-        zmax = retention_matrix.max().max() if exclude_month_zero else zmax
+    if (zmax is None or exclude_month_zero) and np.isfinite(z).any():
+        zmax = np.nanmax(z)
         
         
     # Создание фигуры
@@ -77,9 +111,9 @@ def plot_cohort_analysis(df,
     # 2. Тепловая карта
     fig.add_trace(
         go.Heatmap(
-            z=retention_matrix.values,
-            x=retention_matrix.columns,
-            y=retention_matrix.index.strftime('%Y-%m'),
+            z=z,
+            x=x,
+            y=y_index.strftime('%Y-%m'),
             colorscale=colorscale,
             zmin=zmin,
             zmax=zmax,
@@ -115,4 +149,4 @@ def plot_cohort_analysis(df,
         margin=dict(l=100, r=100, b=100)
     )
     
-    return fig
\ No newline at end of file
+    return finish_figure(fig, show=show, as_json=as_json)
\ No newline at end of file
@@ -0,0 +1,347 @@
+# src.cohorts.py
+"""
+Инкрементальный когортный движок.
+
+Хранит матрицу (когорта × месяц жизни) с числом активных клиентов и выручкой
+и дообновляет её только заказами, пришедшими после последнего watermark.
+Ретеншн, выручка и LTV отдаются сразу как NumPy-массивы для тепловой карты.
+
+Заказ попадает в выборку, когда его доставят, — иногда через несколько недель
+после даты покупки. Поэтому refresh перечитывает из БД хвост из последних
+lookback_months месяцев и пересчитывает его вклад заново (как NPSAggregator):
+заказ, доставленный позже watermark, учитывается, если дата покупки в окне.
+"""
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+# Доставленные заказы начиная с :since (один заказ — одна строка)
+COHORT_ORDERS_QUERY = """
+SELECT
+    c.customer_unique_id,
+    o.order_purchase_timestamp,
+    COALESCE(SUM(op.payment_value), 0) AS payment_value
+FROM orders o
+JOIN customers c ON o.customer_id = c.customer_id
+LEFT JOIN order_payments op ON o.order_id = op.order_id
+WHERE o.order_status = 'доставлен'
+  AND o.order_purchase_timestamp >= :since
+GROUP BY o.order_id, c.customer_unique_id, o.order_purchase_timestamp
+ORDER BY o.order_purchase_timestamp;
+"""
+
+
+def month_code(dates):
+    """Переводит даты в номер месяца от начала эпохи (год * 12 + месяц)."""
+    dates = pd.DatetimeIndex(pd.to_datetime(dates))
+    return (dates.year * 12 + dates.month - 1).to_numpy(dtype=np.int64)
+
+
+def code_to_month(codes):
+    """Обратное преобразование номера месяца в DatetimeIndex (первое число)."""
+    codes = np.asarray(codes, dtype=np.int64)
+    return pd.DatetimeIndex(pd.to_datetime({'year': codes // 12, 'month': codes % 12 + 1, 'day': 1}))
+
+
+def _ids_array(ids):
+    """Идентификаторы для .npz: числовые сохраняют тип, остальные — строки."""
+    return ids.to_numpy() if pd.api.types.is_numeric_dtype(ids.dtype) else ids.to_numpy(dtype=str)
+
+
+class CohortMatrix:
+    """
+    Персистентная матрица когорт с инкрементальным обновлением.
+
+    Параметры:
+    ----------
+    entity_col : str
+        Колонка с идентификатором клиента/продавца (по умолчанию 'customer_unique_id')
+    date_col : str
+        Колонка с датой заказа
+    value_col : str
+        Колонка с суммой заказа (для выручки и LTV)
+    lookback_months : int или None
+        Сколько месяцев до месяца watermark refresh пересчитывает заново: заказ,
+        доставленный (или изменённый) позже, учитывается, если куплен в этом окне.
+        Более старые изменения подхватит только полная пересборка
+        (lookback_months=None — каждый refresh пересобирает всё)
+    """
+
+    def __init__(self, entity_col='customer_unique_id',
+                 date_col='order_purchase_timestamp',
+                 value_col='payment_value',
+                 lookback_months=3):
+        self.entity_col = entity_col
+        self.date_col = date_col
+        self.value_col = value_col
+        self.lookback_months = lookback_months
+
+        self.base = None  # номер месяца первой когорты
+        self.active = np.zeros((0, 0), dtype=np.int64)
+        self.revenue = np.zeros((0, 0), dtype=np.float64)
+        self.watermark = None
+        self.last_month = None
+
+        # Состояние: когорта клиента и пары (клиент, месяц) с выручкой за окно since()
+        self._cohort = pd.Series(dtype=np.int64)
+        self._pairs = pd.DataFrame({'entity': pd.Series(dtype=object), 'month': pd.Series(dtype=np.int64),
+                                    'value': pd.Series(dtype=np.float64)})
+
+    # ------------------------------------------------------------------
+    # Обновление
+    # ------------------------------------------------------------------
+    def since(self):
+        """
+        Начало пересчитываемого окна: первое число месяца watermark минус lookback_months
+        (None — пересчитывается всё).
+        """
+        if self.watermark is None or self.lookback_months is None:
+            return None
+        return code_to_month([month_code([self.watermark])[0] - self.lookback_months])[0]
+
+    def update(self, orders):
+        """
+        Добавляет в матрицу новые заказы.
+
+        Заказы не позже текущего watermark отбрасываются, поэтому повторная
+        передача той же выгрузки ничего не удвоит.
+
+        Параметры:
+        ----------
+        orders : pd.DataFrame
+            Колонки entity_col, date_col и (опционально) value_col
+
+        Возвращает:
+        -----------
+        int : количество учтённых заказов
+        """
+        dates = pd.to_datetime(orders[self.date_col])
+        if self.watermark is not None:
+            fresh = (dates > self.watermark).to_numpy()
+            orders, dates = orders[fresh], dates[fresh]
+        if orders.empty:
+            return 0
+        self._add(orders, dates)
+        return len(orders)
+
+    def rebuild_window(self, orders):
+        """
+        Пересчитывает месяцы начиная с since() по переданным заказам.
+
+        orders должны содержать все заказы с датой не раньше since() (например,
+        выборку COHORT_ORDERS_QUERY с :since = since()): вклад этих месяцев
+        вычитается из матрицы и строится заново, поэтому заказы, доставленные
+        после watermark, и отменённые после него не теряются и не удваиваются.
+
+        Возвращает:
+        -----------
+        int : количество учтённых заказов
+        """
+        since = self.since()
+        dates = pd.to_datetime(orders[self.date_col])
+        if since is None:
+            self.__init__(self.entity_col, self.date_col, self.value_col, self.lookback_months)
+        else:
+            keep = (dates >= since).to_numpy()
+            orders, dates = orders[keep], dates[keep]
+            self._drop_from(month_code([since])[0])
+        if orders.empty:
+            return 0
+        self._add(orders, dates)
+        return len(orders)
+
+    def refresh(self, engine, query=COHORT_ORDERS_QUERY):
+        """Перечитывает из БД заказы начиная с since() и пересчитывает эти месяцы."""
+        since = self.since()
+        params = {'since': (since if since is not None else pd.Timestamp('1900-01-01')).to_pydatetime()}
+        with engine.connect() as conn:
+            result = conn.execute(text(query), params)
+            orders = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+        if orders.empty:
+            orders = pd.DataFrame(columns=[self.entity_col, self.date_col, self.value_col])
+        return self.rebuild_window(orders)
+
+    def _add(self, orders, dates):
+        """Добавляет заказы: в каждую пару (клиент, месяц) — активность один раз и выручку."""
+        values = (orders[self.value_col].to_numpy(dtype=np.float64)
+                  if self.value_col in orders.columns else np.zeros(len(orders)))
+
+        # Один проход: сворачиваем заказы до пар (клиент, месяц)
+        batch = pd.DataFrame({
+            'entity': orders[self.entity_col].to_numpy(),
+            'month': month_code(dates),
+            'value': values,
+        })
+        pairs = batch.groupby(['entity', 'month'], sort=False)['value'].sum().reset_index()
+
+        entity = pairs['entity']
+        month = pairs['month'].to_numpy()
+
+        # Когорта: из состояния, для новых клиентов — первый месяц в пачке
+        first_in_batch = pairs.groupby('entity', sort=False)['month'].min()
+        new_entities = first_in_batch.index.difference(self._cohort.index)
+        cohort_map = pd.concat([self._cohort, first_in_batch.loc[new_entities]])
+        cohort = entity.map(cohort_map).to_numpy(dtype=np.int64)
+
+        # Активность считается один раз на (клиент, месяц): пары окна уже учтены
+        keys = pd.MultiIndex.from_arrays([entity, month])
+        is_new_activity = ~keys.isin(pd.MultiIndex.from_frame(self._pairs[['entity', 'month']]))
+
+        self._grow(cohort.min(), cohort.max(), (month - cohort).max())
+
+        rows = cohort - self.base
+        cols = month - cohort
+        shape = self.active.shape
+        flat = rows * shape[1] + cols
+        size = shape[0] * shape[1]
+        self.active += np.bincount(flat, weights=is_new_activity, minlength=size).astype(np.int64).reshape(shape)
+        self.revenue += np.bincount(flat, weights=pairs['value'].to_numpy(), minlength=size).reshape(shape)
+
+        self._cohort = cohort_map
+        self._pairs = (
+            pd.concat([self._pairs, pairs], ignore_index=True)
+            .groupby(['entity', 'month'], sort=False)['value'].sum().reset_index()
+        )
+        self.watermark = dates.max() if self.watermark is None else max(self.watermark, dates.max())
+        self.last_month = int(month.max()) if self.last_month is None else max(self.last_month, int(month.max()))
+
+        # Пары старше окна больше не пересчитываются
+        since = self.since()
+        if since is not None:
+            self._pairs = self._pairs[self._pairs['month'].to_numpy() >= month_code([since])[0]]
+        self._pairs = self._pairs.reset_index(drop=True)
+
+    def _drop_from(self, code):
+        """Вычитает вклад пар с месяцем не раньше code; клиенты с когортой в окне забываются."""
+        old = self._pairs[self._pairs['month'].to_numpy() >= code]
+        if len(old):
+            cohort = old['entity'].map(self._cohort).to_numpy(dtype=np.int64)
+            cell = (cohort - self.base, old['month'].to_numpy() - cohort)
+            np.subtract.at(self.active, cell, 1)
+            np.subtract.at(self.revenue, cell, old['value'].to_numpy())
+        self._pairs = self._pairs[self._pairs['month'].to_numpy() < code].reset_index(drop=True)
+        self._cohort = self._cohort[self._cohort.to_numpy() < code]
+
+    def _grow(self, cohort_min, cohort_max, max_lifetime):
+        """Расширяет матрицы под новые когорты и месяцы жизни."""
+        if self.base is None:
+            self.base = int(cohort_min)
+        pad_top = max(self.base - int(cohort_min), 0)
+        self.base -= pad_top
+        n_rows = max(self.active.shape[0] + pad_top, int(cohort_max) - self.base + 1)
+        n_cols = max(self.active.shape[1], int(max_lifetime) + 1)
+
+        pad = ((pad_top, n_rows - self.active.shape[0] - pad_top), (0, n_cols - self.active.shape[1]))
+        if any(p for pair in pad for p in pair):
+            self.active = np.pad(self.active, pad)
+            self.revenue = np.pad(self.revenue, pad)
+
+    # ------------------------------------------------------------------
+    # Представления
+    # ------------------------------------------------------------------
+    @property
+    def cohort_months(self):
+        """DatetimeIndex когорт (строки матрицы)."""
+        return code_to_month(np.arange(self.active.shape[0]) + (self.base or 0))
+
+    @property
+    def lifetimes(self):
+        """Номера месяцев жизни (столбцы матрицы)."""
+        return np.arange(self.active.shape[1])
+
+    @property
+    def sizes(self):
+        """Размеры когорт: в нулевой месяц активен каждый клиент когорты."""
+        return self.active[:, 0] if self.active.size else np.zeros(0, dtype=np.int64)
+
+    def _observable(self):
+        """Маска ячеек, которые уже могли наступить к последнему месяцу данных."""
+        if self.base is None:
+            return np.zeros(self.active.shape, dtype=bool)
+        rows = np.arange(self.active.shape[0])[:, None] + self.base
+        return self.lifetimes[None, :] <= (self.last_month - rows)
+
+    def retention(self, percent=True):
+        """Матрица ретеншна; ненаступившие месяцы — NaN."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            matrix = self.active / self.sizes[:, None]
+        matrix = np.where(self._observable(), matrix, np.nan)
+        return matrix * 100 if percent else matrix
+
+    def revenue_matrix(self):
+        """Выручка по ячейкам; ненаступившие месяцы — NaN."""
+        return np.where(self._observable(), self.revenue, np.nan)
+
+    def ltv(self):
+        """Кумулятивная выручка на клиента когорты."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            matrix = np.cumsum(self.revenue, axis=1) / self.sizes[:, None]
+        return np.where(self._observable(), matrix, np.nan)
+
+    def view(self, value_col):
+        """Матрица по имени колонки длинного формата (как в SQL-выгрузке)."""
+        views = {
+            'retention_rate': self.retention,
+            'active_users': lambda: np.where(self._observable(), self.active, np.nan),
+            'revenue': self.revenue_matrix,
+            'cumulative_ltv': self.ltv,
+        }
+        if value_col not in views:
+            raise ValueError(f"value_col должен быть одним из: {', '.join(views)}")
+        return views[value_col]()
+
+    def to_frame(self):
+        """Длинный формат, совместимый с plot_cohort_analysis и выгрузкой из SQL."""
+        n_rows, n_cols = self.active.shape
+        mask = self._observable().ravel()
+        frame = pd.DataFrame({
+            'cohort_month': np.repeat(self.cohort_months, n_cols),
+            'lifetime_month': np.tile(self.lifetimes, n_rows),
+            'active_users': self.active.ravel(),
+            'cohort_size': np.repeat(self.sizes, n_cols),
+            'retention_rate': np.round(self.retention().ravel(), 2),
+            'revenue': self.revenue.ravel(),
+            'cumulative_ltv': self.ltv().ravel(),
+        })
+        return frame[mask & (frame['cohort_size'].to_numpy() > 0)].reset_index(drop=True)
+
+    # ------------------------------------------------------------------
+    # Сохранение
+    # ------------------------------------------------------------------
+    def save(self, path):
+        """Сохраняет матрицу и состояние клиентов в .npz (числовые id сохраняют свой тип)."""
+        np.savez_compressed(
+            path,
+            base=np.int64(self.base if self.base is not None else -1),
+            active=self.active,
+            revenue=self.revenue,
+            watermark=np.datetime64(self.watermark if self.watermark is not None else 'NaT', 'ns'),
+            last_month=np.int64(self.last_month if self.last_month is not None else -1),
+            lookback_months=np.int64(self.lookback_months if self.lookback_months is not None else -1),
+            entities=_ids_array(self._cohort.index),
+            cohort=self._cohort.to_numpy(dtype=np.int64),
+            pair_entities=_ids_array(pd.Index(self._pairs['entity'])),
+            pair_months=self._pairs['month'].to_numpy(dtype=np.int64),
+            pair_values=self._pairs['value'].to_numpy(dtype=np.float64),
+            columns=np.array([self.entity_col, self.date_col, self.value_col]),
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Загружает матрицу, сохранённую методом save."""
+        with np.load(path) as data:
+            lookback = int(data['lookback_months'])
+            matrix = cls(*data['columns'].tolist(), lookback_months=None if lookback < 0 else lookback)
+            base = int(data['base'])
+            matrix.base = None if base < 0 else base
+            matrix.active = data['active']
+            matrix.revenue = data['revenue']
+            watermark = pd.Timestamp(data['watermark'][()])
+            matrix.watermark = None if pd.isna(watermark) else watermark
+            last_month = int(data['last_month'])
+            matrix.last_month = None if last_month < 0 else last_month
+            matrix._cohort = pd.Series(data['cohort'], index=pd.Index(data['entities']))
+            matrix._pairs = pd.DataFrame({'entity': data['pair_entities'], 'month': data['pair_months'],
+                                          'value': data['pair_values']})
+        return matrix
@@ -0,0 +1,173 @@
+# src.column_catalog.py
+"""
+Каталог колонок таблицы: нормализованные имена и классы признаков.
+
+Классы считаются один раз на таблицу (один nunique по всем колонкам) и
+кэшируются в df.attrs['column_catalog']; EDA-функции пакета берут списки
+колонок отсюда, а не вызывают select_dtypes / nunique заново.
+
+Каталог привязан к объекту DataFrame, для которого построен (слабая ссылка):
+pandas переносит attrs в производные таблицы (fillna, assign, фильтры), но
+для них каталог строится заново. Для того же объекта он пересчитывается, если
+изменились число строк, колонки или типы; после изменения значений на месте
+(например, fillna(inplace=True)) — column_catalog(df, refresh=True).
+
+Классы (kind):
+    date     — datetime64
+    numeric  — числа (без bool)
+    bool     — флаги
+    id       — строковые идентификаторы (*_id, id)
+    category — pd.Categorical
+    text     — прочие строки / object
+Дополнительно key — колонка без пропусков и повторов (кандидат в первичный ключ).
+"""
+
+import re
+import weakref
+from functools import lru_cache
+
+import pandas as pd
+
+KINDS = ('date', 'numeric', 'bool', 'id', 'category', 'text')
+ATTRS_KEY = 'column_catalog'
+
+_SEPARATORS = re.compile(r'[\s\-]+')
+_CAMEL_BOUNDARY = re.compile(r'(?<=[a-z])(?=[A-Z])')
+
+
+@lru_cache(maxsize=4096)
+def to_snake_case(name):
+    """
+    Преобразует строку в стиль snake_case.
+
+    Преобразует все пробелы и дефисы в подчеркивания, а также вставляет подчеркивания
+    между заглавными и строчными буквами. Результат кэшируется: одни и те же имена
+    колонок приходят из каждой выгрузки таблицы.
+
+    Args:
+        name (str): Строка для преобразования.
+
+    Returns:
+        str: Преобразованная строка в snake_case.
+    """
+    name = _SEPARATORS.sub('_', name)
+    name = _CAMEL_BOUNDARY.sub('_', name)
+    return name.lower()
+
+
+def snake_case_columns(columns):
+    """Список имён колонок в snake_case."""
+    return [to_snake_case(col) for col in columns]
+
+
+def _kind(name, values):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return 'date'
+    if pd.api.types.is_bool_dtype(values):
+        return 'bool'
+    if pd.api.types.is_numeric_dtype(values):
+        return 'numeric'
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return 'category'
+    if name == 'id' or name.endswith('_id'):
+        return 'id'
+    return 'text'
+
+
+def _signature(df):
+    return len(df), tuple(df.columns), tuple(str(dtype) for dtype in df.dtypes)
+
+
+class ColumnCatalog:
+    """
+    Классы и статистики колонок одной таблицы.
+
+    Атрибуты:
+    ---------
+    info : pd.DataFrame
+        По строке на колонку: kind, dtype, nunique, missing, key
+    """
+
+    def __init__(self, info, signature, owner=None):
+        self.info = info
+        self.signature = signature
+        self._owner = weakref.ref(owner) if owner is not None else None
+
+    @classmethod
+    def build(cls, df):
+        nunique = df.nunique(dropna=True)
+        missing = df.isna().sum()
+        info = pd.DataFrame({
+            'kind': [_kind(str(col), df[col]) for col in df.columns],
+            'dtype': [str(dtype) for dtype in df.dtypes],
+            'nunique': nunique.to_numpy(),
+            'missing': missing.to_numpy(),
+        }, index=pd.Index(df.columns, name='column'))
+        info['key'] = (info['nunique'] == len(df)) & (info['missing'] == 0) & (len(df) > 0)
+        return cls(info, _signature(df), owner=df)
+
+    def __deepcopy__(self, memo):
+        # pandas копирует attrs при каждой операции; каталог после построения не меняется,
+        # а производная таблица его не примет (matches проверяет владельца)
+        return self
+
+    def __getstate__(self):
+        # Слабая ссылка не сериализуется; после загрузки каталог строится заново
+        return {'info': self.info, 'signature': self.signature, '_owner': None}
+
+    def columns(self, *kinds, max_cardinality=None, exclude=None):
+        """
+        Колонки заданных классов в порядке таблицы.
+
+        Параметры:
+        ----------
+        kinds : str
+            Классы из KINDS (без аргументов — все колонки)
+        max_cardinality : int, optional
+            Только колонки с числом уникальных значений не больше этого
+        exclude : list, optional
+            Колонки, которые не нужно возвращать
+        """
+        info = self.info
+        if kinds:
+            unknown = set(kinds) - set(KINDS)
+            if unknown:
+                raise ValueError(f"Неизвестные классы колонок: {sorted(unknown)}; доступны {KINDS}")
+            info = info[info['kind'].isin(kinds)]
+        if max_cardinality is not None:
+            info = info[info['nunique'] <= max_cardinality]
+        if exclude:
+            info = info[~info.index.isin(exclude)]
+        return info.index.tolist()
+
+    @property
+    def keys(self):
+        """Колонки-кандидаты в первичный ключ (без пропусков и повторов)."""
+        return self.info.index[self.info['key']].tolist()
+
+    def nunique(self, column):
+        return int(self.info.at[column, 'nunique'])
+
+    def matches(self, df):
+        """Каталог построен для этого же объекта df и его форма не менялась."""
+        return self._owner is not None and self._owner() is df and self.signature == _signature(df)
+
+
+def column_catalog(df, refresh=False):
+    """
+    Каталог колонок df из df.attrs (строится при первом обращении или после изменения таблицы).
+
+    Возвращает:
+    -----------
+    ColumnCatalog
+    """
+    catalog = df.attrs.get(ATTRS_KEY)
+    if refresh or catalog is None or not catalog.matches(df):
+        catalog = ColumnCatalog.build(df)
+        df.attrs[ATTRS_KEY] = catalog
+    return catalog
+
+
+def build_catalogs(df_dict):
+    """Каталоги всех таблиц словаря: {имя_таблицы: ColumnCatalog}."""
+    return {name: column_catalog(df) for name, df in df_dict.items()}
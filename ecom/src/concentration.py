@@ -0,0 +1,214 @@
+# src.concentration.py
+"""
+Кривая Лоренца и индекс Джини для концентрации GMV между продавцами.
+
+- Точный расчёт: одна сортировка, O(n log n)
+- Приближённый расчёт по потоку: логарифмический скетч-гистограмма,
+  память не зависит от числа продавцов
+- Прореживание кривой до ограниченного числа точек с гарантией ошибки
+"""
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+# GMV продавца — цена и доставка его позиций в доставленных заказах (оплата заказа
+# относится ко всем позициям сразу, поэтому join с order_payments завысил бы GMV
+# многотоварных заказов). То же определение, что у marts.mart_seller_sales.gmv_with_freight;
+# revenue в витрине — только цена позиций
+SELLER_GMV_QUERY = """
+SELECT oi.seller_id, SUM(oi.price + oi.freight_value)::double precision AS gmv_with_freight
+FROM order_items oi
+JOIN orders o ON oi.order_id = o.order_id
+WHERE o.order_status = 'доставлен'
+GROUP BY oi.seller_id;
+"""
+
+
+def gini_index(gmv):
+    """
+    Индекс Джини по массиву GMV.
+
+    G = 1 - 2 * площадь под кривой Лоренца (трапеции по отсортированным значениям).
+    """
+    values = np.sort(np.asarray(gmv, dtype=np.float64))
+    n = len(values)
+    total = values.sum()
+    if n == 0 or total == 0:
+        return 0.0
+    cum = np.cumsum(values)
+    area = (cum.sum() - total / 2) / (n * total)
+    return float(1 - 2 * area)
+
+
+def lorenz_curve(gmv, seller_ids=None):
+    """
+    Строит кривую концентрации в формате plot_gmv_concentration.
+
+    Продавцы упорядочены по убыванию GMV (как в SQL-выгрузке с ROW_NUMBER).
+
+    Параметры:
+    ----------
+    gmv : array-like
+        GMV каждого продавца
+    seller_ids : array-like, optional
+        Идентификаторы продавцов в том же порядке
+
+    Возвращает:
+    -----------
+    pd.DataFrame с колонками 'seller_rank', 'seller_id', 'gmv', 'percent_gmv',
+    'cumulative_gmv_percent', 'cumulative_seller_percent', 'gini_index'
+    """
+    gmv = np.asarray(gmv, dtype=np.float64)
+    order = np.argsort(-gmv, kind='stable')
+    sorted_gmv = gmv[order]
+    n = len(sorted_gmv)
+    total = sorted_gmv.sum()
+
+    ids = np.asarray(seller_ids)[order] if seller_ids is not None else order
+    percent = 100 * sorted_gmv / total if total else np.zeros(n)
+
+    return pd.DataFrame({
+        'seller_rank': np.arange(1, n + 1),
+        'seller_id': ids,
+        'gmv': sorted_gmv,
+        'percent_gmv': percent,
+        'cumulative_gmv_percent': np.cumsum(percent),
+        'cumulative_seller_percent': 100 * np.arange(1, n + 1) / n,
+        'gini_index': round(gini_index(sorted_gmv), 4),
+    })
+
+
+def downsample_curve(x, y, max_points=500):
+    """
+    Индексы точек монотонной кривой, достаточные для её отрисовки.
+
+    Берутся точки на равномерной сетке и по x, и по y (по k = max_points / 2
+    узлов на ось). Между соседними выбранными точками приращение по каждой
+    оси не превышает 1/k диапазона, поэтому ломаная отклоняется от исходной
+    кривой не больше чем на 1/k диапазона по каждой оси.
+
+    Параметры:
+    ----------
+    x, y : array-like
+        Неубывающие координаты кривой (например, кумулятивные проценты)
+    max_points : int
+        Верхняя граница числа точек (концы кривой всегда сохраняются)
+
+    Возвращает:
+    -----------
+    np.ndarray индексов исходных точек (отсортированных)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+
+    k = max(max_points // 2 - 1, 1)
+    idx = [np.array([0, n - 1])]
+    for axis in (x, y):
+        span = axis[-1] - axis[0]
+        if span <= 0:
+            continue
+        grid = axis[0] + span * np.arange(1, k) / k
+        idx.append(np.searchsorted(axis, grid, side='left').clip(0, n - 1))
+    return np.unique(np.concatenate(idx))
+
+
+def max_deviation(x, y, idx):
+    """Максимальное отклонение прореженной ломаной от исходной кривой по y."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    return float(np.max(np.abs(np.interp(x, x[idx], y[idx]) - y))) if len(x) else 0.0
+
+
+class GMVSketch:
+    """
+    Потоковый приближённый расчёт концентрации GMV.
+
+    GMV продавцов раскладывается по логарифмическим корзинам с относительной
+    шириной rel_error; в каждой корзине хранится число продавцов и сумма GMV.
+    Кривая Лоренца по корзинам отличается от точной только внутри корзин,
+    а память фиксирована и не зависит от числа продавцов.
+
+    Параметры:
+    ----------
+    rel_error : float
+        Относительная ширина корзины (0.01 → значения внутри корзины отличаются ≤ 1%)
+    min_value : float
+        Значения меньше min_value (включая нули) попадают в нулевую корзину
+    """
+
+    def __init__(self, rel_error=0.01, min_value=1e-2):
+        self.rel_error = rel_error
+        self.min_value = min_value
+        self._log_base = np.log1p(rel_error)
+        self.counts = {}
+        self.sums = {}
+
+    def update(self, gmv):
+        """Добавляет пачку значений GMV (по одному на продавца)."""
+        gmv = np.asarray(gmv, dtype=np.float64)
+        gmv = gmv[np.isfinite(gmv)]
+        buckets = np.where(
+            gmv >= self.min_value,
+            np.floor(np.log(np.maximum(gmv, self.min_value) / self.min_value) / self._log_base).astype(np.int64) + 1,
+            0,
+        )
+        keys, inverse = np.unique(buckets, return_inverse=True)
+        counts = np.bincount(inverse)
+        sums = np.bincount(inverse, weights=gmv)
+        for key, count, total in zip(keys.tolist(), counts.tolist(), sums.tolist()):
+            self.counts[key] = self.counts.get(key, 0) + count
+            self.sums[key] = self.sums.get(key, 0.0) + total
+        return self
+
+    def update_from_db(self, engine, query=SELLER_GMV_QUERY, chunksize=50_000, value_col='gmv_with_freight'):
+        """Читает GMV продавцов (колонка value_col запроса) из БД пачками и добавляет в скетч."""
+        with engine.connect() as conn:
+            for chunk in pd.read_sql(text(query), conn, chunksize=chunksize):
+                self.update(chunk[value_col].to_numpy())
+        return self
+
+    @property
+    def n_sellers(self):
+        return sum(self.counts.values())
+
+    def lorenz_curve(self):
+        """
+        Кривая по корзинам в порядке убывания GMV.
+
+        Возвращает:
+        -----------
+        pd.DataFrame с колонками 'cumulative_seller_percent', 'cumulative_gmv_percent',
+        'sellers', 'gmv' (одна строка на корзину)
+        """
+        keys = np.array(sorted(self.counts, reverse=True), dtype=np.int64)
+        counts = np.array([self.counts[k] for k in keys], dtype=np.float64)
+        sums = np.array([self.sums[k] for k in keys], dtype=np.float64)
+        total_n, total_gmv = counts.sum(), sums.sum()
+        return pd.DataFrame({
+            'cumulative_seller_percent': 100 * np.cumsum(counts) / total_n,
+            'cumulative_gmv_percent': 100 * np.cumsum(sums) / total_gmv if total_gmv else 0.0,
+            'sellers': counts.astype(np.int64),
+            'gmv': sums,
+        })
+
+    def gini_index(self):
+        """
+        Приближённый индекс Джини.
+
+        Внутри корзины продавцы считаются равными, поэтому площадь под кривой
+        Лоренца считается точно для кусочно-линейной кривой по корзинам.
+        """
+        curve = self.lorenz_curve()
+        if curve.empty:
+            return 0.0
+        # Возрастающий порядок для классической кривой Лоренца
+        counts = curve['sellers'].to_numpy()[::-1].astype(np.float64)
+        sums = curve['gmv'].to_numpy()[::-1]
+        p = np.concatenate([[0.0], np.cumsum(counts) / counts.sum()])
+        share = np.concatenate([[0.0], np.cumsum(sums) / sums.sum()])
+        area = np.sum((p[1:] - p[:-1]) * (share[1:] + share[:-1]) / 2)
+        return float(1 - 2 * area)
@@ -1,10 +1,9 @@
 # src.corr_features.py
 
-from scipy.stats import spearmanr, pearsonr
 import numpy as np
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
+
+from .column_catalog import column_catalog
 
 def analyze_correlations(df_dict, method="pearson", threshold=0.6, figsize=(12, 6),
                         top_pairs=10, cmap='greys', show_scatter=True):
@@ -19,7 +18,9 @@ def analyze_correlations(df_dict, method="pearson", threshold=0.6, figsize=(12,
     - top_pairs: количество топ-пар для вывода
     - show_scatter: показывать scatter plot для сильно коррелирующих пар
     """
-    
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     def _find_strong_correlations(corr, threshold, top_pairs):
         corr_unstacked = corr.unstack()
         corr_unstacked = corr_unstacked[corr_unstacked.index.get_level_values(0) != corr_unstacked.index.get_level_values(1)]
@@ -39,7 +40,7 @@ def analyze_correlations(df_dict, method="pearson", threshold=0.6, figsize=(12,
     for df_name, df in df_dict.items():
         print(f"\n{'='*125}\nАнализ корреляций: {df_name.upper()}")
         
-        num_df = df.select_dtypes(include=[np.number]).copy()
+        num_df = df[column_catalog(df).columns('numeric')].copy()
         
         if num_df.empty:
             print("⚠️ Нет числовых признаков. Пропускаем.")
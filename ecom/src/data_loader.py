@@ -2,54 +2,43 @@
 
 
 import os
+import numpy as np
 import pandas as pd
-import re
 
-
-def to_snake_case(name):
-    """
-    Преобразует строку в стиль snake_case.
-
-    Преобразует все пробелы и дефисы в подчеркивания, а также вставляет подчеркивания 
-    между заглавными и строчными буквами.
-
-    Args:
-        name (str): Строка для преобразования.
-
-    Returns:
-        str: Преобразованная строка в snake_case.
-    """
-    name = re.sub(r'[\s\-]+', '_', name)
-    name = re.sub(r'(?<=[a-z])(?=[A-Z])', '_', name)
-    return name.lower()
+from .column_catalog import column_catalog, snake_case_columns
+from .datetime_parsing import parse_date_columns, unparsed_report
+from .dedup import duplicate_mask, row_hashes
+from .instrumentation import span, traced
 
 
-def convert_dates(df):
+def convert_dates(df, formats=None):
     """
     Преобразует столбцы с датой в тип datetime.
 
-    Определяет все столбцы, содержащие 'date' или 'datetime' в названии, и преобразует их в формат pandas datetime.
+    Определяет все столбцы, содержащие 'date' или 'datetime' в названии, подбирает формат
+    по выборке значений и разбирает столбец с фиксированным форматом. Столбцы, для которых формат
+    не найден, не изменяются.
 
     Args:
         df (pandas.DataFrame): Датафрейм для обработки.
+        formats (dict, optional): Известные форматы {столбец: формат}, чтобы не определять их заново.
 
     Returns:
-        pandas.DataFrame: Датафрейм с преобразованными столбцами.
+        pandas.DataFrame: Датафрейм с преобразованными столбцами. Найденные форматы —
+        в df.attrs['date_formats'], число неразобранных значений — в df.attrs['date_unparsed'].
     """
-    date_cols = [col for col in df.columns if 'date' in col or 'datetime' in col]
-    for col in date_cols:
-        df[col] = pd.to_datetime(df[col], errors='coerce')
-    return df
+    return parse_date_columns(df, formats=formats)
 
 
-def load_and_inspect(folder_path='datasets', verbose=True):
+@traced('load_and_inspect')
+def load_and_inspect(folder_path='datasets', verbose=True, hash_index=None):
     """
     Загружает CSV файлы из папки, преобразует данные и проводит предварительный анализ.
 
     Осуществляется:
     - Преобразование названий столбцов в snake_case.
     - Обработка столбцов с датами.
-    - Удаление полных дубликатов.
+    - Удаление полных дубликатов (по 64-битным хэшам строк, см. src.dedup).
     - Проверка на пропуски и их обработка.
     - Классификация признаков.
     - Поиск возможного первичного ключа.
@@ -57,6 +46,9 @@ def load_and_inspect(folder_path='datasets', verbose=True):
     Args:
         folder_path (str, optional): Путь к папке с CSV файлами. По умолчанию 'datasets'.
         verbose (bool, optional): Если True, выводит дополнительную информацию о процессе. По умолчанию True.
+        hash_index (HashIndex, optional): Индекс ранее загруженных строк и ключей. Строки и ключи,
+            уже попавшие в индекс (прошлые выгрузки тех же таблиц), удаляются как дубликаты,
+            новые добавляются в индекс.
 
     Returns:
         dict: Словарь с обработанными датафреймами, где ключи - имена таблиц, а значения - датафреймы.
@@ -80,70 +72,100 @@ def load_and_inspect(folder_path='datasets', verbose=True):
             print(f'\n📦 Загружается: {file} → `{table_name}`')
 
         path = os.path.join(folder_path, file)
-        df = pd.read_csv(path)
+        with span('load_table', table=table_name, nbytes=os.path.getsize(path)) as table_span:
+            df = pd.read_csv(path)
 
-        # Преобразуем названия столбцов и обработаем даты
-        df.columns = [to_snake_case(col) for col in df.columns]
-        df = convert_dates(df)
+            # Преобразуем названия столбцов и обработаем даты
+            df.columns = snake_case_columns(df.columns)
+            df = convert_dates(df)
 
-        if verbose:
-            print(f'➡️ Размер: {df.shape[0]} строк × {df.shape[1]} колонок')
-            print(f'🔁 Полных дубликатов: {df.duplicated().sum()}')
-
-        # Удаление полных дубликатов
-        initial_shape = df.shape
-        df = df.drop_duplicates()
-        removed_duplicates = initial_shape[0] - df.shape[0]
-        if removed_duplicates > 0:
-            print(f'❌ Удалено {removed_duplicates} полных дубликатов')
-
-        # Пропуски
-        na_percent = df.isna().mean() * 100
-        na_present = na_percent[na_percent > 0].sort_values(ascending=False)
-
-        if not na_present.empty:
-            tables_with_missing[table_name] = list(na_present.index)
-            missing_report[table_name] = na_present
             if verbose:
-                print('⚠️ Пропуски в колонках (%)')
-                print(na_present.round(2).to_string())
-        else:
+                print(f'➡️ Размер: {df.shape[0]} строк × {df.shape[1]} колонок')
+                if df.attrs['date_formats']:
+                    print(f"🗓️ Форматы дат: {df.attrs['date_formats']}")
+            for col, count in unparsed_report(df).items():
+                print(f'⚠️ `{col}`: {count} значений не подходят под формат {df.attrs["date_formats"][col]} → NaT')
+
+            # Хэш строки считается один раз; маски дубликатов — по массиву хэшей
+            hashes = row_hashes(df)
+            full_dupes = duplicate_mask(hashes)
             if verbose:
-                print('✅ Пропусков нет')
-
-        # Классификация признаков
-        date_cols = [col for col in df.columns if 'date' in col or 'datetime' in col]
-        text_cols = [col for col in df.select_dtypes(include='object').columns if col not in date_cols]
-        numeric_cols = df.select_dtypes(include='number').columns.tolist()
-
-        if verbose:
-            print(f'📅 Дата-признаки: {date_cols}')
-            print(f'📝 Текстовые: {text_cols[:3]}{" ..." if len(text_cols) > 3 else ""}')
-            print(f'🔢 Числовые: {numeric_cols[:3]}{" ..." if len(numeric_cols) > 3 else ""}')
+                print(f'🔁 Полных дубликатов: {full_dupes.sum()}')
+            seen = (hash_index.seen_rows(table_name, hashes) & ~full_dupes
+                    if hash_index is not None else np.zeros(len(df), dtype=bool))
+
+            # Удаление полных дубликатов
+            removed_duplicates = int(full_dupes.sum())
+            if removed_duplicates > 0 or seen.any():
+                keep = ~(full_dupes | seen)
+                df, hashes = df[keep], hashes[keep]
+            if removed_duplicates > 0:
+                print(f'❌ Удалено {removed_duplicates} полных дубликатов')
+            if seen.any():
+                print(f'❌ Удалено {int(seen.sum())} строк, загруженных ранее')
+
+            # Пропуски
+            na_percent = df.isna().mean() * 100
+            na_present = na_percent[na_percent > 0].sort_values(ascending=False)
+
+            if not na_present.empty:
+                tables_with_missing[table_name] = list(na_present.index)
+                missing_report[table_name] = na_present
+                if verbose:
+                    print('⚠️ Пропуски в колонках (%)')
+                    print(na_present.round(2).to_string())
+            else:
+                if verbose:
+                    print('✅ Пропусков нет')
 
-        # Поиск первичного ключа
-        primary_keys = [col for col in df.columns if df[col].is_unique and df[col].notna().all()]
-        if primary_keys:
-            pk = primary_keys[0]
-            dupes_by_pk = df.duplicated(subset=[pk]).sum()
+            # Классификация признаков (каталог сохраняется в df.attrs и переиспользуется в EDA)
+            catalog = column_catalog(df)
+            date_cols = catalog.columns('date')
+            text_cols = catalog.columns('text', 'id')
+            numeric_cols = catalog.columns('numeric')
 
             if verbose:
-                print(f'🔑 Возможный первичный ключ: {pk}')
+                print(f'📅 Дата-признаки: {date_cols}')
+                print(f'📝 Текстовые: {text_cols[:3]}{" ..." if len(text_cols) > 3 else ""}')
+                print(f'🔢 Числовые: {numeric_cols[:3]}{" ..." if len(numeric_cols) > 3 else ""}')
+
+            # Поиск первичного ключа
+            primary_keys = catalog.keys
+            pk, key_hashes = None, None
+            if primary_keys:
+                pk = primary_keys[0]
+                key_hashes = row_hashes(df, [pk])
+                dupes_mask = duplicate_mask(key_hashes)
+                dupes_by_pk = dupes_mask.sum()
 
-            if dupes_by_pk > 0:
-                # Если есть дубликаты, удаляем их
                 if verbose:
-                    print(f'⚠️ Неявные дубликаты по `{pk}`: {dupes_by_pk}')
-                df = df.drop_duplicates(subset=[pk])
-
-                if verbose:
-                    print(f'✅ Удалено {dupes_by_pk} дубликатов по ключу `{pk}`')
-            else:
-                if verbose:
-                    print(f'✅ Дубликатов по ключу `{pk}` не выявлено.') 
-
-        print("=" * 125) 
-        datasets[table_name] = df
+                    print(f'🔑 Возможный первичный ключ: {pk}')
+
+                if dupes_by_pk > 0:
+                    # Если есть дубликаты, удаляем их
+                    if verbose:
+                        print(f'⚠️ Неявные дубликаты по `{pk}`: {dupes_by_pk}')
+                    df, hashes, key_hashes = df[~dupes_mask], hashes[~dupes_mask], key_hashes[~dupes_mask]
+
+                    if verbose:
+                        print(f'✅ Удалено {dupes_by_pk} дубликатов по ключу `{pk}`')
+                else:
+                    if verbose:
+                        print(f'✅ Дубликатов по ключу `{pk}` не выявлено.') 
+
+                # Ключи из прошлых выгрузок: новая версия строки с тем же ключом не загружается повторно
+                if hash_index is not None:
+                    seen_keys = hash_index.seen_keys(table_name, pk, key_hashes)
+                    if seen_keys.any():
+                        df, hashes, key_hashes = df[~seen_keys], hashes[~seen_keys], key_hashes[~seen_keys]
+                        print(f'❌ Удалено {int(seen_keys.sum())} строк с ключом `{pk}`, загруженным ранее')
+
+            if hash_index is not None:
+                hash_index.add(table_name, hashes, pk, key_hashes)
+
+            print("=" * 125) 
+            datasets[table_name] = df
+            table_span.annotate(rows=len(df))
 
     print("\n✅ Загружены датафреймы:")
     for name in datasets:
@@ -7,10 +7,16 @@ from tqdm import tqdm
 import time
 from typing import Dict, List
 
-from src.db_utils import get_engine  # Предполагается, что этот модуль уже настроен
+from src.db_utils import get_engine
+from src.instrumentation import frame_stats, span, traced
 
-# Инициализация подключения к БД
-engine = get_engine()
+
+def __getattr__(name):
+    # Совместимость со старым `from src.data_uploader import engine`:
+    # подключение создаётся при первом обращении, а не при импорте модуля
+    if name == 'engine':
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def table_has_data(table_name: str, engine) -> bool:
     """Проверяет, содержит ли таблица данные"""
@@ -22,46 +28,30 @@ def table_has_data(table_name: str, engine) -> bool:
     except ProgrammingError:
         return False
 
-def upload_data_to_db(df_dict: Dict[str, pd.DataFrame], engine) -> None:
+@traced('upload_data_to_db')
+def upload_data_to_db(df_dict: Dict[str, pd.DataFrame], engine=None) -> None:
     """
     Загружает данные в БД с прогресс-баром и обработкой ошибок
     
     Args:
         df_dict: Словарь {название_таблицы: DataFrame}
-        engine: SQLAlchemy engine
+        engine: SQLAlchemy engine (по умолчанию — общий engine из get_engine())
     """
+    engine = engine if engine is not None else get_engine()
     for table_name, df in df_dict.items():
         if table_has_data(table_name, engine):
             print(f"⚠️ Пропускаем {table_name} — таблица уже содержит данные")
             continue
 
         print(f"⬆️ Загружаем: {table_name}")
-        try:
-            # Разбиваем на чанки для прогресс-бара
-            total_chunks = len(df) // 1000 + 1
-            
-            with tqdm(total=total_chunks, desc=f"Загрузка {table_name}") as pbar:
-                for chunk_start in range(0, len(df), 1000):
-                    chunk = df.iloc[chunk_start:chunk_start + 1000]
-                    chunk.to_sql(
-                        table_name,
-                        con=engine,
-                        if_exists='append',
-                        index=False,
-                        chunksize=1000,
-                        method='multi'
-                    )
-                    pbar.update(1)
-            
-            print(f"✅ Успешно загружено: {table_name}")
-            
-        except Exception as e:
-            print(f"❌ Ошибка загрузки {table_name}: {e}")
-            print("⏳ Повторная попытка через 10 секунд...")
-            time.sleep(10)
-            
+        rows, nbytes = frame_stats(df)
+        # Спан закрывается один раз при выходе из блока; ошибка повторной попытки пишется в его поле error
+        with span('upload_table', table=table_name, rows=rows, nbytes=nbytes) as table_span:
             try:
-                with tqdm(total=total_chunks, desc=f"Повторная загрузка {table_name}") as pbar:
+                # Разбиваем на чанки для прогресс-бара
+                total_chunks = len(df) // 1000 + 1
+            
+                with tqdm(total=total_chunks, desc=f"Загрузка {table_name}") as pbar:
                     for chunk_start in range(0, len(df), 1000):
                         chunk = df.iloc[chunk_start:chunk_start + 1000]
                         chunk.to_sql(
@@ -73,12 +63,35 @@ def upload_data_to_db(df_dict: Dict[str, pd.DataFrame], engine) -> None:
                             method='multi'
                         )
                         pbar.update(1)
-                print(f"✅ Успешно загружено при повторной попытке: {table_name}")
+            
+                print(f"✅ Успешно загружено: {table_name}")
+            
             except Exception as e:
-                print(f"🚫 Ошибка при повторной загрузке {table_name}: {e}")
+                print(f"❌ Ошибка загрузки {table_name}: {e}")
+                print("⏳ Повторная попытка через 10 секунд...")
+                time.sleep(10)
+            
+                try:
+                    with tqdm(total=total_chunks, desc=f"Повторная загрузка {table_name}") as pbar:
+                        for chunk_start in range(0, len(df), 1000):
+                            chunk = df.iloc[chunk_start:chunk_start + 1000]
+                            chunk.to_sql(
+                                table_name,
+                                con=engine,
+                                if_exists='append',
+                                index=False,
+                                chunksize=1000,
+                                method='multi'
+                            )
+                            pbar.update(1)
+                    print(f"✅ Успешно загружено при повторной попытке: {table_name}")
+                except Exception as e:
+                    print(f"🚫 Ошибка при повторной загрузке {table_name}: {e}")
+                    table_span.error = repr(e)
 
-def run_pipeline(df_dict: Dict[str, pd.DataFrame], engine) -> None:
+def run_pipeline(df_dict: Dict[str, pd.DataFrame], engine=None) -> None:
     """Основной пайплайн загрузки данных"""
+    engine = engine if engine is not None else get_engine()
     print("📌 Начало загрузки данных...")
     upload_data_to_db(df_dict, engine)
     print("🏁 Загрузка завершена.")
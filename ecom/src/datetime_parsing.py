@@ -0,0 +1,147 @@
+# src.datetime_parsing.py
+"""
+Разбор дат с определением формата по выборке.
+
+pd.to_datetime без формата разбирает значения с выводом формата и на
+колонках-«не датах» с date/time в имени молча превращает всё в NaT.
+Здесь формат подбирается один раз по выборке непустых значений, затем
+колонка разбирается векторно с фиксированным форматом. Колонка, для которой
+ни один формат не подошёл, остаётся как есть.
+
+Найденные форматы и число неразобранных значений кладутся в
+df.attrs['date_formats'] и df.attrs['date_unparsed'] и переживают
+копирование и фильтрацию DataFrame, поэтому optimize_data_type не
+определяет формат заново.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Порядок важен: более полные форматы раньше
+CANDIDATE_FORMATS = (
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d',
+    '%d.%m.%Y %H:%M:%S',
+    '%d.%m.%Y %H:%M',
+    '%d.%m.%Y',
+    '%d/%m/%Y %H:%M:%S',
+    '%d/%m/%Y %H:%M',
+    '%d/%m/%Y',
+    '%m/%d/%Y %H:%M:%S',
+    '%m/%d/%Y',
+    '%Y/%m/%d %H:%M:%S',
+    '%Y/%m/%d',
+)
+
+# Маркеры в имени колонки. При загрузке (convert_dates) даты — только колонки
+# с date/datetime в имени, как и раньше; optimize_data_type дополнительно
+# проверяет time/timestamp (его прежнее правило). Колонка с маркером, но не
+# подходящая ни под один формат, в любом случае остаётся как есть.
+LOAD_DATE_MARKERS = ('date', 'datetime')
+DATE_MARKERS = ('date', 'time', 'timestamp')
+ALREADY_DATETIME = 'datetime64'  # метка формата для колонок, уже имеющих тип даты
+
+
+def is_date_column(name, markers=DATE_MARKERS):
+    """Колонка-кандидат в даты по имени."""
+    name = name.lower()
+    return any(marker in name for marker in markers)
+
+
+def _sample(values, sample_size):
+    """Равномерная детерминированная выборка непустых значений как строк."""
+    values = values.dropna()
+    if len(values) > sample_size:
+        values = values.iloc[np.linspace(0, len(values) - 1, sample_size).astype(np.int64)]
+    return values.astype(str).str.strip()
+
+
+def infer_datetime_format(values, sample_size=1_000, min_share=0.99, formats=CANDIDATE_FORMATS):
+    """
+    Подбирает формат даты по выборке значений.
+
+    Параметры:
+    ----------
+    values : pd.Series
+    sample_size : int
+        Размер выборки непустых значений
+    min_share : float
+        Минимальная доля значений выборки, разобранных форматом
+
+    Возвращает:
+    -----------
+    str или None: формат strftime, ALREADY_DATETIME или None, если ни один не подошёл
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return ALREADY_DATETIME
+    if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return None
+    sample = _sample(values, sample_size)
+    if sample.empty:
+        return None
+
+    for fmt in formats:
+        parsed = pd.to_datetime(sample, format=fmt, errors='coerce')
+        if parsed.notna().mean() >= min_share:
+            return fmt
+    return None
+
+
+def parse_datetime(values, fmt):
+    """
+    Разбирает колонку с фиксированным форматом.
+
+    Возвращает:
+    -----------
+    tuple: (pd.Series datetime64, число непустых значений, не подошедших под формат)
+    """
+    if fmt == ALREADY_DATETIME:
+        return values, 0
+    parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+    unparsed = int((parsed.isna() & values.notna()).sum())
+    return parsed, unparsed
+
+
+def parse_date_columns(df, columns=None, formats=None, sample_size=1_000, min_share=0.99):
+    """
+    Определяет форматы и разбирает колонки с датами (на месте).
+
+    Параметры:
+    ----------
+    df : pd.DataFrame
+    columns : list, optional
+        Колонки для проверки (по умолчанию — с date/datetime в имени, LOAD_DATE_MARKERS)
+    formats : dict, optional
+        Известные форматы {колонка: формат}; по умолчанию — из df.attrs['date_formats']
+
+    Возвращает:
+    -----------
+    pd.DataFrame: тот же df; в attrs — 'date_formats' и 'date_unparsed'
+    """
+    known = {**df.attrs.get('date_formats', {}), **(formats or {})}
+    if columns is None:
+        columns = [col for col in df.columns if is_date_column(col, LOAD_DATE_MARKERS)]
+
+    detected, unparsed = {}, dict(df.attrs.get('date_unparsed', {}))
+    for col in columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            continue  # уже разобрана (счётчик неразобранных сохраняется)
+        fmt = known.get(col)
+        if fmt is None or fmt == ALREADY_DATETIME:
+            fmt = infer_datetime_format(df[col], sample_size, min_share)
+        if fmt is None:
+            continue
+        df[col], unparsed[col] = parse_datetime(df[col], fmt)
+        detected[col] = fmt
+
+    df.attrs['date_formats'] = {**df.attrs.get('date_formats', {}), **detected}
+    df.attrs['date_unparsed'] = unparsed
+    return df
+
+
+def unparsed_report(df):
+    """Колонки с неразобранными значениями: {колонка: число}."""
+    return {col: n for col, n in df.attrs.get('date_unparsed', {}).items() if n}
@@ -1,13 +1,196 @@
 # src/db_utils.py
+"""
+Подключения к БД: общий на процесс реестр engine с пулом соединений.
+
+Engine создаётся лениво при первом get_engine() и переиспользуется дальше,
+поэтому импорт модулей пакета не читает конфиг и не открывает соединений.
+"""
+
+import threading
+
+from sqlalchemy import URL, create_engine
+
+# Параметры пула и соединения по умолчанию
+ENGINE_DEFAULTS = {
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_timeout': 30,                # секунд ожидания свободного соединения
+    'pool_recycle': 1800,              # пересоздавать соединения старше 30 минут
+    'pool_pre_ping': True,             # проверять соединение перед выдачей из пула
+    'statement_timeout_ms': 300_000,   # 5 минут на запрос; None — без ограничения
+    'keepalives_idle': 30,             # TCP keepalive для долгих запросов через NAT/балансировщик
+    'sslmode': 'require',
+    'application_name': 'ecom',
+}
+
+_ENGINES = {}
+_ASYNC_ENGINES = {}
+_ENGINE_OPTIONS = {}  # (реестр, имя) → параметры, с которыми создан engine
+_LOCK = threading.Lock()
+
+
+def _db_config():
+    """Конфиг читается только при первом подключении."""
+    from .config import DB_CONFIG
+    return DB_CONFIG
+
+
+def _database_url(config, driver):
+    """URL подключения; спецсимволы в логине/пароле экранируются SQLAlchemy."""
+    port = config.get('port')
+    return URL.create(
+        f'postgresql+{driver}',
+        username=config['user'],
+        password=config['password'],
+        host=config['host'],
+        port=int(port) if port not in (None, '') else None,
+        database=config['dbname'],
+    )
+
+
+def _options(options):
+    unknown = set(options) - set(ENGINE_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Неизвестные параметры подключения: {sorted(unknown)}")
+    return {**ENGINE_DEFAULTS, **options}
+
+
+def _check_options(registry, name, options):
+    """Повторный вызов с другими параметрами — ошибка, а не молча возвращённый старый engine."""
+    if not options:
+        return
+    created = _ENGINE_OPTIONS.get((registry, name))
+    if created is not None and _options(options) != created:
+        changed = sorted(key for key, value in _options(options).items() if created[key] != value)
+        raise ValueError(
+            f"Engine '{name}' уже создан с другими параметрами ({', '.join(changed)}); "
+            f"используйте другое имя или dispose_engines()"
+        )
+
+
+def create_db_engine(config=None, **options):
+    """
+    Создаёт новый engine (без реестра) с пулом, pre-ping, statement_timeout и keepalive.
+
+    Параметры:
+    - config: словарь user/password/host/port/dbname (по умолчанию — config.DB_CONFIG)
+    - options: переопределения ENGINE_DEFAULTS
+    """
+    opts = _options(options)
+    config = config or _db_config()
+
+    connect_args = {
+        'sslmode': opts['sslmode'],
+        'application_name': opts['application_name'],
+        'keepalives': 1,
+        'keepalives_idle': opts['keepalives_idle'],
+        'keepalives_interval': 10,
+        'keepalives_count': 5,
+    }
+    if opts['statement_timeout_ms']:
+        connect_args['options'] = f"-c statement_timeout={int(opts['statement_timeout_ms'])}"
 
-from sqlalchemy import create_engine
-from .config import DB_CONFIG
-from sqlalchemy.pool import NullPool
-#DATABASE_URL = f"postgresql+psycopg2://{USER}:{PASSWORD}@{HOST}:{PORT}/{DBNAME}?sslmode=require"
-def get_engine():
-    """Создаёт подключение к БД из конфига"""
     return create_engine(
-        f"postgresql+psycopg2://{DB_CONFIG['user']}:{DB_CONFIG['password']}"
-        f"@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['dbname']}?sslmode=require"
+        _database_url(config, 'psycopg2'),
+        pool_size=opts['pool_size'],
+        max_overflow=opts['max_overflow'],
+        pool_timeout=opts['pool_timeout'],
+        pool_recycle=opts['pool_recycle'],
+        pool_pre_ping=opts['pool_pre_ping'],
+        connect_args=connect_args,
     )
-    
\ No newline at end of file
+
+
+def get_engine(name='default', **options):
+    """
+    Общий engine процесса из реестра; создаётся при первом вызове.
+
+    Параметры:
+    - name: имя подключения (разные имена — разные пулы)
+    - options: параметры из ENGINE_DEFAULTS; если engine с этим именем уже создан
+      с другими параметрами — ValueError (без параметров возвращается существующий)
+    """
+    engine = _ENGINES.get(name)
+    if engine is None:
+        with _LOCK:
+            engine = _ENGINES.get(name)
+            if engine is None:
+                engine = _ENGINES[name] = create_db_engine(**options)
+                _ENGINE_OPTIONS[('sync', name)] = _options(options)
+                return engine
+    _check_options('sync', name, options)
+    return engine
+
+
+def get_async_engine(name='default', **options):
+    """
+    Асинхронный engine (asyncpg) для параллельных запросов; создаётся при первом вызове.
+
+    Требует установленного asyncpg. Параметры — как у get_engine.
+    """
+    engine = _ASYNC_ENGINES.get(name)
+    if engine is None:
+        with _LOCK:
+            engine = _ASYNC_ENGINES.get(name)
+            if engine is None:
+                from sqlalchemy.ext.asyncio import create_async_engine
+
+                opts = _options(options)
+                server_settings = {'application_name': opts['application_name']}
+                if opts['statement_timeout_ms']:
+                    server_settings['statement_timeout'] = str(int(opts['statement_timeout_ms']))
+                engine = _ASYNC_ENGINES[name] = create_async_engine(
+                    _database_url(_db_config(), 'asyncpg'),
+                    pool_size=opts['pool_size'],
+                    max_overflow=opts['max_overflow'],
+                    pool_timeout=opts['pool_timeout'],
+                    pool_recycle=opts['pool_recycle'],
+                    pool_pre_ping=opts['pool_pre_ping'],
+                    connect_args={
+                        'ssl': opts['sslmode'] if opts['sslmode'] != 'disable' else False,
+                        'server_settings': server_settings,
+                    },
+                )
+                _ENGINE_OPTIONS[('async', name)] = opts
+                return engine
+    _check_options('async', name, options)
+    return engine
+
+
+async def run_queries_async(queries, params=None, name='default'):
+    """
+    Выполняет несколько запросов параллельно на асинхронном engine.
+
+    Параметры:
+    - queries: {имя: SQL}
+    - params: общие параметры запросов
+
+    Возвращает:
+    - {имя: pd.DataFrame}
+    """
+    import asyncio
+
+    import pandas as pd
+    from sqlalchemy import text
+
+    engine = get_async_engine(name)
+
+    async def fetch(query_str):
+        async with engine.connect() as conn:
+            result = await conn.execute(text(query_str), params or {})
+            return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+    frames = await asyncio.gather(*(fetch(q) for q in queries.values()))
+    return dict(zip(queries, frames))
+
+
+def dispose_engines():
+    """Закрывает пулы всех engine из реестра (например, перед fork или в конце задачи)."""
+    with _LOCK:
+        for engine in _ENGINES.values():
+            engine.dispose()
+        for engine in _ASYNC_ENGINES.values():
+            engine.sync_engine.dispose()
+        _ENGINES.clear()
+        _ASYNC_ENGINES.clear()
+        _ENGINE_OPTIONS.clear()
@@ -0,0 +1,198 @@
+# src.dedup.py
+"""
+Поиск дубликатов по 64-битным хэшам строк.
+
+Хэш строки считается один раз (векторно по колонкам, pd.util.hash_array), после чего маски полных дубликатов и дубликатов по ключу — это
+duplicated() по массиву uint64, а не повторное хэширование всего DataFrame.
+
+HashIndex хранит хэши уже загруженных строк и ключей по таблицам между
+файлами и запусками: новая выгрузка той же таблицы очищается от уже
+загруженных строк без чтения старых данных.
+
+Совпадение 64-битных хэшей у разных строк возможно, но маловероятно
+(порядка n² / 2^65: ~3·10⁻⁸ для миллиона строк).
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+
+_NAN_HASH = pd.util.hash_array(np.array([np.nan]))[0]
+_FRACTION_SALT = np.uint64(0x9E3779B97F4A7C15)  # отделяет хэши дробных чисел от хэшей целых
+
+
+def _integer_hashes(values):
+    """Хэш целых (и флагов) по значению int64 без потери точности; пропуск — как NaN."""
+    missing = values.isna().to_numpy()
+    ints = values.to_numpy(dtype=np.uint64 if pd.api.types.is_unsigned_integer_dtype(values) else np.int64,
+                           na_value=0).view(np.int64)
+    hashes = pd.util.hash_array(ints)
+    hashes[missing] = _NAN_HASH
+    return hashes
+
+
+def _float_hashes(values):
+    """Хэш float: целые значения — как int64 (1.0 и 1 совпадают), дробные — по float64."""
+    floats = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(invalid='ignore'):
+        whole = np.isfinite(floats) & (floats == np.floor(floats)) & (np.abs(floats) < 2.0**63)
+    hashes = pd.util.hash_array(floats) ^ _FRACTION_SALT
+    hashes[whole] = pd.util.hash_array(floats[whole].astype(np.int64))
+    hashes[np.isnan(floats)] = _NAN_HASH
+    return hashes
+
+
+def column_hashes(values):
+    """
+    64-битный хэш каждого значения колонки.
+
+    Целые и флаги хэшируются как int64 (без приведения к float64, которое склеивает
+    id больше 2^53), целые значения float-колонок — так же, чтобы 1 и 1.0 из разных
+    выгрузок давали один хэш. Строки хэшируются только по уникальным значениям
+    (factorize), поэтому повторяющиеся id и категории не хэшируются заново.
+    """
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_integer_dtype(values):
+        return _integer_hashes(values)
+    if pd.api.types.is_numeric_dtype(values):
+        return _float_hashes(values)
+    if pd.api.types.is_datetime64_any_dtype(values) or isinstance(values.dtype, pd.CategoricalDtype):
+        return pd.util.hash_pandas_object(values, index=False).to_numpy()
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return pd.util.hash_array(np.asarray(uniques, dtype=object), categorize=False)[codes]
+
+
+def combine_hashes(hashes, n):
+    """Сводит хэши колонок в хэш строки (порядок колонок важен)."""
+    result = np.full(n, 0x345678, dtype=np.uint64)
+    mult = np.uint64(1_000_003)
+    for i, h in enumerate(hashes):
+        result ^= h
+        result *= mult
+        mult += np.uint64(82_520 + 2 * (len(hashes) - i))
+    return result + np.uint64(97_531)
+
+
+def row_hashes(df, columns=None):
+    """
+    64-битный хэш каждой строки по колонкам columns (по умолчанию — все).
+
+    Возвращает:
+    -----------
+    np.ndarray[uint64] длины len(df)
+    """
+    columns = list(df.columns) if columns is None else list(columns)
+    return combine_hashes([column_hashes(df[col]) for col in columns], len(df))
+
+
+def duplicate_mask(hashes, keep='first'):
+    """Маска повторов по массиву хэшей (keep — как в DataFrame.duplicated)."""
+    return pd.Series(hashes, copy=False).duplicated(keep=keep).to_numpy()
+
+
+def _isin_sorted(values, sorted_values):
+    """values ∈ sorted_values через бинарный поиск."""
+    if not len(sorted_values):
+        return np.zeros(len(values), dtype=bool)
+    pos = np.searchsorted(sorted_values, values)
+    pos[pos == len(sorted_values)] = 0
+    return sorted_values[pos] == values
+
+
+class HashIndex:
+    """
+    Индекс хэшей загруженных строк и ключей по таблицам.
+
+    Параметры:
+    ----------
+    path : str, optional
+        Файл .npz для сохранения между запусками; загружается, если существует
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.rows = {}  # таблица → отсортированные хэши строк
+        self.keys = {}  # (таблица, ключ) → отсортированные хэши значений ключа
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def _get(self, store, table):
+        return store.get(table, np.zeros(0, dtype=np.uint64))
+
+    def seen_rows(self, table, hashes):
+        """Маска строк, уже загруженных в таблицу."""
+        return _isin_sorted(hashes, self._get(self.rows, table))
+
+    def seen_keys(self, table, key, key_hashes):
+        """Маска значений ключа key, уже загруженных в таблицу."""
+        return _isin_sorted(key_hashes, self._get(self.keys, (table, key)))
+
+    def add(self, table, hashes, key=None, key_hashes=None):
+        """Добавляет хэши загруженных строк (и значений ключа key) таблицы."""
+        self.rows[table] = np.union1d(self._get(self.rows, table), hashes)
+        if key is not None:
+            self.keys[(table, key)] = np.union1d(self._get(self.keys, (table, key)), key_hashes)
+        return self
+
+    def save(self, path=None):
+        """Сохраняет индекс в .npz (по массиву на таблицу и ключ)."""
+        path = path or self.path
+        arrays = {f'rows:{table}': h for table, h in self.rows.items()}
+        arrays.update({f'keys:{table}:{key}': h for (table, key), h in self.keys.items()})
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+
+    def load(self, path):
+        with np.load(path) as data:
+            for name in data.files:
+                kind, rest = name.split(':', 1)
+                if kind == 'rows':
+                    self.rows[rest] = data[name]
+                else:
+                    table, key = rest.rsplit(':', 1)
+                    self.keys[(table, key)] = data[name]
+        return self
+
+
+def deduplicate(df, key=None, table=None, index=None):
+    """
+    Удаляет полные дубликаты и дубликаты по ключу за один проход хэширования строк.
+
+    Параметры:
+    ----------
+    df : pd.DataFrame
+    key : str или list, optional
+        Первичный ключ; из повторов по ключу остаётся первая строка
+    table : str, optional
+        Имя таблицы в index
+    index : HashIndex, optional
+        Строки и ключи, уже загруженные ранее, тоже считаются дубликатами;
+        оставшиеся строки добавляются в индекс
+
+    Возвращает:
+    -----------
+    tuple: (DataFrame без дубликатов, {'full': ..., 'key': ..., 'seen': ...} — сколько строк удалено)
+    """
+    hashes = row_hashes(df)
+    full = duplicate_mask(hashes)
+    seen = index.seen_rows(table, hashes) & ~full if index is not None else np.zeros(len(df), dtype=bool)
+    drop = full | seen
+
+    key_name, key_hashes = None, None
+    key_drop = np.zeros(len(df), dtype=bool)
+    if key is not None:
+        key = [key] if isinstance(key, str) else list(key)
+        key_name = ','.join(key)
+        key_hashes = row_hashes(df, key)
+        key_drop[~drop] = duplicate_mask(key_hashes[~drop])
+        if index is not None:
+            key_drop |= index.seen_keys(table, key_name, key_hashes) & ~drop
+        drop |= key_drop
+
+    keep = ~drop
+    if index is not None:
+        index.add(table, hashes[keep], key_name, key_hashes[keep] if key_hashes is not None else None)
+
+    counts = {'full': int(full.sum()), 'key': int(key_drop.sum()), 'seen': int(seen.sum())}
+    return (df[keep] if drop.any() else df), counts
@@ -1,51 +1,77 @@
 #src.drirvers.py
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 
-def add_seasonality_traces(fig, dataframe, row, title):
-    # агрегация
+def add_seasonality_traces(fig, dataframe, row, title, top_n=3, other_name='Другие категории'):
+    # агрегация: один groupby, строки отсортированы по категории и месяцу
     df_seas = (
         dataframe
-        .groupby(['month','category_name_translated'], as_index=False)
+        .groupby(['category_name_translated', 'month'], as_index=False, sort=True)
         ['category_gmv'].sum()
     )
     last = df_seas['month'].max()
-    top5 = (
-        df_seas[df_seas['month']==last]
-        .nlargest(3,'category_gmv')['category_name_translated']
-        .tolist()
-    )
-    gradient = px.colors.sequential.Blues_r[:5]
-    cats = df_seas['category_name_translated'].unique()
-    cmap = {c:(gradient[top5.index(c)] if c in top5 else '#CCCCCC') for c in cats}
+    last_gmv = df_seas[df_seas['month'] == last].nlargest(top_n, 'category_gmv')
+    top5 = last_gmv['category_name_translated'].tolist()
+    # оттенки от тёмного к светлому для любого top_n (светлые концы шкалы не берём — плохо видны)
+    gradient = px.colors.sample_colorscale('Blues_r', np.linspace(0, 0.75, max(len(top5), 2)).tolist())
+
+    # разбиение на категории за один проход: границы групп в отсортированном фрейме
+    cats = df_seas['category_name_translated'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, cats[1:] != cats[:-1]])
+    bounds = dict(zip(cats[starts], zip(starts, np.r_[starts[1:], len(df_seas)])))
+    months = df_seas['month'].to_numpy()
+    gmv = df_seas['category_gmv'].to_numpy(dtype=float)
 
-    # линии
-    for cat in cats:
-        d = df_seas[df_seas['category_name_translated']==cat]
+    # остальные категории — одна трасса, линии разделены NaN
+    is_top = np.isin(cats, top5)
+    other_starts = starts[~np.isin(cats[starts], top5)]
+    if len(other_starts):
+        other_idx = np.flatnonzero(~is_top)
+        # после последней точки каждой категории вставляется разрыв (NaT / NaN):
+        # ось X остаётся датой, y — без округления, как у линий топ-категорий
+        breaks = np.searchsorted(other_idx, np.r_[other_starts[1:], len(df_seas)])
+        gap = np.datetime64('NaT') if np.issubdtype(months.dtype, np.datetime64) else None
+        x = np.insert(months[other_idx], breaks, gap)
+        y = np.insert(gmv[other_idx], breaks, np.nan)
+        text = np.insert(cats[other_idx], breaks, '')
         fig.add_trace(
             go.Scatter(
-                x=d.month, y=d.category_gmv,
+                x=x, y=y, text=text,
                 mode='lines',
-                line=dict(color=cmap[cat], width=(3 if cat in top5 else 1)),
-                name=cat, showlegend=(cat in top5),
+                line=dict(color='#CCCCCC', width=1),
+                name=other_name, showlegend=False,
+                hovertemplate='%{text}<br>%{x}: %{y:,.0f}<extra></extra>',
+                connectgaps=False,
                 legendgroup=title
             ), row=row, col=1
         )
-    # маркеры + подписи
-    for i,cat in enumerate(top5):
-        y = df_seas.loc[(df_seas.month==last)&(df_seas.category_name_translated==cat),'category_gmv'].iloc[0]
+
+    # линии топ-категорий
+    for i, cat in enumerate(top5):
+        lo, hi = bounds[cat]
         fig.add_trace(
             go.Scatter(
-                x=[last], y=[y],
-                mode='markers+text',
-                marker=dict(color=gradient[i],size=8),
-                text=[f"{cat}"],
-                textposition="middle right",
-                showlegend=False, legendgroup=title
+                x=months[lo:hi], y=gmv[lo:hi],
+                mode='lines',
+                line=dict(color=gradient[i], width=3),
+                name=cat, showlegend=True,
+                legendgroup=title
             ), row=row, col=1
         )
+    # маркеры + подписи: одна трасса на все топ-категории
+    fig.add_trace(
+        go.Scatter(
+            x=[last] * len(top5), y=last_gmv['category_gmv'].tolist(),
+            mode='markers+text',
+            marker=dict(color=gradient[:len(top5)], size=8),
+            text=top5,
+            textposition="middle right",
+            showlegend=False, legendgroup=title
+        ), row=row, col=1
+    )
     # расширяем ось X
     fig.update_xaxes(
         range=[df_seas.month.min(), last + pd.Timedelta(days=110)],
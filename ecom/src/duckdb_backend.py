@@ -0,0 +1,272 @@
+# src.duckdb_backend.py
+"""
+Локальный аналитический бэкенд на DuckDB (in-process).
+
+Те же SQL-запросы метрик и проверки ключей/пропусков выполняются прямо
+по CSV/Parquet в ecom/datasets или по словарю DataFrame из load_and_inspect,
+без похода в Postgres. DataFrame и pyarrow.Table регистрируются как
+представления без копирования (DuckDB читает их колонки напрямую через Arrow),
+результат можно забрать как DataFrame или pyarrow.Table.
+
+Postgres остаётся основной базой: бэкенд только читает данные.
+
+    with DuckDBBackend('datasets') as db:
+        db.build_marts()
+        db.run_metric('repeat_purchase_rate')
+        db.run("SELECT order_status, COUNT(*) FROM orders GROUP BY 1")
+
+Требует пакета duckdb (pip install duckdb); импортируется при создании бэкенда.
+"""
+
+import os
+import re
+
+import pandas as pd
+
+from .chains_validation import print_validation_results
+from .column_catalog import to_snake_case
+from .marts import MARTS, METRIC_QUERIES
+
+FILE_READERS = {
+    '.csv': "read_csv_auto('{path}', header=true)",
+    '.parquet': "read_parquet('{path}')",
+}
+
+# :name → $name; '::' (приведение типов) и ':' внутри строк не трогаются
+_PARAM_PATTERN = re.compile(r"('(?:[^']|'')*')|(?<![:\w]):([A-Za-z_]\w*)")
+
+
+def _import_duckdb():
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ImportError("DuckDB-бэкенд требует пакет duckdb: pip install duckdb") from e
+    return duckdb
+
+
+def translate_params(query_str):
+    """Переводит параметры SQLAlchemy (:name) в именованные параметры DuckDB ($name)."""
+    return _PARAM_PATTERN.sub(lambda m: m.group(1) or f'${m.group(2)}', query_str)
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class DuckDBBackend:
+    """
+    Подключение DuckDB с зарегистрированными таблицами Olist.
+
+    Параметры:
+    ----------
+    source : str, dict или None
+        Каталог с CSV/Parquet (имя таблицы — имя файла) или {имя: DataFrame / pyarrow.Table}
+    database : str
+        ':memory:' или путь к файлу DuckDB
+    threads : int, optional
+        Число потоков DuckDB (по умолчанию — все ядра)
+    normalize_columns : bool
+        Переименовывать колонки файлов в snake_case, как load_and_inspect
+    """
+
+    def __init__(self, source=None, database=':memory:', threads=None, normalize_columns=True):
+        duckdb = _import_duckdb()
+        self.con = duckdb.connect(database)
+        if threads:
+            self.con.execute(f'SET threads = {int(threads)}')
+        self.normalize_columns = normalize_columns
+        self.tables = {}
+
+        if isinstance(source, dict):
+            for name, data in source.items():
+                self.register(name, data)
+        elif source is not None:
+            self.register_folder(source)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.con.close()
+
+    # ------------------------------------------------------------------
+    # Регистрация данных
+    # ------------------------------------------------------------------
+    def register(self, name, data):
+        """Регистрирует DataFrame или pyarrow.Table как представление (без копирования)."""
+        self.con.register(name, data)
+        self.tables[name] = 'memory'
+        return self
+
+    def register_file(self, name, path):
+        """Регистрирует CSV/Parquet как представление; файл читается при каждом запросе."""
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in FILE_READERS:
+            raise ValueError(f"Неподдерживаемый формат файла: {path}")
+        reader = FILE_READERS[ext].format(path=os.path.abspath(path).replace("'", "''"))
+
+        select = '*'
+        if self.normalize_columns:
+            columns = [row[0] for row in self.con.execute(f'DESCRIBE SELECT * FROM {reader}').fetchall()]
+            select = ', '.join(f'{_quote(col)} AS {_quote(to_snake_case(col))}' for col in columns)
+        self.con.execute(f'CREATE OR REPLACE VIEW {_quote(name)} AS SELECT {select} FROM {reader}')
+        self.tables[name] = path
+        return self
+
+    def register_folder(self, folder):
+        """Регистрирует все CSV/Parquet каталога (Parquet приоритетнее CSV с тем же именем)."""
+        if not os.path.isdir(folder):
+            raise FileNotFoundError(f"Каталог {folder} не существует")
+        files = {}
+        for file in sorted(os.listdir(folder)):
+            name, ext = os.path.splitext(file)
+            if ext.lower() in FILE_READERS and (name not in files or ext.lower() == '.parquet'):
+                files[name] = os.path.join(folder, file)
+        for name, path in files.items():
+            self.register_file(name, path)
+        return self
+
+    def materialize(self, name):
+        """Копирует представление в таблицу DuckDB (файл разбирается один раз, а не на каждый запрос)."""
+        staging = _quote(f'{name}__materialized')
+        self.con.execute(f'CREATE OR REPLACE TABLE {staging} AS SELECT * FROM {_quote(name)}')
+        if self.tables[name] == 'memory':
+            self.con.unregister(name)
+        else:
+            self.con.execute(f'DROP VIEW IF EXISTS {_quote(name)}')
+        self.con.execute(f'ALTER TABLE {staging} RENAME TO {_quote(name)}')
+        self.tables[name] = 'table'
+        return self
+
+    # ------------------------------------------------------------------
+    # Запросы
+    # ------------------------------------------------------------------
+    def run(self, query_str, params=None, fetch='df'):
+        """
+        Выполняет SQL (синтаксис параметров как у QueryService.run).
+
+        Параметры:
+        - query_str: SQL-запрос (с :placeholder если нужны параметры)
+        - params: dict с параметрами
+        - fetch: df / arrow / all / one / scalar
+
+        Возвращает:
+        - DataFrame, pyarrow.Table, список строк, одну строку или скаляр
+        """
+        if fetch not in ('df', 'arrow', 'all', 'one', 'scalar'):
+            raise ValueError("fetch должен быть 'df', 'arrow', 'all', 'one' или 'scalar'")
+        sql = translate_params(query_str)
+        used = set(re.findall(r'\$([A-Za-z_]\w*)', sql))
+        params = {k: v for k, v in (params or {}).items() if k in used}
+        result = self.con.execute(sql, params) if params else self.con.execute(sql)
+
+        if fetch == 'df':
+            return result.df()
+        elif fetch == 'arrow':
+            return result.arrow()
+        elif fetch == 'all':
+            return result.fetchall()
+        row = result.fetchone()
+        if fetch == 'one':
+            return row
+        return row[0] if row is not None else None
+
+    def build_marts(self, marts=None):
+        """
+        Собирает витрины из marts.MARTS полным пересчётом (в Postgres они обновляются инкрементально).
+
+        Возвращает:
+        -----------
+        dict: {витрина: число строк}
+        """
+        sizes = {}
+        for name in marts or list(MARTS):
+            select = MARTS[name]['select'].format(key_filter='TRUE')
+            self.con.execute(f'CREATE OR REPLACE TABLE {_quote(name)} AS {select}')
+            self.tables[name] = 'table'
+            sizes[name] = self.run(f'SELECT COUNT(*) FROM {_quote(name)}', fetch='scalar')
+        return sizes
+
+    def run_metric(self, metric, params=None):
+        """Считает метрику из marts.METRIC_QUERIES по локальным витринам (см. build_marts)."""
+        return self.run(METRIC_QUERIES[metric], params)
+
+    # ------------------------------------------------------------------
+    # Проверки данных
+    # ------------------------------------------------------------------
+    def _columns(self, table):
+        return [row[0] for row in self.con.execute(f'DESCRIBE {_quote(table)}').fetchall()]
+
+    def validate_foreign_keys(self, fk_dict, verbose=True):
+        """
+        Проверка внешних ключей anti-join'ом в DuckDB.
+
+        Формат fk_dict и результата — как у chains_validation.validate_foreign_keys.
+        """
+        results = {}
+        valid_fk_dict = {}
+        for table, relations in fk_dict.items():
+            if table not in self.tables:
+                if verbose:
+                    print(f"⚠️ Таблица '{table}' не найдена в данных, пропускаем")
+                continue
+            columns = self._columns(table)
+            valid_relations = {}
+
+            for fk_col, ref in relations.items():
+                try:
+                    ref_table, ref_col = ref.replace(")", "").split("(")
+                except ValueError:
+                    results[f"{table}.{fk_col}"] = (None, None, "⚠️ Некорректный формат ссылки")
+                    continue
+                relation_key = f"{table}.{fk_col} → {ref_table}.{ref_col}"
+
+                if ref_table not in self.tables:
+                    results[relation_key] = (None, None, "⚠️ Референсная таблица не найдена")
+                    continue
+                if fk_col not in columns:
+                    results[relation_key] = (None, None, f"⚠️ Колонка '{fk_col}' не найдена в таблице '{table}'")
+                    continue
+                if ref_col not in self._columns(ref_table):
+                    results[relation_key] = (None, None, f"⚠️ Колонка '{ref_col}' не найдена в таблице '{ref_table}'")
+                    continue
+
+                total, num_missing = self.con.execute(f"""
+                    SELECT COUNT(*), COUNT(*) FILTER (WHERE r.ref IS NULL)
+                    FROM {_quote(table)} t
+                    LEFT JOIN (SELECT DISTINCT {_quote(ref_col)} AS ref FROM {_quote(ref_table)}) r
+                      ON t.{_quote(fk_col)} = r.ref
+                """).fetchone()
+                pct_missing = round(100 * num_missing / total, 2) if total > 0 else 0
+                results[relation_key] = (num_missing, pct_missing, table)
+                if num_missing == 0:
+                    valid_relations[fk_col] = f"{ref_table}({ref_col})"
+
+            if valid_relations:
+                valid_fk_dict[table] = valid_relations
+
+        if verbose:
+            print_validation_results(results, valid_fk_dict)
+        return results, valid_fk_dict
+
+    def missing_summary(self, tables=None):
+        """
+        Пропуски по колонкам таблиц одним запросом на таблицу.
+
+        Возвращает:
+        -----------
+        pd.DataFrame: table, column, missing_count, missing_percent (только колонки с пропусками)
+        """
+        rows = []
+        for table in tables or list(self.tables):
+            columns = self._columns(table)
+            counts = ', '.join(f'COUNT(*) - COUNT({_quote(col)})' for col in columns)
+            total, *missing = self.con.execute(f'SELECT COUNT(*), {counts} FROM {_quote(table)}').fetchone()
+            for col, count in zip(columns, missing):
+                if count:
+                    rows.append({'table': table, 'column': col, 'missing_count': count,
+                                 'missing_percent': round(100 * count / total, 2)})
+        return pd.DataFrame(rows, columns=['table', 'column', 'missing_count', 'missing_percent'])
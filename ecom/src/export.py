@@ -0,0 +1,141 @@
+# src.export.py
+"""
+Пакетный экспорт фигур дашбордов (GMV, ARPU, LTV, Pareto, NPS, когорты).
+
+- Все изображения рендерятся одним вызовом pio.write_images: Kaleido
+  запускает браузер один раз на пачку, а не на каждую картинку
+- HTML пишется параллельно в пуле потоков
+- Имя файла содержит хэш JSON фигуры и параметров рендера формата: фигуры
+  с неизменёнными данными и настройками не перерисовываются, устаревшие
+  версии удаляются
+"""
+
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import plotly.io as pio
+from tabulate import tabulate
+
+IMAGE_FORMATS = ('png', 'svg', 'pdf', 'jpeg', 'jpg', 'webp')
+FORMATS = ('html',) + IMAGE_FORMATS
+HASH_LENGTH = 16
+
+
+def figure_hash(fig, options=None, length=HASH_LENGTH):
+    """Хэш содержимого фигуры (данные + layout) и параметров рендера options."""
+    digest = hashlib.sha256(fig.to_json().encode('utf-8'))
+    if options is not None:
+        digest.update(json.dumps(options, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()[:length]
+
+
+def _render_options(fmt, width, height, scale, include_plotlyjs):
+    """Параметры, от которых зависит файл формата fmt."""
+    if fmt == 'html':
+        return {'format': fmt, 'include_plotlyjs': include_plotlyjs}
+    return {'format': fmt, 'width': width, 'height': height, 'scale': scale}
+
+
+def _remove_stale(out_dir, name, fmt, keep):
+    """
+    Удаляет прежние версии фигуры name: файлы ровно вида name-<16 hex>.fmt.
+
+    Фигуры с общим префиксом имени (gmv и gmv-by-state) друг друга не трогают.
+    """
+    pattern = re.compile(rf'{re.escape(name)}-[0-9a-f]{{{HASH_LENGTH}}}\.{re.escape(fmt)}')
+    for filename in os.listdir(out_dir):
+        path = os.path.join(out_dir, filename)
+        if pattern.fullmatch(filename) and path != keep:
+            os.remove(path)
+
+
+def _write_images(figs, paths, width=None, height=None, scale=None):
+    """Рендерит пачку изображений; при Kaleido < 1.0 — по одному через общий процесс."""
+    if not figs:
+        return
+    if hasattr(pio, 'write_images'):
+        try:
+            pio.write_images(fig=figs, file=paths, width=width, height=height, scale=scale)
+            return
+        except (ValueError, RuntimeError):
+            pass  # старый Kaleido: write_images не поддерживается
+    for fig, path in zip(figs, paths):
+        pio.write_image(fig, path, width=width, height=height, scale=scale)
+
+
+def _write_html(fig, path, include_plotlyjs):
+    fig.write_html(path, include_plotlyjs=include_plotlyjs, full_html=True)
+
+
+def export_figures(figures, out_dir='figures', formats=('png', 'html'), width=None, height=None,
+                   scale=2, max_workers=4, include_plotlyjs='cdn', cleanup=True, verbose=True):
+    """
+    Экспортирует набор фигур в PNG/SVG/HTML с кэшированием по содержимому.
+
+    Параметры:
+    ----------
+    figures : dict или list
+        {имя: go.Figure} или список фигур (имена fig_0, fig_1, ...)
+    out_dir : str
+        Каталог для файлов
+    formats : tuple
+        Форматы: png, svg, pdf, jpeg, webp, html
+    width, height, scale : int, optional
+        Размер изображений
+    max_workers : int
+        Потоки для записи HTML
+    include_plotlyjs : str или bool
+        Как подключать plotly.js в HTML ('cdn' — ссылка, True — встроить)
+    cleanup : bool
+        Удалять файлы предыдущих версий фигуры
+
+    Возвращает:
+    -----------
+    pd.DataFrame: name, format, path, status ('rendered' / 'cached')
+    """
+    if not isinstance(figures, dict):
+        figures = {f'fig_{i}': fig for i, fig in enumerate(figures)}
+    formats = [fmt.lower() for fmt in formats]
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown:
+        raise ValueError(f"Неизвестный формат: {', '.join(unknown)}; доступны {FORMATS}")
+    os.makedirs(out_dir, exist_ok=True)
+
+    report = []
+    pending_images, pending_html = [], []
+    for name, fig in figures.items():
+        if fig is None:
+            continue
+        for fmt in formats:
+            digest = figure_hash(fig, _render_options(fmt, width, height, scale, include_plotlyjs))
+            path = os.path.join(out_dir, f'{name}-{digest}.{fmt}')
+            if cleanup:
+                _remove_stale(out_dir, name, fmt, keep=path)
+
+            status = 'cached' if os.path.exists(path) else 'rendered'
+            if status == 'rendered':
+                if fmt == 'html':
+                    pending_html.append((fig, path))
+                else:
+                    pending_images.append((fig, path))
+            report.append({'name': name, 'format': fmt, 'path': path, 'status': status})
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        html_jobs = [pool.submit(_write_html, fig, path, include_plotlyjs) for fig, path in pending_html]
+        # Изображения рендерятся в основном потоке, пока HTML пишется в пуле
+        _write_images([fig for fig, _ in pending_images], [path for _, path in pending_images],
+                      width=width, height=height, scale=scale)
+        for job in html_jobs:
+            job.result()
+
+    report = pd.DataFrame(report, columns=['name', 'format', 'path', 'status'])
+    if verbose:
+        print(f"\n🖼️ Экспорт фигур: отрисовано {len(pending_images) + len(pending_html)}, "
+              f"из кэша {int((report['status'] == 'cached').sum())}")
+        print(tabulate(report, headers=['Фигура', 'Формат', 'Файл', 'Статус'],
+                       tablefmt='Pretty_Table', showindex=False))
+    return report
@@ -0,0 +1,128 @@
+# src.funnel.py
+"""
+Воронка marketing_qualified → closed_deals.
+
+Лаг «первый контакт → закрытие сделки» считается один раз на mql_id,
+после чего конверсия для любого окна и любой разбивки (origin,
+business_segment, ...) берётся из кумулятивной гистограммы лагов.
+Перебор окон 1–365 дней — один проход вместо 365 запросов.
+"""
+
+import numpy as np
+import pandas as pd
+
+NO_CLOSE = -1  # лид не закрыт (или закрыт раньше первого контакта)
+
+
+def lead_lags(mql, deals, date_from=None, date_to=None):
+    """
+    Лаг закрытия сделки в целых днях для каждого лида.
+
+    Лаг округляется вверх: сделка, закрытая через 59 дней и 3 часа,
+    попадает в окно 60 дней, что совпадает с условием
+    won_date BETWEEN first_contact_date AND first_contact_date + INTERVAL '60 day'.
+
+    Параметры:
+    ----------
+    mql : pd.DataFrame
+        marketing_qualified (mql_id, first_contact_date, origin, ...)
+    deals : pd.DataFrame
+        closed_deals (mql_id, won_date, business_segment, ...)
+    date_from, date_to : str или datetime, optional
+        Фильтр по first_contact_date (включительно)
+
+    Возвращает:
+    -----------
+    pd.DataFrame: колонки mql, 'business_segment' из deals и 'lag_days' (NO_CLOSE для незакрытых)
+    """
+    first_contact = pd.to_datetime(mql['first_contact_date'])
+    keep = np.ones(len(mql), dtype=bool)
+    if date_from is not None:
+        keep &= (first_contact >= pd.Timestamp(date_from)).to_numpy()
+    if date_to is not None:
+        keep &= (first_contact <= pd.Timestamp(date_to)).to_numpy()
+    leads = mql.loc[keep].reset_index(drop=True)
+    first_contact = first_contact[keep].reset_index(drop=True)
+
+    # Сопоставление по mql_id через индекс — без полного merge
+    deals = deals.drop_duplicates(subset='mql_id')
+    pos = pd.Index(deals['mql_id']).get_indexer(leads['mql_id'])
+    matched = pos >= 0
+
+    won = np.full(len(leads), np.datetime64('NaT'), dtype='datetime64[ns]')
+    won[matched] = pd.to_datetime(deals['won_date']).to_numpy()[pos[matched]]
+    lag = (won - first_contact.to_numpy()) / np.timedelta64(1, 'D')
+
+    lag_days = np.full(len(leads), NO_CLOSE, dtype=np.int64)
+    closed = np.isfinite(lag) & (lag >= 0)
+    lag_days[closed] = np.ceil(lag[closed]).astype(np.int64)
+
+    result = leads.copy()
+    if 'business_segment' in deals.columns and 'business_segment' not in result.columns:
+        segment = np.full(len(leads), None, dtype=object)
+        segment[matched] = deals['business_segment'].to_numpy()[pos[matched]]
+        result['business_segment'] = segment
+    result['lag_days'] = lag_days
+    return result
+
+
+def conversion_curve(lags, max_days=365, by=None):
+    """
+    Конверсия в закрытую сделку для всех окон 0..max_days дней.
+
+    Параметры:
+    ----------
+    lags : pd.DataFrame
+        Результат lead_lags
+    max_days : int
+        Максимальное окно
+    by : str, optional
+        Колонка разбивки ('origin', 'business_segment', ...).
+        business_segment известен только для закрытых сделок, поэтому по нему
+        кривая показывает долю сделок, закрытых в пределах окна
+
+    Возвращает:
+    -----------
+    pd.DataFrame: индекс — окно в днях, колонки — группы (или 'all'), значения — конверсия в %
+    """
+    lag = lags['lag_days'].to_numpy()
+    if by is None:
+        codes, groups = np.zeros(len(lags), dtype=np.int64), pd.Index(['all'])
+    else:
+        codes, groups = pd.factorize(lags[by].fillna('неизвестный'), sort=True)
+
+    n_groups, width = len(groups), max_days + 1
+    leads = np.bincount(codes, minlength=n_groups)
+
+    within = (lag >= 0) & (lag <= max_days)
+    hist = np.bincount(codes[within] * width + lag[within], minlength=n_groups * width)
+    closed = np.cumsum(hist.reshape(n_groups, width), axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = closed / leads[:, None] * 100
+
+    return pd.DataFrame(rate.T, index=pd.RangeIndex(width, name='days'), columns=groups)
+
+
+def conversion_table(lags, days=60, by=None):
+    """
+    Лиды, закрытые лиды и конверсия за окно days дней — как SQL-запрос из ноутбука.
+
+    Возвращает:
+    -----------
+    pd.DataFrame с колонками [by,] 'leads', 'closed_leads', 'conversion_rate'
+    """
+    lag = lags['lag_days'].to_numpy()
+    frame = pd.DataFrame({'closed': (lag >= 0) & (lag <= days)})
+    if by is None:
+        leads, closed = len(frame), int(frame['closed'].sum())
+        return pd.DataFrame({
+            'leads': [leads],
+            'closed_leads': [closed],
+            'conversion_rate': [round(closed / leads * 100, 2) if leads else np.nan],
+        })
+
+    frame[by] = lags[by].fillna('неизвестный').to_numpy()
+    table = frame.groupby(by, sort=False)['closed'].agg(leads='size', closed_leads='sum').reset_index()
+    table['conversion_rate'] = (table['closed_leads'] / table['leads'] * 100).round(2)
+    return table.sort_values('conversion_rate', ascending=False, ignore_index=True)
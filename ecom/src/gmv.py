@@ -4,8 +4,10 @@ import plotly.graph_objects as go  # Интерактивные графики
 import plotly.io as pio  # Настройки рендеринга
 from plotly.subplots import make_subplots
 
+from .plotly_utils import finish_figure
+
 #src.gmv.py
-def plot_gmv_dynamics(df_growth, custom_palette):
+def plot_gmv_dynamics(df_growth, custom_palette, show=False, as_json=False):
     """
     Визуализирует помесячную динамику GMV и прирост GMV (MoM).
 
@@ -19,6 +21,16 @@ def plot_gmv_dynamics(df_growth, custom_palette):
 
     custom_palette : list
         Цветовая палитра, минимум два цвета: [положительный прирост, отрицательный прирост]
+
+    show : bool
+        Показать фигуру сразу (по умолчанию фигура только возвращается)
+
+    as_json : bool
+        Вернуть также компактный JSON фигуры
+
+    Возвращает:
+    -----------
+    go.Figure или (go.Figure, str)
     """
 
     df_growth = df_growth.copy()
@@ -77,5 +89,5 @@ def plot_gmv_dynamics(df_growth, custom_palette):
                      zeroline=True, zerolinewidth=1, zerolinecolor='gray',
                      range=[-50, 120])
 
-    fig.show()
+    return finish_figure(fig, show=show, as_json=as_json)
 
@@ -0,0 +1,379 @@
+# src.imputation.py
+"""
+Заполнение пропусков по рекомендациям analyze_missing.
+
+analyze_missing только советует; здесь рекомендации исполняются:
+
+    Удалить               → колонка удаляется
+    Заполнить             → медиана (числа) или мода (остальное)
+    Заполнить + флаг      → то же + колонка-флаг <колонка>_was_missing
+    Заполнить по группам  → медиана/мода внутри групп связанных признаков
+                            (числовые признаки режутся на квантильные корзины);
+                            при mar_method='iterative' числовые MAR-колонки
+                            заполняются IterativeImputer из scikit-learn
+    Анализировать вручную → не трогается
+
+Статистики считаются в fit: медианы всех колонок с одинаковыми группами —
+одним groupby на группу, моды — одним value_counts на колонку. transform
+только сопоставляет ключи групп строк с обученной таблицей (один reindex на
+группу), поэтому применим к любым пачкам строк (streaming.stream_table)
+и к новым выгрузкам. Обученный MissingImputer сохраняется в файл и
+переиспользуется между запусками:
+
+    imputer = MissingImputer(analyze_missing(df, show_plot=False)).fit(df)
+    imputer.save('imputer.pkl')
+    ...
+    df_new = MissingImputer.load('imputer.pkl').transform(df_new)
+"""
+
+import os
+import pickle
+import re
+
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+
+ACTIONS = {
+    'Удалить': 'drop',
+    'Заполнить': 'fill',
+    'Заполнить + флаг': 'fill_flag',
+    'Заполнить по группам': 'group',
+    'Анализировать вручную': 'skip',
+}
+INDICATOR_SUFFIX = '_was_missing'
+
+
+def _import_iterative_imputer():
+    try:
+        from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+        from sklearn.impute import IterativeImputer
+    except ImportError as e:
+        raise ImportError("mar_method='iterative' требует пакет scikit-learn: pip install scikit-learn") from e
+    return IterativeImputer
+
+
+def _is_continuous(values):
+    return pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+
+
+def plan_from_recommendations(recommendations):
+    """
+    План заполнения из результата analyze_missing.
+
+    Параметры:
+    ----------
+    recommendations : pd.DataFrame или dict
+        Результат analyze_missing (структура берётся из attrs['imputation_plan'],
+        без неё — разбирается текст колонок 'Рекомендация' и 'Детали')
+        или готовый план {колонка: {'action': ..., 'group_by': [...]}}
+
+    Возвращает:
+    -----------
+    dict: {колонка: {'strategy': drop/fill/fill_flag/group/skip, 'missing_type': ..., 'group_by': [...]}}
+    """
+    if isinstance(recommendations, pd.DataFrame):
+        plan = recommendations.attrs.get('imputation_plan')
+        if plan is None:
+            plan = {}
+            for row in recommendations.to_dict(orient='records'):
+                found = re.search(r'Зависит от: ([^\n]*)', row['Детали'])
+                group_by = re.findall(r'(\S+) \(r=', found.group(1)) if found else []
+                plan[row['Колонка']] = {'action': row['Рекомендация'], 'missing_type': row['Тип пропуска'],
+                                        'group_by': group_by}
+    else:
+        plan = recommendations
+
+    result = {}
+    for col, item in plan.items():
+        strategy = item.get('strategy') or ACTIONS.get(item.get('action'))
+        if strategy is None:
+            raise ValueError(f"Неизвестная рекомендация для '{col}': {item.get('action')}")
+        result[col] = {'strategy': strategy, 'missing_type': item.get('missing_type'),
+                       'group_by': list(item.get('group_by') or [])}
+    return result
+
+
+def _bin_edges(values, n_bins):
+    """Границы квантильных корзин числового признака (None — признак уже дискретный)."""
+    if values.nunique() <= n_bins:
+        return None
+    edges = np.nanquantile(values.to_numpy(dtype=np.float64, na_value=np.nan), np.linspace(0, 1, n_bins + 1))
+    return np.unique(edges)[1:-1]
+
+
+def _group_key(values, edges):
+    """Ключ группы: номер корзины для числовых признаков, само значение для остальных."""
+    if edges is None:
+        return np.asarray(values, dtype=object)
+    numbers = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    codes = np.searchsorted(edges, numbers, side='right').astype(np.float64)
+    codes[np.isnan(numbers)] = np.nan
+    return codes
+
+
+def _modes(values, keys=None):
+    """Мода values (по группам keys — Series с индексом ключей групп)."""
+    if keys is None:
+        counts = values.value_counts(sort=True)
+        return counts.index[0] if len(counts) else np.nan
+    frame = pd.DataFrame({f'_k{i}': key for i, key in enumerate(keys)})
+    frame['_v'] = values.to_numpy()
+    counts = frame.value_counts(sort=False, dropna=True).sort_values(ascending=False, kind='stable')
+    groups = counts.index.droplevel(-1)
+    top = counts[~groups.duplicated()]
+    return pd.Series(top.index.get_level_values(-1), index=top.index.droplevel(-1))
+
+
+def _fill(values, fills):
+    """Заполняет пропуски values значениями fills (скаляр или массив той же длины)."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        new = pd.unique(pd.Series(np.ravel(fills)).dropna())
+        new = [v for v in new if v not in values.cat.categories]
+        if new:
+            values = values.cat.add_categories(new)
+    elif pd.api.types.is_integer_dtype(values):
+        fills = np.round(np.asarray(fills, dtype=np.float64))
+    if np.ndim(fills) == 0:
+        return values.fillna(fills.item() if isinstance(fills, np.ndarray) else fills)
+    return values.fillna(pd.Series(fills, index=values.index))
+
+
+def _fill_columns(df, fills):
+    """
+    Заполняет колонки df (на месте): fills — DataFrame построчных значений
+    с индексом df или {колонка: скаляр}. Обычные колонки — одним fillna.
+    """
+    by_row = isinstance(fills, pd.DataFrame)
+    plain = [
+        col for col in fills
+        if not isinstance(df[col].dtype, pd.CategoricalDtype) and not pd.api.types.is_integer_dtype(df[col])
+    ]
+    if plain:
+        df[plain] = df[plain].fillna(fills[plain] if by_row else {col: fills[col] for col in plain})
+    for col in fills:
+        if col not in plain:
+            df[col] = _fill(df[col], fills[col].to_numpy() if by_row else fills[col])
+
+
+class MissingImputer:
+    """
+    Исполнитель рекомендаций analyze_missing (fit / transform).
+
+    Параметры:
+    ----------
+    recommendations : pd.DataFrame или dict
+        Результат analyze_missing или план (см. plan_from_recommendations)
+    mar_method : str
+        'group' — медиана/мода по группам; 'iterative' — IterativeImputer
+        для числовых MAR-колонок (остальные — по группам)
+    n_bins : int
+        Число квантильных корзин для числовых признаков группировки
+    add_indicators : bool
+        Флаги пропусков для всех заполняемых колонок, а не только для «Заполнить + флаг»
+    drop : bool
+        Удалять колонки с рекомендацией «Удалить»
+    max_iter, random_state
+        Параметры IterativeImputer
+    """
+
+    def __init__(self, recommendations, mar_method='group', n_bins=10, add_indicators=False, drop=True,
+                 max_iter=10, random_state=42):
+        if mar_method not in ('group', 'iterative'):
+            raise ValueError("mar_method должен быть 'group' или 'iterative'")
+        self.plan = plan_from_recommendations(recommendations)
+        self.mar_method = mar_method
+        self.n_bins = n_bins
+        self.add_indicators = add_indicators
+        self.drop = drop
+        self.max_iter = max_iter
+        self.random_state = random_state
+        self.fitted = False
+
+    # ------------------------------------------------------------------
+    # Обучение
+    # ------------------------------------------------------------------
+    def _columns(self, *strategies):
+        return [col for col, item in self.plan.items() if item['strategy'] in strategies]
+
+    def fit(self, df):
+        """
+        Считает статистики заполнения по df (целиком или по выборке, например streaming.reservoir_sample).
+        """
+        missing = [col for col in self.plan if col not in df.columns]
+        if missing:
+            raise ValueError(f"В данных нет колонок из плана: {missing}")
+
+        to_fill = self._columns('fill', 'fill_flag', 'group')
+        continuous = {col: _is_continuous(df[col]) for col in to_fill}
+
+        # Глобальные медианы/моды — запасное значение для всех заполняемых колонок
+        numeric = [col for col in to_fill if continuous[col]]
+        self.fill_values = df[numeric].median().to_dict() if numeric else {}
+        self.fill_values.update({col: _modes(df[col]) for col in to_fill if not continuous[col]})
+
+        # Итеративное заполнение числовых MAR-колонок
+        self.iterative, self.iterative_features, self.iterative_targets = None, [], []
+        grouped = self._columns('group')
+        if self.mar_method == 'iterative':
+            self.iterative_targets = [col for col in grouped if continuous[col]]
+            grouped = [col for col in grouped if not continuous[col]]
+        if self.iterative_targets:
+            IterativeImputer = _import_iterative_imputer()
+            dropped = set(self._columns('drop'))
+            self.iterative_features = [
+                col for col in df.columns
+                if col not in dropped and _is_continuous(df[col]) and df[col].notna().any()
+            ]
+            self.iterative = IterativeImputer(max_iter=self.max_iter, random_state=self.random_state,
+                                              keep_empty_features=True)
+            self.iterative.fit(df[self.iterative_features].to_numpy(dtype=np.float64, na_value=np.nan))
+
+        # Групповые статистики: один groupby на набор признаков группировки
+        self.edges, self.group_tables = {}, {}
+        specs = {}
+        for col in grouped:
+            group_by = tuple(c for c in self.plan[col]['group_by'] if c in df.columns and c != col)
+            if group_by:
+                specs.setdefault(group_by, []).append(col)
+        for group_by, targets in specs.items():
+            for key in group_by:
+                if key not in self.edges:
+                    self.edges[key] = _bin_edges(df[key], self.n_bins) if _is_continuous(df[key]) else None
+            keys = [_group_key(df[key], self.edges[key]) for key in group_by]
+            medians = [col for col in targets if continuous[col]]
+            parts = []
+            if medians:
+                parts.append(df[medians].groupby(keys, sort=False, dropna=True).median())
+            parts += [_modes(df[col], keys).rename(col) for col in targets if not continuous[col]]
+            self.group_tables[group_by] = pd.concat(parts, axis=1)
+
+        self.columns = list(df.columns)
+        self.fitted = True
+        return self
+
+    # ------------------------------------------------------------------
+    # Применение
+    # ------------------------------------------------------------------
+    def transform(self, df):
+        """
+        Заполняет пропуски df по обученным статистикам (df не меняется).
+
+        Возвращает:
+        -----------
+        pd.DataFrame; число заполненных значений по колонкам — в attrs['imputed']
+        """
+        if not self.fitted:
+            raise RuntimeError("Сначала вызовите fit")
+        missing = [col for col in self.plan if col not in df.columns and self.plan[col]['strategy'] != 'drop']
+        if missing:
+            raise ValueError(f"В данных нет колонок из плана: {missing}")
+        df = df.copy()
+        na = df[[col for col in self.plan if col in df.columns]].isna()
+        counts = na.sum()
+
+        flagged = self._columns('fill_flag') + (self._columns('fill', 'group') if self.add_indicators else [])
+        flags = {f'{col}{INDICATOR_SUFFIX}': na[col].to_numpy() for col in flagged if col in na}
+
+        if self.iterative is not None and counts[self.iterative_targets].any():
+            filled = self.iterative.transform(
+                df[self.iterative_features].to_numpy(dtype=np.float64, na_value=np.nan))
+            positions = {col: i for i, col in enumerate(self.iterative_features)}
+            for col in self.iterative_targets:
+                if counts[col]:
+                    df[col] = _fill(df[col], filled[:, positions[col]])
+
+        for group_by, table in self.group_tables.items():
+            targets = [col for col in table.columns if counts[col]]
+            if not targets:
+                continue
+            keys = [_group_key(df[key], self.edges[key]) for key in group_by]
+            index = pd.MultiIndex.from_arrays(keys) if len(keys) > 1 else pd.Index(keys[0])
+            _fill_columns(df, table[targets].reindex(index).set_axis(df.index))
+
+        # Всё, что не заполнилось по группам (новые группы, пустые ключи), — глобальным значением
+        rest = [col for col, value in self.fill_values.items() if counts[col] and pd.notna(value)]
+        if rest:
+            left = df[rest].isna().any()
+            _fill_columns(df, {col: self.fill_values[col] for col in rest if left[col]})
+
+        if flags:
+            df = pd.concat([df, pd.DataFrame(flags, index=df.index)], axis=1)
+        if self.drop:
+            df = df.drop(columns=[col for col in self._columns('drop') if col in df.columns])
+
+        df.attrs['imputed'] = {
+            col: int(counts[col] - df[col].isna().sum()) for col in counts.index if col in df.columns
+        }
+        return df
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+    def transform_chunks(self, batches):
+        """Заполняет поток пачек (например, streaming.stream_table) по обученным статистикам."""
+        for batch in batches:
+            yield self.transform(batch)
+
+    # ------------------------------------------------------------------
+    # Сохранение
+    # ------------------------------------------------------------------
+    def save(self, path):
+        """Сохраняет обученный импьютер (pickle)."""
+        with open(path, 'wb') as f:
+            pickle.dump(self, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def report(self, df=None):
+        """Таблица плана: стратегия, группы и число заполненных значений (по attrs['imputed'] df)."""
+        imputed = df.attrs.get('imputed', {}) if df is not None else {}
+        rows = []
+        for col, item in self.plan.items():
+            strategy = item['strategy']
+            if strategy == 'group' and col in self.iterative_targets:
+                strategy = 'iterative'
+            group_by = next((', '.join(g) for g, t in self.group_tables.items() if col in t.columns), '')
+            rows.append([col, item['missing_type'], strategy, group_by, imputed.get(col, '')])
+        print(tabulate(rows, headers=['Колонка', 'Тип пропуска', 'Стратегия', 'Группы', 'Заполнено'],
+                       tablefmt='Pretty_Table'))
+
+
+def impute_missing(df, recommendations=None, path=None, verbose=True, **kwargs):
+    """
+    Заполняет пропуски по рекомендациям, переиспользуя сохранённый импьютер.
+
+    Параметры:
+    ----------
+    df : pd.DataFrame
+    recommendations : pd.DataFrame или dict, optional
+        Результат analyze_missing; нужен, если импьютера по path ещё нет
+    path : str, optional
+        Файл импьютера: если существует — загружается и только применяется,
+        иначе импьютер обучается на df и сохраняется
+    **kwargs
+        Параметры MissingImputer
+
+    Возвращает:
+    -----------
+    tuple: (заполненный DataFrame, MissingImputer)
+    """
+    if path is not None and os.path.exists(path):
+        imputer = MissingImputer.load(path)
+        if verbose:
+            print(f"♻️ Импьютер загружен из {path}")
+    else:
+        if recommendations is None:
+            raise ValueError("Нужны рекомендации analyze_missing или путь к сохранённому импьютеру")
+        imputer = MissingImputer(recommendations, **kwargs).fit(df)
+        if path is not None:
+            imputer.save(path)
+
+    result = imputer.transform(df)
+    if verbose:
+        print("\n🩹 Заполнение пропусков:")
+        imputer.report(result)
+    return result, imputer
@@ -0,0 +1,291 @@
+# src.instrumentation.py
+"""
+Спаны для замеров пайплайна загрузки данных.
+
+Каждый спан хранит время (wall / CPU), прирост пикового RSS, число строк
+и байт. Спаны копятся в общем трейсере процесса (последние max_spans) и
+выгружаются в JSON lines или в формат Chrome trace (chrome://tracing, Perfetto).
+Общий трейсер выключен по умолчанию: включается переменной окружения
+ECOM_TRACE=1 или TRACER.enabled = True.
+
+    with span('upload_table', table='orders', rows=len(df)):
+        ...
+
+    @traced('load_and_inspect')
+    def load_and_inspect(...): ...
+
+    TRACER.report()
+    TRACER.to_chrome_trace('trace.json')
+"""
+
+import functools
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+from tabulate import tabulate
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_bytes():
+    """Пиковый RSS процесса в байтах (None, если недоступен)."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024  # Linux отдаёт КБ
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss)
+    except ImportError:
+        return None
+
+
+def frame_stats(df):
+    """Строки и байты DataFrame (без deep-подсчёта строк, чтобы замер был дешёвым)."""
+    return len(df), int(df.memory_usage(index=True, deep=False).sum())
+
+
+class Span:
+    """Один замер: создаётся Tracer.start(), закрывается finish()."""
+
+    __slots__ = ('id', 'parent', 'name', 'category', 'table', 'rows', 'bytes', 'attrs',
+                 'tid', 'start_ns', 'wall_s', 'cpu_s', 'rss_delta', 'error',
+                 '_tracer', '_cpu_start', '_rss_start')
+
+    def __init__(self, tracer, span_id, parent, name, category, table, rows, nbytes, attrs):
+        self.id = span_id
+        self.parent = parent
+        self.name = name
+        self.category = category
+        self.table = table
+        self.rows = rows
+        self.bytes = nbytes
+        self.attrs = attrs
+        self.tid = threading.get_ident()
+        self.wall_s = None
+        self.cpu_s = None
+        self.rss_delta = None
+        self.error = None
+        self._tracer = tracer
+        self._rss_start = peak_rss_bytes()
+        self._cpu_start = time.process_time()
+        self.start_ns = time.perf_counter_ns()
+
+    def annotate(self, rows=None, nbytes=None, **attrs):
+        """Дополняет данные спана до его закрытия (например, число строк после обработки)."""
+        if rows is not None:
+            self.rows = rows
+        if nbytes is not None:
+            self.bytes = nbytes
+        self.attrs.update(attrs)
+        return self
+
+    def finish(self, rows=None, nbytes=None, error=None, **attrs):
+        """Закрывает спан; rows/nbytes/attrs дополняют данные, переданные при старте."""
+        if self.wall_s is not None:
+            return self
+        self.wall_s = (time.perf_counter_ns() - self.start_ns) / 1e9
+        self.cpu_s = time.process_time() - self._cpu_start
+        rss_end = peak_rss_bytes()
+        if rss_end is not None and self._rss_start is not None:
+            self.rss_delta = rss_end - self._rss_start
+        if error is not None:
+            self.error = repr(error)
+        self.annotate(rows, nbytes, **attrs)
+        self._tracer._close(self)
+        return self
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'parent': self.parent,
+            'name': self.name,
+            'category': self.category,
+            'table': self.table,
+            'wall_s': self.wall_s,
+            'cpu_s': self.cpu_s,
+            'rss_delta_bytes': self.rss_delta,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'error': self.error,
+            'tid': self.tid,
+            'start_ns': self.start_ns,
+            **({'attrs': self.attrs} if self.attrs else {}),
+        }
+
+
+class Tracer:
+    """
+    Накопитель спанов; вложенность отслеживается отдельно для каждого потока.
+
+    Хранятся последние max_spans закрытых спанов (None — без ограничения),
+    чтобы долгая сессия не копила их бесконечно.
+    """
+
+    def __init__(self, enabled=True, max_spans=100_000):
+        self.enabled = enabled
+        self.max_spans = max_spans
+        self.spans = deque(maxlen=max_spans)
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._origin_ns = time.perf_counter_ns()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def start(self, name, category='pipeline', table=None, rows=None, nbytes=None, **attrs):
+        """
+        Открывает спан; закрыть его нужно через span.finish() — в том числе при
+        исключении, иначе спан останется в стеке потока. Предпочтительнее span().
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        stack = self._stack()
+        span_obj = Span(self, next(self._ids), stack[-1].id if stack else None,
+                        name, category, table, rows, nbytes, attrs)
+        stack.append(span_obj)
+        return span_obj
+
+    def _close(self, span_obj):
+        stack = self._stack()
+        if span_obj in stack:
+            stack.remove(span_obj)
+        with self._lock:
+            self.spans.append(span_obj)
+
+    @contextmanager
+    def span(self, name, category='pipeline', table=None, rows=None, nbytes=None, **attrs):
+        """Контекстный менеджер: спан закрывается и при исключении (с полем error)."""
+        span_obj = self.start(name, category, table, rows, nbytes, **attrs)
+        try:
+            yield span_obj
+        except BaseException as e:
+            span_obj.finish(error=e)
+            raise
+        span_obj.finish()
+
+    def clear(self):
+        with self._lock:
+            self.spans = deque(maxlen=self.max_spans)
+        self._origin_ns = time.perf_counter_ns()
+
+    # ------------------------------------------------------------------
+    # Выгрузка
+    # ------------------------------------------------------------------
+    def to_frame(self):
+        """Спаны в виде DataFrame (по времени начала)."""
+        if not self.spans:
+            return pd.DataFrame()
+        return pd.DataFrame([s.to_dict() for s in self.spans]).sort_values('start_ns', ignore_index=True)
+
+    def to_jsonl(self, path, append=True):
+        """Пишет спаны в JSON lines (по строке на спан)."""
+        with open(path, 'a' if append else 'w', encoding='utf-8') as f:
+            for s in sorted(self.spans, key=lambda s: s.start_ns):
+                f.write(json.dumps(s.to_dict(), ensure_ascii=False, default=str) + '\n')
+
+    def to_chrome_trace(self, path):
+        """Пишет спаны в формате Chrome trace (события 'X' с длительностью в мкс)."""
+        pid = os.getpid()
+        events = []
+        for s in self.spans:
+            args = {k: v for k, v in (('table', s.table), ('rows', s.rows), ('bytes', s.bytes),
+                                      ('cpu_s', s.cpu_s), ('rss_delta_bytes', s.rss_delta),
+                                      ('error', s.error)) if v is not None}
+            args.update(s.attrs)
+            events.append({
+                'name': s.name if s.table is None else f'{s.name} [{s.table}]',
+                'cat': s.category,
+                'ph': 'X',
+                'ts': (s.start_ns - self._origin_ns) / 1e3,
+                'dur': s.wall_s * 1e6,
+                'pid': pid,
+                'tid': s.tid,
+                'args': args,
+            })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False, default=str)
+
+    def summary(self):
+        """Итоги по этапам: число спанов, суммарные wall/CPU, строки, байты, максимум прироста RSS."""
+        df = self.to_frame()
+        if df.empty:
+            return df
+        return (
+            df.groupby('name', sort=False)
+            .agg(spans=('id', 'size'), wall_s=('wall_s', 'sum'), cpu_s=('cpu_s', 'sum'),
+                 rows=('rows', 'sum'), bytes=('bytes', 'sum'), rss_delta_bytes=('rss_delta_bytes', 'max'))
+            .reset_index()
+        )
+
+    def report(self):
+        """Печатает итоги по этапам."""
+        summary = self.summary()
+        if summary.empty:
+            print("ℹ️ Спанов нет")
+            return summary
+        summary = summary.assign(
+            wall_s=summary['wall_s'].round(3),
+            cpu_s=summary['cpu_s'].round(3),
+            mb=(summary['bytes'] / 1024**2).round(1),
+            rss_mb=(summary['rss_delta_bytes'] / 1024**2).round(1),
+        )[['name', 'spans', 'wall_s', 'cpu_s', 'rows', 'mb', 'rss_mb']]
+        print("\n⏱️ Замеры пайплайна:")
+        print(tabulate(summary, headers=['Этап', 'Спанов', 'Wall, с', 'CPU, с', 'Строк', 'МБ', 'Δ пик RSS, МБ'],
+                       tablefmt='Pretty_Table', showindex=False))
+        return summary
+
+
+class _NullSpan:
+    """Заглушка при выключенном трейсере."""
+
+    def annotate(self, *args, **kwargs):
+        return self
+
+    def finish(self, *args, **kwargs):
+        return self
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+# Общий трейсер процесса (выключен, пока не задан ECOM_TRACE=1)
+TRACER = Tracer(enabled=os.environ.get('ECOM_TRACE', '0') == '1')
+
+
+def span(name, category='pipeline', table=None, rows=None, nbytes=None, **attrs):
+    """Спан в общем трейсере (контекстный менеджер)."""
+    return TRACER.span(name, category, table, rows, nbytes, **attrs)
+
+
+def start_span(name, category='pipeline', table=None, rows=None, nbytes=None, **attrs):
+    """Открывает спан в общем трейсере; закрывается через .finish()."""
+    return TRACER.start(name, category, table, rows, nbytes, **attrs)
+
+
+def traced(name=None, category='pipeline'):
+    """Декоратор: каждый вызов функции — спан в общем трейсере."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with TRACER.span(span_name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,8 +1,148 @@
 #src.ltv.py
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-def plot_cohort_ltv_analysis(df, custom_palette):
+from .plotly_utils import finish_figure
+
+
+def entity_ltv_curves(orders, entity_col='customer_unique_id',
+                      date_col='order_purchase_timestamp', value_col='payment_value'):
+    """
+    Кумулятивная выручка каждого клиента/продавца по месяцам жизни.
+
+    Одна сортировка + groupby-cumsum вместо оконных функций по всем заказам.
+
+    Параметры:
+    ----------
+    orders : pd.DataFrame
+        Заказы с колонками entity_col, date_col, value_col
+        (для продавцов — строки order_items с payment_value)
+
+    Возвращает:
+    -----------
+    pd.DataFrame с колонками entity_col, 'cohort_month', 'lifetime_month',
+    'revenue', 'cumulative_revenue'
+    """
+    month = pd.to_datetime(orders[date_col]).dt.to_period('M')
+    df = pd.DataFrame({
+        entity_col: orders[entity_col].to_numpy(),
+        'month': month.to_numpy(),
+        'revenue': orders[value_col].to_numpy(dtype=np.float64),
+    })
+
+    # Выручка по (сущность, месяц) — уже отсортирована по ключам
+    df = df.groupby([entity_col, 'month'], sort=True, observed=True)['revenue'].sum().reset_index()
+
+    grouped = df.groupby(entity_col, sort=False, observed=True)
+    cohort = grouped['month'].transform('min')
+    df['lifetime_month'] = (df['month'].array.asi8 - cohort.array.asi8).astype(np.int64)
+    df['cohort_month'] = cohort.dt.to_timestamp()
+    df['cumulative_revenue'] = grouped['revenue'].cumsum()
+
+    return df[[entity_col, 'cohort_month', 'lifetime_month', 'revenue', 'cumulative_revenue']]
+
+
+def cohort_ltv(orders, entity_col='customer_unique_id',
+               date_col='order_purchase_timestamp', value_col='payment_value',
+               projected=False, horizon=24):
+    """
+    Считает cumulative_gmv / cumulative_ltv по (cohort_month, lifetime_month).
+
+    Результат сразу подходит для plot_cohort_ltv_analysis.
+
+    Параметры:
+    ----------
+    orders : pd.DataFrame
+        Заказы с колонками entity_col, date_col, value_col
+    entity_col : str
+        'customer_unique_id' для покупателей, 'seller_id' для продавцов
+    projected : bool
+        Достроить кривые до horizon месяцев по подобранному затуханию выручки
+    horizon : int
+        Последний месяц жизни для прогноза
+
+    Возвращает:
+    -----------
+    pd.DataFrame с колонками 'cohort_month', 'lifetime_month', 'cohort_size',
+    'gmv', 'cumulative_gmv', 'cumulative_ltv' (+ 'projected' при projected=True)
+    """
+    curves = entity_ltv_curves(orders, entity_col, date_col, value_col)
+
+    cohort_size = curves.loc[curves['lifetime_month'] == 0].groupby('cohort_month').size()
+    ltv = (
+        curves
+        .groupby(['cohort_month', 'lifetime_month'], sort=True)['revenue'].sum()
+        .rename('gmv')
+        .reset_index()
+    )
+    ltv['cohort_size'] = ltv['cohort_month'].map(cohort_size).to_numpy()
+    ltv['cumulative_gmv'] = ltv.groupby('cohort_month', sort=False)['gmv'].cumsum()
+    ltv['cumulative_ltv'] = ltv['cumulative_gmv'] / ltv['cohort_size']
+
+    ltv = ltv[['cohort_month', 'lifetime_month', 'cohort_size', 'gmv', 'cumulative_gmv', 'cumulative_ltv']]
+    if projected:
+        ltv = project_ltv(ltv, horizon=horizon)
+    return ltv
+
+
+def project_ltv(ltv, horizon=24):
+    """
+    Достраивает кривые LTV до horizon месяцев жизни.
+
+    Средняя по когортам прибавка LTV в месяц t (t ≥ 1) аппроксимируется
+    экспонентой a·exp(-b·t) (линейная регрессия по логарифму), после чего
+    каждая когорта продолжается от своего последнего наблюдаемого месяца.
+
+    Возвращает:
+    -----------
+    pd.DataFrame того же формата с флагом 'projected'
+    """
+    ltv = ltv.copy()
+    ltv['projected'] = False
+
+    increment = ltv.groupby('cohort_month', sort=False)['cumulative_ltv'].diff()
+    mean_increment = increment[ltv['lifetime_month'] > 0].groupby(ltv['lifetime_month']).mean()
+    mean_increment = mean_increment[mean_increment > 0]
+    if len(mean_increment) < 2:
+        return ltv  # Недостаточно точек для подбора затухания
+
+    slope, intercept = np.polyfit(mean_increment.index.to_numpy(dtype=float),
+                                  np.log(mean_increment.to_numpy()), 1)
+    decay = np.exp(intercept + slope * np.arange(horizon + 1))
+
+    last = ltv.groupby('cohort_month', sort=False).tail(1)
+    start = last['lifetime_month'].to_numpy() + 1
+    steps = np.maximum(horizon - start + 1, 0)
+    if steps.sum() == 0:
+        return ltv
+
+    # Все прогнозные точки одним массивом: (когорта, месяц жизни)
+    idx = np.repeat(np.arange(len(last)), steps)
+    months = np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps) + np.repeat(start, steps)
+    offsets = np.concatenate([[0.0], np.cumsum(decay[1:])])
+    added = offsets[months] - offsets[np.repeat(start, steps) - 1]
+
+    base_ltv = last['cumulative_ltv'].to_numpy()[idx]
+    sizes = last['cohort_size'].to_numpy()[idx]
+    projection = pd.DataFrame({
+        'cohort_month': last['cohort_month'].to_numpy()[idx],
+        'lifetime_month': months,
+        'cohort_size': sizes,
+        'gmv': decay[months] * sizes,
+        'cumulative_gmv': (base_ltv + added) * sizes,
+        'cumulative_ltv': base_ltv + added,
+        'projected': True,
+    })
+    return (
+        pd.concat([ltv, projection], ignore_index=True)
+        .sort_values(['cohort_month', 'lifetime_month'], kind='stable')
+        .reset_index(drop=True)
+    )
+
+
+def plot_cohort_ltv_analysis(df, custom_palette, show=False, as_json=False):
     """
     Строит график когортного анализа LTV:
     - Все месяцы жизни для каждой когорты
@@ -19,12 +159,20 @@ def plot_cohort_ltv_analysis(df, custom_palette):
     
     custom_palette : list
         Цветовая палитра, например: ['#636EFA', '#EF553B', '#00CC96', '#AB63FA']
+
+    show : bool
+        Показать фигуру сразу (по умолчанию фигура только возвращается)
+
+    as_json : bool
+        Вернуть также компактный JSON фигуры
+
+    Возвращает:
+    -----------
+    go.Figure или (go.Figure, str)
     """
 
     # Находим топ-когорту по GMV и рассчитываем средний LTV
-    top_cohort = df[df['cumulative_gmv'] == df['cumulative_ltv'].max()].sort_values(
-        'cumulative_ltv', ascending=False
-    ).iloc[0]['cohort_month']
+    top_cohort = df.loc[df['cumulative_gmv'].idxmax(), 'cohort_month']
     ltv_avg = df.groupby('lifetime_month')['cumulative_ltv'].mean().reset_index()
     ltv_60 = df[df['lifetime_month'] == 6]  # LTV на 6-й месяц
 
@@ -33,9 +181,8 @@ def plot_cohort_ltv_analysis(df, custom_palette):
         "LTV на 6-й месяц жизни"
     ))
 
-    # Линии по когортам
-    for cohort in df['cohort_month'].unique():
-        cohort_df = df[df['cohort_month'] == cohort]
+    # Линии по когортам: один groupby вместо фильтра на каждую когорту
+    for cohort, cohort_df in df.groupby('cohort_month', sort=False):
         color = 'lightgray'
         width = 1
         if cohort == top_cohort:
@@ -100,4 +247,4 @@ def plot_cohort_ltv_analysis(df, custom_palette):
     fig.update_xaxes(title_text='Когорта', row=2, col=1)
     fig.update_yaxes(title_text='LTV на 6 месяц', row=2, col=1)
 
-    fig.show()
+    return finish_figure(fig, show=show, as_json=as_json)
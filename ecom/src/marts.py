@@ -0,0 +1,324 @@
+# src.marts.py
+"""
+Витрины метрик для DataLens с инкрементальным обновлением.
+
+Каждая витрина описывается один раз: ключ, запрос для пересчёта и источники —
+исходные таблицы со своим watermark и запросом, находящим ключи, затронутые
+строками после него. При обновлении пересчитываются только затронутые ключи
+(DELETE + INSERT в одной транзакции), а watermark каждого источника,
+длительность и число строк пишутся в журнал mart_refresh_log.
+
+Статус и оплата заказа меняются уже после покупки, поэтому для заказов
+перечитывается окно в lookback_months месяцев до watermark: заказ, купленный
+до прошлого обновления и доставленный после, попадёт в витрину.
+
+Запуск по расписанию (cron / планировщик):
+    python -m src.marts
+"""
+
+import time
+from typing import Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from tabulate import tabulate
+
+# Одна строка на пару (витрина, источник): у каждой исходной таблицы свой watermark
+REFRESH_LOG_DDL = """
+CREATE TABLE IF NOT EXISTS mart_refresh_log (
+    mart_name     TEXT,
+    source_table  TEXT,
+    watermark     TIMESTAMP,
+    refreshed_at  TIMESTAMP,
+    duration_s    DOUBLE PRECISION,
+    rows_touched  BIGINT,
+    PRIMARY KEY (mart_name, source_table)
+);
+"""
+
+# Окно пересчёта для заказов: статус и оплата меняются после покупки
+ORDERS_LOOKBACK_MONTHS = 3
+
+# key_expr — выражение ключа в запросе пересчёта (с алиасом таблицы);
+# {key_filter} подставляется как TRUE (полная сборка) или как условие по затронутым ключам.
+# sources — исходные таблицы: watermark, затронутые ключи (параметр :since_<источник>)
+# и окно lookback_months, на которое since отступает от watermark
+MARTS = {
+    'mart_customer_orders': {
+        'key': 'customer_unique_id',
+        'key_expr': 'c.customer_unique_id',
+        'sources': {
+            'orders': {
+                'watermark': "SELECT MAX(order_purchase_timestamp) FROM orders",
+                'changed_keys': """
+                    SELECT DISTINCT c.customer_unique_id
+                    FROM orders o
+                    JOIN customers c ON o.customer_id = c.customer_id
+                    WHERE o.order_purchase_timestamp >= :since_orders
+                """,
+                'lookback_months': ORDERS_LOOKBACK_MONTHS,
+            },
+        },
+        'select': """
+            SELECT
+                c.customer_unique_id,
+                COUNT(DISTINCT o.order_id) AS order_count,
+                MIN(o.order_purchase_timestamp) AS first_order_at,
+                MAX(o.order_purchase_timestamp) AS last_order_at,
+                COALESCE(SUM(op.payment_value), 0)::double precision AS gmv
+            FROM orders o
+            JOIN customers c ON o.customer_id = c.customer_id
+            LEFT JOIN order_payments op ON o.order_id = op.order_id
+            WHERE o.order_status = 'доставлен'
+              AND {key_filter}
+            GROUP BY c.customer_unique_id
+        """,
+    },
+    # revenue — цена позиций; gmv_with_freight — с доставкой, как concentration.SELLER_GMV_QUERY
+    'mart_seller_sales': {
+        'key': 'seller_id',
+        'key_expr': 'oi.seller_id',
+        'sources': {
+            'orders': {
+                'watermark': "SELECT MAX(order_purchase_timestamp) FROM orders",
+                'changed_keys': """
+                    SELECT DISTINCT oi.seller_id
+                    FROM order_items oi
+                    JOIN orders o ON oi.order_id = o.order_id
+                    WHERE o.order_purchase_timestamp >= :since_orders
+                """,
+                'lookback_months': ORDERS_LOOKBACK_MONTHS,
+            },
+        },
+        'select': """
+            SELECT
+                oi.seller_id,
+                COUNT(DISTINCT o.order_id) AS order_count,
+                MIN(o.order_purchase_timestamp) AS first_sale_at,
+                MAX(o.order_purchase_timestamp) AS last_sale_at,
+                SUM(oi.price)::double precision AS revenue,
+                SUM(oi.price + oi.freight_value)::double precision AS gmv_with_freight
+            FROM order_items oi
+            JOIN orders o ON oi.order_id = o.order_id
+            WHERE o.order_status = 'доставлен'
+              AND {key_filter}
+            GROUP BY oi.seller_id
+        """,
+    },
+    'mart_lead_conversion': {
+        'key': 'mql_id',
+        'key_expr': 'm.mql_id',
+        'sources': {
+            'marketing_qualified': {
+                'watermark': "SELECT MAX(first_contact_date) FROM marketing_qualified",
+                'changed_keys': """
+                    SELECT mql_id FROM marketing_qualified
+                    WHERE first_contact_date > :since_marketing_qualified
+                """,
+                'lookback_months': 0,
+            },
+            'closed_deals': {
+                'watermark': "SELECT MAX(won_date) FROM closed_deals",
+                'changed_keys': "SELECT mql_id FROM closed_deals WHERE won_date > :since_closed_deals",
+                'lookback_months': 0,
+            },
+        },
+        'select': """
+            SELECT
+                m.mql_id,
+                m.origin,
+                m.first_contact_date,
+                c.won_date,
+                c.business_segment,
+                EXTRACT(EPOCH FROM (c.won_date - m.first_contact_date)) / 86400.0 AS lag_days
+            FROM marketing_qualified m
+            LEFT JOIN closed_deals c ON c.mql_id = m.mql_id
+            WHERE {key_filter}
+        """,
+    },
+}
+
+# Метрики поверх витрин — без CTE по сырым таблицам
+METRIC_QUERIES = {
+    'repeat_purchase_rate': """
+        SELECT
+            COUNT(*) AS customers,
+            COUNT(*) FILTER (WHERE order_count > 1) AS repeat_customers,
+            ROUND(COUNT(*) FILTER (WHERE order_count > 1) * 100.0 / NULLIF(COUNT(*), 0), 2)::double precision AS repeat_order_rate
+        FROM mart_customer_orders;
+    """,
+    'avg_orders_per_repeat_customer': """
+        SELECT ROUND(AVG(order_count), 2)::double precision
+        FROM mart_customer_orders
+        WHERE order_count > 1;
+    """,
+    'seller_repeat_sales': """
+        SELECT
+            COUNT(*) AS all_sellers,
+            COUNT(*) FILTER (WHERE order_count > 1) AS repeat_sellers,
+            ROUND(COUNT(*) FILTER (WHERE order_count > 1) * 100.0 / NULLIF(COUNT(*), 0), 2)::double precision AS repeat_sale_rate
+        FROM mart_seller_sales;
+    """,
+    'lead_conversion': """
+        SELECT
+            COUNT(*) AS leads,
+            COUNT(*) FILTER (WHERE lag_days BETWEEN 0 AND :days) AS closed_leads
+        FROM mart_lead_conversion
+        WHERE first_contact_date BETWEEN :start AND :end;
+    """,
+}
+
+
+def _table_exists(conn, table_name: str) -> bool:
+    return conn.execute(text("SELECT to_regclass(:name)"), {'name': table_name}).scalar() is not None
+
+
+def _ensure_refresh_log(conn) -> None:
+    """Создаёт mart_refresh_log; журнал старого формата (один watermark на витрину) пересоздаётся."""
+    if _table_exists(conn, 'mart_refresh_log'):
+        has_source = conn.execute(text("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'mart_refresh_log' AND column_name = 'source_table'
+        """)).scalar()
+        if not has_source:
+            # В журнале только watermark: после пересоздания витрины один раз соберутся целиком
+            conn.execute(text("DROP TABLE mart_refresh_log"))
+    conn.execute(text(REFRESH_LOG_DDL))
+
+
+def _since(watermark, lookback_months: int):
+    """Граница пересчёта источника: watermark минус окно lookback_months."""
+    if not lookback_months:
+        return watermark
+    return (pd.Timestamp(watermark) - pd.DateOffset(months=lookback_months)).to_pydatetime()
+
+
+def refresh_mart(engine: Engine, name: str, full: bool = False) -> Dict:
+    """
+    Обновляет одну витрину.
+
+    Args:
+        engine: SQLAlchemy engine
+        name: Имя витрины из MARTS
+        full: Пересобрать витрину целиком
+
+    Returns:
+        Словарь со статистикой: имя, режим, watermark по источникам, строки, длительность
+    """
+    spec = MARTS[name]
+    sources = spec['sources']
+    start = time.perf_counter()
+
+    with engine.begin() as conn:
+        _ensure_refresh_log(conn)
+        # Новые watermark фиксируем до пересчёта: строки, пришедшие во время
+        # обновления, попадут в следующий запуск
+        new_watermarks = {source: conn.execute(text(source_spec['watermark'])).scalar()
+                          for source, source_spec in sources.items()}
+        last_watermarks = dict(conn.execute(
+            text("SELECT source_table, watermark FROM mart_refresh_log WHERE mart_name = :name"),
+            {'name': name},
+        ).all())
+
+        if (full or any(last_watermarks.get(source) is None for source in sources)
+                or not _table_exists(conn, name)):
+            mode = 'full'
+            conn.execute(text(f'DROP TABLE IF EXISTS "{name}"'))
+            conn.execute(text(f'CREATE TABLE "{name}" AS ' + spec['select'].format(key_filter='TRUE')))
+            conn.execute(text(f'ALTER TABLE "{name}" ADD PRIMARY KEY ({spec["key"]})'))
+            rows = conn.execute(text(f'SELECT COUNT(*) FROM "{name}"')).scalar()
+        else:
+            mode = 'incremental'
+            changed_keys = '\nUNION\n'.join(source_spec['changed_keys'] for source_spec in sources.values())
+            params = {f'since_{source}': _since(last_watermarks[source], source_spec['lookback_months'])
+                      for source, source_spec in sources.items()}
+            key_filter = f"{spec['key_expr']} IN ({changed_keys})"
+            deleted = conn.execute(
+                text(f'DELETE FROM "{name}" WHERE {spec["key"]} IN ({changed_keys}) '
+                     f'RETURNING {spec["key"]}'),
+                params,
+            ).scalars().all()
+            inserted = conn.execute(
+                text(f'INSERT INTO "{name}" ' + spec['select'].format(key_filter=key_filter)
+                     + f' RETURNING {spec["key"]}'),
+                params,
+            ).scalars().all()
+            # Затронутые строки — пересчитанные, новые и удалённые ключи (каждый один раз)
+            rows = len(set(deleted) | set(inserted))
+
+        duration = time.perf_counter() - start
+        for source, watermark in new_watermarks.items():
+            conn.execute(text("""
+                INSERT INTO mart_refresh_log (mart_name, source_table, watermark, refreshed_at,
+                                              duration_s, rows_touched)
+                VALUES (:name, :source, :watermark, NOW(), :duration, :rows)
+                ON CONFLICT (mart_name, source_table) DO UPDATE SET
+                    watermark = EXCLUDED.watermark,
+                    refreshed_at = EXCLUDED.refreshed_at,
+                    duration_s = EXCLUDED.duration_s,
+                    rows_touched = EXCLUDED.rows_touched
+            """), {'name': name, 'source': source, 'watermark': watermark,
+                   'duration': duration, 'rows': rows})
+
+    return {
+        'mart': name,
+        'mode': mode,
+        'watermark': new_watermarks,
+        'rows_touched': rows,
+        'duration_s': round(duration, 3),
+    }
+
+
+def refresh_marts(engine: Engine, marts: Optional[List[str]] = None, full: bool = False,
+                  verbose: bool = True) -> pd.DataFrame:
+    """
+    Обновляет витрины и выводит отчёт о длительности и затронутых строках.
+
+    Args:
+        engine: SQLAlchemy engine
+        marts: Список витрин (по умолчанию — все из MARTS)
+        full: Пересобрать витрины целиком
+        verbose: Выводить отчёт
+
+    Returns:
+        DataFrame с результатами по каждой витрине
+    """
+    results = []
+    for name in marts or list(MARTS):
+        try:
+            results.append(refresh_mart(engine, name, full=full))
+        except Exception as e:
+            print(f"❌ Ошибка обновления {name}: {e}")
+            results.append({'mart': name, 'mode': 'error', 'watermark': None,
+                            'rows_touched': None, 'duration_s': None})
+
+    report = pd.DataFrame(results)
+    if verbose:
+        print("\n📊 Обновление витрин:")
+        watermarks = report['watermark'].map(
+            lambda wm: '\n'.join(f'{source}: {value}' for source, value in wm.items()) if wm else wm)
+        print(tabulate(
+            report.assign(watermark=watermarks),
+            headers=['Витрина', 'Режим', 'Watermark', 'Строк затронуто', 'Длительность, с'],
+            tablefmt='Pretty_Table',
+            showindex=False
+        ))
+    return report
+
+
+def run_metric(engine: Engine, metric: str, params: Optional[Dict] = None) -> pd.DataFrame:
+    """
+    Считает метрику из METRIC_QUERIES по витринам.
+
+    Для lead_conversion: params = {'days': 60, 'start': '2018-01-01', 'end': '2018-05-31'}
+    """
+    with engine.connect() as conn:
+        result = conn.execute(text(METRIC_QUERIES[metric]), params or {})
+        return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+
+if __name__ == "__main__":
+    from src.db_utils import get_engine
+
+    refresh_marts(get_engine())
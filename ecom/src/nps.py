@@ -0,0 +1,280 @@
+# src.nps.py
+"""
+NPS-прокси по отзывам (order_reviews) с инкрементальным дообновлением.
+
+Оценки раскладываются по корзинам одним np.select (5 — промоутеры,
+4 — нейтралы, 1–3 — критики), счётчики копятся через np.bincount по
+кодам (месяц × группа). Счётчики по месяцам независимы, поэтому при
+дообновлении пересчитывается только хвост из последних lookback_months
+месяцев (отзывы приходят позже заказов), а более старые месяцы не
+трогаются. Разбивки по продавцу, категории или штату берутся из уже
+накопленных таблиц.
+"""
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from .cohorts import code_to_month, month_code
+
+# Одна строка на пару (заказ, отзыв) с атрибутами для разбивок.
+# Строки размножаются по товарам заказа — это учитывается дедупликацией при подсчёте
+NPS_REVIEWS_QUERY = """
+SELECT
+    o.order_id,
+    o.order_purchase_timestamp,
+    r.review_id,
+    r.review_score,
+    c.customer_state,
+    i.seller_id,
+    p.category_name_translated
+FROM orders o
+LEFT JOIN order_reviews r USING(order_id)
+JOIN customers c USING(customer_id)
+LEFT JOIN order_items i USING(order_id)
+LEFT JOIN products p USING(product_id)
+WHERE o.order_status = 'доставлен'
+  AND o.order_purchase_timestamp >= :since
+ORDER BY o.order_purchase_timestamp, o.order_id;
+"""
+
+COUNT_COLUMNS = ['total_orders', 'total_reviews', 'detractors', 'neutrals', 'promoters']
+NPS_COLUMNS = ['month', 'nps_proxy', 'total_reviews', 'response_rate',
+               'promoters', 'detractors', 'neutrals', 'total_orders']
+
+NO_REVIEW, DETRACTOR, NEUTRAL, PROMOTER = -1, 0, 1, 2
+
+
+def score_bucket(scores):
+    """Корзина оценки: -1 — нет отзыва, 0 — критик (1–3), 1 — нейтрал (4), 2 — промоутер (5)."""
+    scores = pd.to_numeric(pd.Series(scores), errors='coerce').to_numpy(dtype=np.float64)
+    return np.select(
+        [scores == 5, scores == 4, scores <= 3],
+        [PROMOTER, NEUTRAL, DETRACTOR],
+        default=NO_REVIEW
+    ).astype(np.int8)
+
+
+def _count_table(month, keys, order_ids, review_ids, bucket):
+    """
+    Счётчики COUNT_COLUMNS по (месяц[, ключ]) через bincount.
+
+    Заказ учитывается один раз на группу, отзыв — один раз на группу
+    (как COUNT(DISTINCT) в SQL), даже если строки размножены товарами.
+    """
+    frame = {'month': month, 'order_id': order_ids, 'review_id': review_ids}
+    if keys is not None:
+        frame['key'] = keys
+    frame = pd.DataFrame(frame)
+    group_cols = ['month', 'key'] if keys is not None else ['month']
+
+    is_order = ~frame.duplicated(group_cols + ['order_id']).to_numpy()
+    is_review = (bucket != NO_REVIEW) & ~frame.duplicated(group_cols + ['review_id']).to_numpy()
+
+    if keys is not None:
+        key_codes, key_values = pd.factorize(frame['key'], use_na_sentinel=False)
+    else:
+        key_codes, key_values = np.zeros(len(frame), dtype=np.int64), np.array([None])
+    month_codes, month_values = pd.factorize(frame['month'])
+
+    n_keys = len(key_values)
+    flat = month_codes * n_keys + key_codes
+    size = len(month_values) * n_keys
+    counts = {
+        'total_orders': np.bincount(flat, weights=is_order, minlength=size),
+        'total_reviews': np.bincount(flat, weights=is_review, minlength=size),
+    }
+    for name, value in (('detractors', DETRACTOR), ('neutrals', NEUTRAL), ('promoters', PROMOTER)):
+        counts[name] = np.bincount(flat, weights=is_review & (bucket == value), minlength=size)
+
+    present = np.flatnonzero(counts['total_orders'] + counts['total_reviews'])
+    table = pd.DataFrame({name: values[present].astype(np.int64) for name, values in counts.items()})
+    table['month'] = np.asarray(month_values)[present // n_keys]
+    if keys is not None:
+        table['key'] = np.asarray(key_values, dtype=object)[present % n_keys]
+    return table.set_index(group_cols)[COUNT_COLUMNS]
+
+
+def _with_nps(counts):
+    """Добавляет nps_proxy и response_rate (округление как в SQL ноутбука)."""
+    counts = counts.copy()
+    reviews = counts['total_reviews'].where(counts['total_reviews'] > 0)
+    counts['nps_proxy'] = ((counts['promoters'] - counts['detractors']) * 100 / reviews).round()
+    orders = counts['total_orders'].where(counts['total_orders'] > 0)
+    counts['response_rate'] = (counts['total_reviews'] * 100 / orders).round(1)
+    return counts
+
+
+class NPSAggregator:
+    """
+    Накопитель NPS-счётчиков по месяцам и разбивкам.
+
+    Параметры:
+    ----------
+    by : tuple
+        Колонки разбивок, которые копятся вместе с общими счётчиками
+        (например, 'seller_id', 'category_name_translated', 'customer_state')
+    date_col : str
+        Колонка с датой заказа
+    lookback_months : int или None
+        Сколько месяцев до месяца watermark пересчитывать заново при каждом
+        дообновлении: отзыв на заказ из этого окна учитывается, даже если пришёл
+        позже заказа. Отзывы на более старые заказы подхватит только полный
+        пересчёт (lookback_months=None — каждый раз пересчитывать всё)
+    """
+
+    def __init__(self, by=('seller_id', 'category_name_translated', 'customer_state'),
+                 date_col='order_purchase_timestamp', lookback_months=3):
+        self.by = tuple(by)
+        self.date_col = date_col
+        self.lookback_months = lookback_months
+        self.watermark = None
+        # None — общие счётчики по месяцам, остальные ключи — разбивки
+        self._counts = {dim: None for dim in (None,) + self.by}
+
+    def since(self):
+        """
+        Начало пересчитываемого окна: первое число месяца watermark минус lookback_months
+        (None — пересчитывается всё).
+        """
+        if self.watermark is None or self.lookback_months is None:
+            return None
+        return code_to_month([month_code([self.watermark])[0] - self.lookback_months])[0]
+
+    def _drop_from(self, since):
+        """Удаляет счётчики месяцев начиная с since (все — при since=None)."""
+        if since is None:
+            self._counts = {dim: None for dim in self._counts}
+            return
+        code = month_code([since])[0]
+        for dim, counts in self._counts.items():
+            if counts is not None:
+                self._counts[dim] = counts[counts.index.get_level_values('month') < code]
+
+    def update(self, reviews):
+        """
+        Пересчитывает месяцы начиная с since() по переданным строкам.
+
+        reviews должны содержать все строки с датой заказа не раньше since()
+        (например, всю выгрузку или выборку NPS_REVIEWS_QUERY с :since = since()):
+        счётчики этих месяцев строятся заново, поэтому поздние отзывы и строки
+        с датой, равной watermark, не теряются и не удваиваются.
+
+        Параметры:
+        ----------
+        reviews : pd.DataFrame
+            order_id, date_col, review_id, review_score и колонки разбивок
+
+        Возвращает:
+        -----------
+        int : количество учтённых строк
+        """
+        since = self.since()
+        if since is not None:
+            reviews = reviews[(pd.to_datetime(reviews[self.date_col]) >= since).to_numpy()]
+        if reviews.empty:
+            return 0
+        self._drop_from(since)
+        return self._add(reviews)
+
+    def refresh(self, engine, query=NPS_REVIEWS_QUERY, chunksize=200_000):
+        """
+        Догружает из БД заказы начиная с since() и пересчитывает эти месяцы.
+
+        Запрос должен быть отсортирован по дате заказа: строки последнего месяца
+        пачки переносятся в следующую, поэтому месяц (а с ним дедупликация заказов
+        и review_id внутри месяца) не разрезается между пачками.
+
+        Возвращает:
+        -----------
+        int : количество учтённых строк
+        """
+        since = self.since()
+        added, carry, dropped = 0, None, False
+        params = {'since': (since if since is not None else pd.Timestamp('1900-01-01')).to_pydatetime()}
+        with engine.connect() as conn:
+            for chunk in pd.read_sql(text(query), conn, params=params, chunksize=chunksize):
+                if chunk.empty:
+                    continue
+                if not dropped:
+                    self._drop_from(since)
+                    dropped = True
+                if carry is not None:
+                    chunk = pd.concat([carry, chunk], ignore_index=True)
+                month = month_code(chunk[self.date_col])
+                tail = month == month[-1]
+                carry = chunk[tail]
+                added += self._add(chunk[~tail])
+        if carry is not None:
+            added += self._add(carry)
+        return added
+
+    def _add(self, reviews):
+        if reviews.empty:
+            return 0
+        dates = pd.to_datetime(reviews[self.date_col])
+        month = month_code(dates)
+        bucket = score_bucket(reviews['review_score'])
+        order_ids = reviews['order_id'].to_numpy()
+        review_ids = reviews['review_id'].to_numpy()
+
+        for dim in self._counts:
+            keys = reviews[dim].to_numpy() if dim is not None else None
+            part = _count_table(month, keys, order_ids, review_ids, bucket)
+            current = self._counts[dim]
+            self._counts[dim] = part if current is None else current.add(part, fill_value=0).astype(np.int64)
+
+        self.watermark = dates.max() if self.watermark is None else max(self.watermark, dates.max())
+        return len(reviews)
+
+    def monthly(self, start=None, end=None):
+        """
+        Помесячный NPS в формате plot_nps_analysis.
+
+        Возвращает:
+        -----------
+        pd.DataFrame с колонками NPS_COLUMNS
+        """
+        counts = self._counts[None]
+        if counts is None:
+            return pd.DataFrame(columns=NPS_COLUMNS)
+        result = _with_nps(counts.sort_index()).reset_index()
+        result['month'] = code_to_month(result['month'])
+        if start is not None:
+            result = result[result['month'] >= pd.Timestamp(start)]
+        if end is not None:
+            result = result[result['month'] <= pd.Timestamp(end)]
+        return result[NPS_COLUMNS].reset_index(drop=True)
+
+    def breakdown(self, by, monthly=False, min_reviews=0):
+        """
+        NPS по разбивке без повторного чтения отзывов.
+
+        Параметры:
+        ----------
+        by : str
+            Одна из колонок, переданных в конструктор
+        monthly : bool
+            True — по месяцам и группам, False — итог по группам
+        min_reviews : int
+            Минимум отзывов в строке результата (как HAVING в SQL ноутбука)
+
+        Возвращает:
+        -----------
+        pd.DataFrame: [month,] by, nps_proxy, total_reviews, response_rate и счётчики
+        """
+        if by not in self.by:
+            raise ValueError(f"Разбивка {by!r} не накапливается; доступны: {self.by}")
+        counts = self._counts[by]
+        if counts is None:
+            return pd.DataFrame(columns=[by] + COUNT_COLUMNS)
+
+        if monthly:
+            result = _with_nps(counts).reset_index()
+            result['month'] = code_to_month(result['month'])
+        else:
+            result = _with_nps(counts.groupby(level='key').sum()).reset_index()
+        result = result.rename(columns={'key': by})
+        result = result[result['total_reviews'] >= min_reviews]
+        sort_cols = ['month', by] if monthly else ['nps_proxy']
+        return result.sort_values(sort_cols, ascending=monthly, ignore_index=True)
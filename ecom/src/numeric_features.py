@@ -1,13 +1,10 @@
 # src.numeric_features.py
 
-from scipy import stats
-from scipy.stats import shapiro
 import numpy as np
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 from tabulate import tabulate
-from IPython.display import display, Markdown
+
+from .column_catalog import column_catalog
 
 def pretty_print(df, tablefmt='simple'):
     print(tabulate(df, headers='keys', tablefmt=tablefmt, showindex=False, ))
@@ -27,6 +24,12 @@ def analyze_numeric_features(df_dict, distributions=None, max_sample=5000, bins=
     Возвращает:
         Словарь {имя_таблицы: DataFrame с результатами анализа}
     """
+    # scipy и графические библиотеки импортируются при первом вызове
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from scipy import stats
+    from scipy.stats import shapiro
+
     if distributions is None:
         distributions = ['norm', 'expon', 'lognorm', 'gamma', 'beta', 'uniform']
     if exclude is None:
@@ -38,8 +41,8 @@ def analyze_numeric_features(df_dict, distributions=None, max_sample=5000, bins=
         if df_name in exclude:
             continue
 
-        numeric_cols = df.select_dtypes(include='number').columns
-        if numeric_cols.empty:
+        numeric_cols = column_catalog(df).columns('numeric')
+        if not numeric_cols:
             print(f"\n{'='*125}\n\n{df_name}: Нет числовых признаков для анализа\n")
             continue
 
@@ -2,6 +2,10 @@
 import pandas as pd
 from tabulate import tabulate
 
+from .datetime_parsing import infer_datetime_format, is_date_column, parse_datetime
+from .instrumentation import span, traced
+
+@traced('optimize_data_type')
 def optimize_data_type(dfs: dict, dtype_rules: dict = None, verbose: bool = False) -> dict:
     """
     Оптимизирует типы данных во всех DataFrame с учетом явных правил и формирует отчет.
@@ -24,60 +28,79 @@ def optimize_data_type(dfs: dict, dtype_rules: dict = None, verbose: bool = Fals
 
     for df_name, df in dfs.items():
         original_memory = df.memory_usage(deep=True).sum()
-        optimized_df = df.copy()
-        type_changes = []
-
-        for col in optimized_df.columns:
-            col_data = optimized_df[col]
-            original_type = col_data.dtype
-
-            # Применяем модуль для преобразования временных меток
-            rule_applied = False
-            for pattern, target_dtype in dtype_rules.items():
-                if pattern in col:
-                    try:
-                        if target_dtype == 'datetime':
-                            optimized_df[col] = pd.to_datetime(col_data, errors='coerce')
-                        else:
-                            optimized_df[col] = col_data.astype(target_dtype)
-                        log_change(col, original_type, optimized_df[col].dtype, type_changes, verbose)
-                        rule_applied = True
-                    except Exception as e:
-                        if verbose:
-                            print(f"❌ Ошибка преобразования {col} в {target_dtype}: {e}")
-                    break  # Только первое совпадение
-
-            if rule_applied:
-                continue  # Пропускаем автообработку
-
-            # Автоматическое преобразование
-            if 'date' in col.lower() or 'time' in col.lower() or 'timestamp' in col.lower():
-                optimized_df[col] = pd.to_datetime(col_data, errors='coerce')
-                log_change(col, original_type, optimized_df[col].dtype, type_changes, verbose)
-            elif pd.api.types.is_numeric_dtype(col_data):
-                optimized_df[col] = optimize_numeric_type(col_data)
-                log_change(col, original_type, optimized_df[col].dtype, type_changes, verbose)
-            elif pd.api.types.is_object_dtype(col_data):
-                optimized_df[col] = optimize_categorical_type(col_data)
-                log_change(col, original_type, optimized_df[col].dtype, type_changes, verbose)
-
-        # --- Отчёт по датафрейму ---
-        new_memory = optimized_df.memory_usage(deep=True).sum()
-        memory_diff = original_memory - new_memory
-        total_memory_saved += memory_diff
+        with span('optimize_table', table=df_name, rows=len(df), nbytes=int(original_memory)) as table_span:
+            optimized_df = df.copy()
+            type_changes = []
+            # Форматы дат, найденные при загрузке (convert_dates), не определяются заново
+            date_formats = dict(df.attrs.get('date_formats', {}))
+            date_unparsed = dict(df.attrs.get('date_unparsed', {}))
+
+            def parse_dates(col, col_data):
+                if pd.api.types.is_datetime64_any_dtype(col_data):
+                    return True  # уже разобрана при загрузке
+                fmt = date_formats.get(col) or infer_datetime_format(col_data)
+                if fmt is None:
+                    return False
+                optimized_df[col], date_unparsed[col] = parse_datetime(col_data, fmt)
+                date_formats[col] = fmt
+                return True
+
+            for col in optimized_df.columns:
+                col_data = optimized_df[col]
+                original_type = col_data.dtype
+
+                # Применяем модуль для преобразования временных меток
+                rule_applied = False
+                for pattern, target_dtype in dtype_rules.items():
+                    if pattern in col:
+                        try:
+                            if target_dtype == 'datetime':
+                                if not parse_dates(col, col_data):
+                                    optimized_df[col] = pd.to_datetime(col_data, errors='coerce')
+                            else:
+                                optimized_df[col] = col_data.astype(target_dtype)
+                            log_change(col, original_type, optimized_df[col].dtype, type_changes, verbose)
+                            rule_applied = True
+                        except Exception as e:
+                            if verbose:
+                                print(f"❌ Ошибка преобразования {col} в {target_dtype}: {e}")
+                        break  # Только первое совпадение
+
+                if rule_applied:
+                    continue  # Пропускаем автообработку
+
+                # Автоматическое преобразование
+                if is_date_column(col) and parse_dates(col, col_data):
+                    log_change(col, original_type, optimized_df[col].dtype, type_changes, verbose)
+                elif pd.api.types.is_numeric_dtype(col_data):
+                    optimized_df[col] = optimize_numeric_type(col_data)
+                    log_change(col, original_type, optimized_df[col].dtype, type_changes, verbose)
+                elif pd.api.types.is_object_dtype(col_data):
+                    optimized_df[col] = optimize_categorical_type(col_data)
+                    log_change(col, original_type, optimized_df[col].dtype, type_changes, verbose)
+
+            optimized_df.attrs['date_formats'] = date_formats
+            optimized_df.attrs['date_unparsed'] = date_unparsed
+
+            # --- Отчёт по датафрейму ---
+            new_memory = optimized_df.memory_usage(deep=True).sum()
+            memory_diff = original_memory - new_memory
+            total_memory_saved += memory_diff
         
-        # Формирование отчета
-        reports[df_name] = {
-            'dataframe': optimized_df,
-            'report': {
-                'original_memory': original_memory,
-                'optimized_memory': new_memory,
-                'memory_saved': memory_diff,
-                'type_changes': type_changes,
-                'columns': len(optimized_df.columns),
-                'rows': len(optimized_df)
+            # Формирование отчета
+            reports[df_name] = {
+                'dataframe': optimized_df,
+                'report': {
+                    'original_memory': original_memory,
+                    'optimized_memory': new_memory,
+                    'memory_saved': memory_diff,
+                    'type_changes': type_changes,
+                    'date_unparsed': {col: n for col, n in date_unparsed.items() if n},
+                    'columns': len(optimized_df.columns),
+                    'rows': len(optimized_df)
+                }
             }
-        }
+            table_span.annotate(optimized_bytes=int(new_memory))
         # Вывод отчета
         print_report(df_name, reports[df_name]['report'])
 
@@ -142,6 +165,9 @@ def print_report(df_name: str, report: dict):
         ))
     else:
         print("\nℹ️ Изменений типов данных не обнаружено")
+
+    for col, count in report.get('date_unparsed', {}).items():
+        print(f"⚠️ `{col}`: {count} значений не разобраны как дата → NaT")
     
     # Статистика памяти
     mem_table = [
@@ -0,0 +1,418 @@
+# src.outliers.py
+"""
+Поиск выбросов в числовых колонках: маски вместо графиков.
+
+Границы (fences) считаются для всех числовых колонок таблицы за один
+векторный проход по матрице значений:
+
+    iqr  — вне [Q1 − k·IQR, Q3 + k·IQR] (как в analyze_numeric_features)
+    mad  — робастный z-score 0.6745·|x − медиана| / MAD выше порога
+           (при MAD = 0 — по среднему абсолютному отклонению)
+    isolation_forest — аномальные строки по IsolationForest из scikit-learn
+           (опционально, импортируется при использовании)
+
+Результат — OutlierMasks: по биту на строку для каждой пары (метод, колонка),
+упакованных np.packbits (в 8 раз меньше bool-масок), с распаковкой по запросу
+для фильтрации в коде метрик:
+
+    masks = detect_outliers(deals)
+    deals_clean = masks.filter(deals, columns=['declared_monthly_revenue'])
+
+Для таблиц в БД границы считаются на сервере (percentile_cont), а маски
+собираются по потоку пачек streaming.stream_query, не загружая таблицу целиком.
+"""
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from .streaming import quote_identifier, reservoir_sample, stream_query
+
+METHODS = ('iqr', 'mad', 'isolation_forest')
+ROW_LEVEL = '__row__'  # «колонка» масок, которые относятся к строке целиком (isolation_forest)
+MAD_SCALE = 0.6745     # MAD нормального распределения в единицах σ
+MEAN_AD_SCALE = 0.7979  # то же для среднего абсолютного отклонения
+
+
+def _import_isolation_forest():
+    try:
+        from sklearn.ensemble import IsolationForest
+    except ImportError as e:
+        raise ImportError("method 'isolation_forest' требует пакет scikit-learn: pip install scikit-learn") from e
+    return IsolationForest
+
+
+def numeric_columns(df):
+    """Числовые колонки без флагов (bool)."""
+    return [
+        col for col in df.columns
+        if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])
+    ]
+
+
+def _matrix(df, columns):
+    return df[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def fences_from_stats(stats, iqr_k=1.5, mad_threshold=3.5):
+    """
+    Границы выбросов из квартилей и отклонений.
+
+    Параметры:
+    ----------
+    stats : pd.DataFrame
+        Индекс — колонки; колонки q1, median, q3, mad, mean_ad
+
+    Возвращает:
+    -----------
+    pd.DataFrame: stats + iqr_low, iqr_high, mad_low, mad_high
+    """
+    fences = stats.copy()
+    iqr = fences['q3'] - fences['q1']
+    fences['iqr_low'] = fences['q1'] - iqr_k * iqr
+    fences['iqr_high'] = fences['q3'] + iqr_k * iqr
+
+    # |x − медиана| / σ̂ > порог, σ̂ = MAD / 0.6745 (или mean AD / 0.7979 при MAD = 0)
+    sigma = (fences['mad'] / MAD_SCALE).where(fences['mad'] > 0, fences['mean_ad'] / MEAN_AD_SCALE)
+    width = (mad_threshold * sigma).where(sigma > 0, np.inf)  # константная колонка — выбросов нет
+    fences['mad_low'] = fences['median'] - width
+    fences['mad_high'] = fences['median'] + width
+    return fences
+
+
+def fit_fences(df, columns=None, iqr_k=1.5, mad_threshold=3.5):
+    """
+    Границы IQR и MAD для всех числовых колонок одним проходом по матрице значений.
+
+    Возвращает:
+    -----------
+    pd.DataFrame: по строке на колонку (см. fences_from_stats)
+    """
+    columns = numeric_columns(df) if columns is None else list(columns)
+    values = _matrix(df, columns)
+    valid = ~np.isnan(values).all(axis=0)
+    stats = np.full((len(columns), 5), np.nan)
+    if valid.any():
+        v = values[:, valid]
+        q1, median, q3 = np.nanquantile(v, [0.25, 0.5, 0.75], axis=0)
+        deviation = np.abs(v - median)
+        stats[valid] = np.column_stack([q1, median, q3, np.nanmedian(deviation, axis=0),
+                                        np.nanmean(deviation, axis=0)])
+    stats = pd.DataFrame(stats, index=pd.Index(columns, name='column'),
+                         columns=['q1', 'median', 'q3', 'mad', 'mean_ad'])
+    return fences_from_stats(stats, iqr_k, mad_threshold)
+
+
+def _fence_bits(values, fences, methods):
+    """Маски (n_rows × n_columns) по методам с границами; NaN выбросом не считается."""
+    result = {}
+    for method in methods:
+        if method == 'isolation_forest':
+            continue
+        low = fences[f'{method}_low'].to_numpy()
+        high = fences[f'{method}_high'].to_numpy()
+        with np.errstate(invalid='ignore'):
+            result[method] = (values < low) | (values > high)
+    return result
+
+
+def fit_isolation_forest(df, columns=None, contamination='auto', max_samples=256, random_state=42):
+    """
+    IsolationForest по числовым колонкам (пропуски заменяются медианами).
+
+    Возвращает:
+    -----------
+    tuple: (модель, колонки, медианы для заполнения пропусков)
+    """
+    IsolationForest = _import_isolation_forest()
+    columns = numeric_columns(df) if columns is None else list(columns)
+    values = _matrix(df, columns)
+    medians = np.nan_to_num(np.nanmedian(values, axis=0)) if len(values) else np.zeros(len(columns))
+    values = np.where(np.isnan(values), medians, values)
+    model = IsolationForest(contamination=contamination, max_samples=min(max_samples, max(len(values), 1)),
+                            random_state=random_state, n_jobs=-1)
+    model.fit(values)
+    return model, columns, medians
+
+
+def _forest_scores(forest, df):
+    model, columns, medians = forest
+    values = _matrix(df, columns)
+    values = np.where(np.isnan(values), medians, values)
+    return model.score_samples(values), model.predict(values) == -1
+
+
+def _place_bits(out, src, offset):
+    """
+    Дописывает упакованные строки src в out начиная с бита offset (без распаковки).
+
+    Биты out после offset должны быть нулевыми; хвостовые биты src (паддинг packbits) — тоже.
+    """
+    if src.shape[1] == 0:
+        return
+    start, shift = divmod(offset, 8)
+    width = src.shape[1]
+    if shift == 0:
+        out[:, start:start + width] |= src
+        return
+    out[:, start:start + width] |= src >> shift
+    # Младшие биты каждого байта переходят в следующий байт
+    spill = min(width, out.shape[1] - start - 1)
+    if spill > 0:
+        out[:, start + 1:start + 1 + spill] |= src[:, :spill] << (8 - shift)
+
+
+class OutlierMasks:
+    """
+    Упакованные маски выбросов одной таблицы.
+
+    keys — пары (метод, колонка); для isolation_forest колонка — ROW_LEVEL.
+    Строка i маски k — бит i в bits[k] (np.packbits, порядок строк — как в index).
+    """
+
+    def __init__(self, index, keys, bits, fences=None, scores=None):
+        self.index = index
+        self.keys = list(keys)
+        self.bits = bits
+        self.fences = fences
+        self.scores = scores  # score_samples IsolationForest (меньше — аномальнее)
+
+    @classmethod
+    def from_dense(cls, index, dense, fences=None, scores=None):
+        """Из словаря {(метод, колонка): bool-массив}."""
+        keys = list(dense)
+        bits = np.packbits(np.vstack([dense[k] for k in keys]), axis=1) if keys \
+            else np.zeros((0, 0), dtype=np.uint8)
+        return cls(index, keys, bits, fences, scores)
+
+    @classmethod
+    def concat(cls, parts):
+        """
+        Склеивает маски последовательных пачек одной таблицы.
+
+        Биты пачек сдвигаются прямо в упакованный буфер итоговой длины:
+        пиковая память — упакованные маски, а не n_rows × n_keys bool.
+        """
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls(pd.RangeIndex(0), [], np.zeros((0, 0), dtype=np.uint8))
+        keys = parts[0].keys
+        total = sum(len(p) for p in parts)
+        bits = np.zeros((len(keys), (total + 7) // 8), dtype=np.uint8)
+        offset = 0
+        for part in parts:
+            if part.keys != keys:
+                raise ValueError("Маски пачек посчитаны для разных колонок или методов")
+            _place_bits(bits, part.bits, offset)
+            offset += len(part)
+        index = parts[0].index.append([p.index for p in parts[1:]])
+        scores = None
+        if parts[0].scores is not None:
+            scores = np.concatenate([p.scores for p in parts])
+        return cls(index, keys, bits, parts[0].fences, scores)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def mask(self, column=ROW_LEVEL, method='iqr'):
+        """bool-маска выбросов колонки по методу (длины len(index))."""
+        try:
+            k = self.keys.index((method, column))
+        except ValueError:
+            raise KeyError(f"Нет маски для метода '{method}' и колонки '{column}'") from None
+        return np.unpackbits(self.bits[k], count=len(self.index)).astype(bool)
+
+    def rows(self, columns=None, methods=None, how='any'):
+        """
+        Маска строк с выбросами.
+
+        Параметры:
+        ----------
+        columns : list, optional
+            Колонки (по умолчанию — все); маски isolation_forest учитываются всегда
+        methods : list, optional
+            Методы (по умолчанию — все посчитанные)
+        how : str
+            'any' — выброс хотя бы по одной маске, 'all' — по всем
+
+        Возвращает:
+        -----------
+        pd.Series[bool] с индексом таблицы
+        """
+        selected = [
+            i for i, (method, column) in enumerate(self.keys)
+            if (methods is None or method in methods)
+            and (columns is None or column in columns or column == ROW_LEVEL)
+        ]
+        if not selected:
+            return pd.Series(False, index=self.index)
+        packed = np.bitwise_or.reduce(self.bits[selected]) if how == 'any' \
+            else np.bitwise_and.reduce(self.bits[selected])
+        return pd.Series(np.unpackbits(packed, count=len(self.index)).astype(bool), index=self.index)
+
+    def filter(self, df, columns=None, methods=None, how='any'):
+        """df без строк-выбросов (индекс df должен совпадать с index масок)."""
+        return df[~self.rows(columns, methods, how).reindex(df.index, fill_value=False)]
+
+    def summary(self):
+        """Число и доля выбросов по колонкам (строки) и методам (колонки)."""
+        counts = {
+            key: int(np.unpackbits(self.bits[k], count=len(self.index)).sum()) for k, key in enumerate(self.keys)
+        }
+        table = pd.Series(counts, dtype='int64').unstack(level=0).fillna(0).astype('int64') if counts \
+            else pd.DataFrame()
+        table.index.name, table.columns.name = 'column', None
+        return table
+
+
+def detect_outliers(df, methods=('iqr', 'mad'), columns=None, fences=None, iqr_k=1.5, mad_threshold=3.5,
+                    forest=None, contamination='auto', random_state=42):
+    """
+    Маски выбросов для всех числовых колонок таблицы.
+
+    Параметры:
+    ----------
+    df : pd.DataFrame
+    methods : tuple
+        Подмножество METHODS
+    columns : list, optional
+        Колонки (по умолчанию — все числовые, кроме bool)
+    fences : pd.DataFrame, optional
+        Готовые границы (fit_fences / db_fences), например посчитанные по всей таблице
+    forest : tuple, optional
+        Обученный fit_isolation_forest (иначе обучается на df)
+
+    Возвращает:
+    -----------
+    OutlierMasks
+    """
+    unknown = set(methods) - set(METHODS)
+    if unknown:
+        raise ValueError(f"Неизвестные методы: {sorted(unknown)}; доступны {METHODS}")
+    columns = numeric_columns(df) if columns is None else list(columns)
+    if fences is None:
+        fences = fit_fences(df, columns, iqr_k, mad_threshold)
+    columns = [col for col in columns if col in fences.index]
+    fences = fences.loc[columns]
+
+    dense, scores = {}, None
+    for method, bits in _fence_bits(_matrix(df, columns), fences, methods).items():
+        dense.update({(method, col): bits[:, j] for j, col in enumerate(columns)})
+    if 'isolation_forest' in methods and len(df):
+        if forest is None:
+            forest = fit_isolation_forest(df, columns, contamination, random_state=random_state)
+        scores, anomalous = _forest_scores(forest, df)
+        dense[('isolation_forest', ROW_LEVEL)] = anomalous
+    return OutlierMasks.from_dense(df.index, dense, fences, scores)
+
+
+def outlier_masks(df_dict, exclude=None, **kwargs):
+    """detect_outliers для словаря таблиц: {имя_таблицы: OutlierMasks} (таблицы без числовых колонок пропускаются)."""
+    exclude = exclude or []
+    return {
+        name: detect_outliers(df, **kwargs)
+        for name, df in df_dict.items()
+        if name not in exclude and numeric_columns(df)
+    }
+
+
+# ----------------------------------------------------------------------
+# Потоковый режим для таблиц в БД
+# ----------------------------------------------------------------------
+def db_fences(engine, table_name, columns, iqr_k=1.5, mad_threshold=3.5):
+    """
+    Точные границы по таблице Postgres: квартили и медианы — одним запросом,
+    MAD и среднее абсолютное отклонение — вторым.
+    """
+    quoted = [quote_identifier(engine, col) for col in columns]
+    table = quote_identifier(engine, table_name)
+    quartiles = ', '.join(
+        f"percentile_cont(ARRAY[0.25, 0.5, 0.75]) WITHIN GROUP (ORDER BY {q}::float)" for q in quoted
+    )
+    with engine.connect() as conn:
+        row = conn.execute(text(f'SELECT {quartiles} FROM {table}')).fetchone()
+        q = np.array([list(values) if values is not None else [np.nan] * 3 for values in row], dtype=np.float64)
+
+        params = {f'm{i}': (None if np.isnan(q[i, 1]) else float(q[i, 1])) for i in range(len(columns))}
+        deviations = ', '.join(
+            f"percentile_cont(0.5) WITHIN GROUP (ORDER BY abs({col}::float - :m{i})), avg(abs({col}::float - :m{i}))"
+            for i, col in enumerate(quoted)
+        )
+        dev = np.array(conn.execute(text(f'SELECT {deviations} FROM {table}'), params).fetchone(),
+                       dtype=np.float64).reshape(-1, 2)
+
+    stats = pd.DataFrame({'q1': q[:, 0], 'median': q[:, 1], 'q3': q[:, 2], 'mad': dev[:, 0],
+                          'mean_ad': dev[:, 1]}, index=pd.Index(columns, name='column'))
+    return fences_from_stats(stats, iqr_k, mad_threshold)
+
+
+def masks_from_batches(batches, fences, methods=('iqr', 'mad'), key=None, forest=None):
+    """
+    Маски по потоку пачек с заранее посчитанными границами.
+
+    Параметры:
+    ----------
+    batches : iterable of pd.DataFrame
+    fences : pd.DataFrame
+        Границы (db_fences или fit_fences по выборке)
+    key : str, optional
+        Колонка-ключ: её значения становятся индексом масок (без неё — номера
+        строк по порядку пачек, что осмысленно только для упорядоченного потока)
+    forest : tuple, optional
+        Обученный fit_isolation_forest (нужен для method 'isolation_forest')
+
+    Возвращает:
+    -----------
+    OutlierMasks для всего потока
+    """
+    if 'isolation_forest' in methods and forest is None:
+        raise ValueError("Для isolation_forest в потоковом режиме нужна модель fit_isolation_forest")
+    parts, offset = [], 0
+    for batch in batches:
+        index = pd.Index(batch[key]) if key is not None else pd.RangeIndex(offset, offset + len(batch))
+        offset += len(batch)
+        part = detect_outliers(batch.set_axis(index), methods, list(fences.index), fences, forest=forest)
+        parts.append(part)
+    return OutlierMasks.concat(parts)
+
+
+def stream_outliers(engine, table_name, columns=None, methods=('iqr', 'mad'), key=None, itersize=50_000,
+                    iqr_k=1.5, mad_threshold=3.5, max_sample=50_000, random_state=42):
+    """
+    Маски выбросов таблицы БД без загрузки её в память.
+
+    Границы IQR/MAD считаются на сервере (db_fences); IsolationForest обучается
+    на равномерной выборке потока (streaming.reservoir_sample). Маски
+    собираются вторым проходом по серверному курсору.
+
+    Параметры:
+    ----------
+    columns : list
+        Числовые колонки таблицы
+    key : str
+        Колонка-ключ (например, первичный ключ): поток упорядочивается по ней,
+        значения становятся индексом масок. Обязательна: без ORDER BY порядок
+        строк не определён, и номера строк ни с чем не сопоставить
+
+    Возвращает:
+    -----------
+    OutlierMasks
+    """
+    if not columns:
+        raise ValueError("Укажите числовые колонки таблицы")
+    if key is None:
+        raise ValueError("Укажите key — колонку-ключ таблицы: маски индексируются её значениями")
+    fences = db_fences(engine, table_name, columns, iqr_k, mad_threshold)
+    select = ', '.join(quote_identifier(engine, col) for col in [key] + list(columns))
+    query = (f'SELECT {select} FROM {quote_identifier(engine, table_name)} '
+             f'ORDER BY {quote_identifier(engine, key)}')
+
+    forest = None
+    if 'isolation_forest' in methods:
+        sample = reservoir_sample(stream_query(engine, query, itersize=itersize), max_sample, random_state)
+        forest = fit_isolation_forest(sample, columns, random_state=random_state)
+    return masks_from_batches(stream_query(engine, query, itersize=itersize), fences, methods, key, forest)
@@ -1,8 +1,13 @@
 #src.paretto.py
+import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-def plot_gmv_concentration(df_concentration, custom_palette):
+from .concentration import downsample_curve
+from .plotly_utils import WEBGL_THRESHOLD, finish_figure, lighten_figure
+
+def plot_gmv_concentration(df_concentration, custom_palette, max_points=2000,
+                           webgl_threshold=WEBGL_THRESHOLD, max_html_bytes=None, show=False, as_json=False):
     """
     Строит график концентрации и распределения GMV между продавцами.
     
@@ -19,11 +24,42 @@ def plot_gmv_concentration(df_concentration, custom_palette):
 
     custom_palette : list
         Список с цветами (как минимум один), например: ['#636EFA']
+
+    max_points : int
+        Максимум точек на кривой концентрации; кривая прореживается
+        с ошибкой не более 100 / (max_points / 2) п.п. по каждой оси
+
+    webgl_threshold : int
+        Число точек, после которого кривая рисуется через Scattergl
+
+    max_html_bytes : int, optional
+        Ограничение размера HTML фигуры (кривая дополнительно прореживается LTTB)
+
+    show : bool
+        Показать фигуру сразу (по умолчанию фигура только возвращается)
+
+    as_json : bool
+        Вернуть также компактный JSON фигуры
+
+    Возвращает:
+    -----------
+    go.Figure или (go.Figure, str)
     """
 
     # Точка Парето: первые 20% продавцов
     pareto_point = df_concentration[df_concentration['cumulative_seller_percent'] >= 20].iloc[0]
 
+    # Прореживание кривой: размер фигуры не зависит от числа продавцов
+    curve_idx = downsample_curve(
+        df_concentration['cumulative_seller_percent'].to_numpy(),
+        df_concentration['cumulative_gmv_percent'].to_numpy(),
+        max_points=max_points
+    )
+    curve = df_concentration.iloc[curve_idx]
+
+    # Гистограмма считается заранее и передаётся готовыми столбцами
+    hist_counts, hist_edges = np.histogram(df_concentration['percent_gmv'].to_numpy(), bins=50)
+
     # Сабплот
     fig = make_subplots(
         rows=2, cols=1,
@@ -38,13 +74,13 @@ def plot_gmv_concentration(df_concentration, custom_palette):
     # Линия концентрации GMV 
     fig.add_trace(
         go.Scatter(
-            x=df_concentration['cumulative_seller_percent'],
-            y=df_concentration['cumulative_gmv_percent'],
+            x=curve['cumulative_seller_percent'],
+            y=curve['cumulative_gmv_percent'],
             mode='lines+markers',
             name='Фактическое распределение',
             line=dict(color=custom_palette[0], width=3),
             hovertemplate='<b>Продавец</b>: %{customdata[0]}<br>GMV: %{customdata[1]: .0f}₽<extra></extra>',
-            customdata=df_concentration[['seller_id', 'gmv']]
+            customdata=curve[['seller_id', 'gmv']]
         ),
         row=1, col=1
     )
@@ -89,9 +125,10 @@ def plot_gmv_concentration(df_concentration, custom_palette):
 
     # Нижний график: Гистограмма
     fig.add_trace(
-        go.Histogram(
-            x=df_concentration['percent_gmv'],
-            nbinsx=50,
+        go.Bar(
+            x=(hist_edges[:-1] + hist_edges[1:]) / 2,
+            y=hist_counts,
+            width=np.diff(hist_edges),
             marker_color=custom_palette[0],
             name='Распределение GMV'
         ),
@@ -126,4 +163,5 @@ def plot_gmv_concentration(df_concentration, custom_palette):
         row=2, col=1
     )
 
-    fig.show()
+    fig = lighten_figure(fig, webgl_threshold=webgl_threshold, max_html_bytes=max_html_bytes)
+    return finish_figure(fig, show=show, as_json=as_json)
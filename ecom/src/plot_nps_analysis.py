@@ -1,7 +1,32 @@
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
 
-def plot_nps_analysis(nps_df):
+from .nps import NPSAggregator
+from .plotly_utils import finish_figure
+
+def plot_nps_analysis(nps_df, show=False, as_json=False):
+    """
+    Динамика NPS-прокси и распределение оценок по месяцам.
+
+    Параметры:
+    ----------
+    nps_df : pd.DataFrame или NPSAggregator
+        Результат NPSAggregator.monthly() (month, nps_proxy, response_rate,
+        detractors, neutrals, promoters) либо сам накопитель
+
+    show : bool
+        Показать фигуру сразу (по умолчанию фигура только возвращается)
+
+    as_json : bool
+        Вернуть также компактный JSON фигуры
+
+    Возвращает:
+    -----------
+    go.Figure или (go.Figure, str)
+    """
+    if isinstance(nps_df, NPSAggregator):
+        nps_df = nps_df.monthly()
+
     colors = {
         'nps': '#4B9AC7',
         'trend': '#FF6B6B',
@@ -72,4 +97,4 @@ def plot_nps_analysis(nps_df):
     fig.update_yaxes(title_text="Количество отзывов", row=2, col=1)
     fig.update_xaxes(title_text="Месяц", row=2, col=1)
 
-    fig.show()
+    return finish_figure(fig, show=show, as_json=as_json)
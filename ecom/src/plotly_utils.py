@@ -0,0 +1,246 @@
+# src.plotly_utils.py
+"""
+Облегчение Plotly-фигур для больших рядов.
+
+- use_webgl: go.Scatter → go.Scattergl для трасс больше порога
+- lttb: прореживание Largest-Triangle-Three-Buckets, сохраняющее форму линии
+- trim_hover: удаление неиспользуемого customdata (округление — по запросу)
+- fit_to_budget: прореживание трасс, пока HTML не уложится в заданный размер
+- finish_figure: единый выход построителей (фигура и компактный JSON без show)
+- benchmark_figure: время построения/сериализации и размер HTML
+"""
+
+import time
+
+import numpy as np
+import plotly.graph_objects as go
+
+WEBGL_THRESHOLD = 5_000  # точек в трассе, после которых SVG заметно тормозит
+
+# Атрибуты трассы, которые нужно прореживать вместе с x/y
+_POINT_ATTRS = ('x', 'y', 'customdata', 'text', 'hovertext', 'ids')
+_MARKER_ATTRS = ('size', 'color', 'symbol', 'opacity')
+
+
+def lttb(x, y, n_out):
+    """
+    Индексы точек, выбранных алгоритмом LTTB.
+
+    Ряд делится на n_out - 2 корзины; из каждой берётся точка, образующая
+    наибольший треугольник с предыдущей выбранной точкой и средним
+    следующей корзины. Первая и последняя точки сохраняются.
+
+    Параметры:
+    ----------
+    x, y : array-like
+        Координаты (x — числа или даты, отсортированные по возрастанию)
+    n_out : int
+        Число точек на выходе
+
+    Возвращает:
+    -----------
+    np.ndarray: отсортированные индексы выбранных точек
+    """
+    x = _as_float(x)
+    y = _as_float(y)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo = edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.nanargmax(area)) if np.isfinite(area).any() else lo
+        idx[i + 1] = a
+    return idx
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return values.astype(np.float64)
+
+
+def _n_points(trace):
+    return len(trace.x) if getattr(trace, 'x', None) is not None else 0
+
+
+def _subset_trace(trace, idx):
+    """Оставляет в трассе только точки idx (x, y, customdata, тексты, массивы маркера)."""
+    n = _n_points(trace)
+    for attr in _POINT_ATTRS:
+        values = getattr(trace, attr, None)
+        if values is not None and not isinstance(values, str) and len(values) == n:
+            trace[attr] = np.asarray(values)[idx]
+    marker = getattr(trace, 'marker', None)
+    if marker is not None:
+        for attr in _MARKER_ATTRS:
+            values = getattr(marker, attr, None)
+            if values is not None and not isinstance(values, (str, int, float)) and len(values) == n:
+                marker[attr] = np.asarray(values)[idx]
+
+
+def downsample_trace(trace, n_out):
+    """
+    Прореживает трассу до n_out точек.
+
+    Линии — LTTB (форма сохраняется), маркеры — равномерный шаг по индексам.
+    """
+    n = _n_points(trace)
+    if n <= n_out:
+        return trace
+    mode = getattr(trace, 'mode', None) or 'lines'
+    if 'lines' in mode and trace.y is not None:
+        idx = lttb(trace.x, trace.y, n_out)
+    else:
+        idx = np.unique(np.linspace(0, n - 1, n_out).astype(np.int64))
+    _subset_trace(trace, idx)
+    return trace
+
+
+_SCATTERGL_PROPS = frozenset(go.Scattergl()._valid_props) - {'type'}
+
+
+def use_webgl(fig, threshold=WEBGL_THRESHOLD):
+    """
+    Заменяет go.Scatter на go.Scattergl в трассах, где больше threshold точек.
+
+    Возвращает новую фигуру с тем же layout (оси сабплотов, shapes, аннотации).
+    """
+    if not any(isinstance(t, go.Scatter) and _n_points(t) > threshold for t in fig.data):
+        return fig
+    traces = []
+    for trace in fig.data:
+        if isinstance(trace, go.Scatter) and _n_points(trace) > threshold:
+            # Переносим только свойства, которые есть у Scattergl (orientation, cliponaxis, ... — нет)
+            props = {key: value for key, value in trace.to_plotly_json().items() if key in _SCATTERGL_PROPS}
+            trace = go.Scattergl(**props)
+        traces.append(trace)
+    return go.Figure(data=traces, layout=fig.layout)
+
+
+def trim_hover(fig, decimals=None):
+    """
+    Уменьшает hover-нагрузку: удаляет customdata, если hovertemplate его не использует.
+
+    Координаты x/y не меняются. decimals — округлить числовой customdata
+    (только то, что показывается в подсказке), по умолчанию не округляется.
+    """
+    for trace in fig.data:
+        template = getattr(trace, 'hovertemplate', None) or ''
+        customdata = getattr(trace, 'customdata', None)
+        if customdata is None:
+            continue
+        if 'customdata' not in template:
+            trace.customdata = None
+        elif decimals is not None:
+            values = np.asarray(customdata)
+            if np.issubdtype(values.dtype, np.floating):
+                trace.customdata = np.round(values, decimals)
+    return fig
+
+
+def figure_html_bytes(fig):
+    """Размер HTML фигуры без plotly.js (то, что попадает в вывод ноутбука)."""
+    return len(fig.to_html(include_plotlyjs=False, full_html=False).encode('utf-8'))
+
+
+def fit_to_budget(fig, max_bytes=2 * 1024**2, min_points=200):
+    """
+    Прореживает самые большие трассы, пока HTML не станет меньше max_bytes.
+
+    На каждом шаге число точек в трассах больше min_points уменьшается вдвое.
+
+    Возвращает:
+    -----------
+    go.Figure: та же фигура (изменяется на месте)
+    """
+    size = figure_html_bytes(fig)
+    while size > max_bytes:
+        large = [trace for trace in fig.data if _n_points(trace) > min_points]
+        if not large:
+            break
+        for trace in large:
+            downsample_trace(trace, max(_n_points(trace) // 2, min_points))
+        size = figure_html_bytes(fig)
+    return fig
+
+
+def lighten_figure(fig, webgl_threshold=WEBGL_THRESHOLD, max_html_bytes=None, decimals=None):
+    """WebGL для больших трасс, облегчённый hover и (опционально) ограничение размера HTML."""
+    fig = use_webgl(fig, threshold=webgl_threshold)
+    trim_hover(fig, decimals=decimals)
+    if max_html_bytes is not None:
+        fit_to_budget(fig, max_bytes=max_html_bytes)
+    return fig
+
+
+def figure_json(fig):
+    """Компактный JSON фигуры: без отступов и uid трасс."""
+    return fig.to_json(pretty=False, remove_uids=True)
+
+
+def finish_figure(fig, show=False, as_json=False):
+    """
+    Общий выход построителей графиков.
+
+    Параметры:
+    ----------
+    show : bool
+        Показать фигуру (fig.show())
+    as_json : bool
+        Вернуть также компактный JSON фигуры
+
+    Возвращает:
+    -----------
+    go.Figure или (go.Figure, str)
+    """
+    if show:
+        fig.show()
+    return (fig, figure_json(fig)) if as_json else fig
+
+
+def benchmark_figure(build, *args, repeat=3, **kwargs):
+    """
+    Замеряет построение фигуры и её сериализацию.
+
+    Параметры:
+    ----------
+    build : callable
+        Функция, возвращающая go.Figure
+    repeat : int
+        Число повторов (берётся лучшее время)
+
+    Возвращает:
+    -----------
+    dict: build_s, to_json_s, html_bytes, points, traces
+    """
+    build_times, json_times = [], []
+    fig = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fig = build(*args, **kwargs)
+        build_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        fig.to_json()
+        json_times.append(time.perf_counter() - start)
+
+    return {
+        'build_s': round(min(build_times), 4),
+        'to_json_s': round(min(json_times), 4),
+        'html_bytes': figure_html_bytes(fig),
+        'points': sum(_n_points(trace) for trace in fig.data),
+        'traces': len(fig.data),
+    }
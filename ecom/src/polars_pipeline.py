@@ -0,0 +1,257 @@
+# src.polars_pipeline.py
+"""
+Ленивый путь загрузки на Polars: load_and_inspect + optimize_data_type одним планом.
+
+Для каждого CSV строится LazyFrame: snake_case-имена, разбор дат, удаление
+полных дубликатов и дубликатов по первичному ключу. Даты разбираются как в
+datetime_parsing: формат подбирается по небольшой выборке, колонка разбирается
+с этим форматом, а колонка, не подошедшая ни под один формат, остаётся строкой. Выбор колонок и фильтры
+проталкиваются в сканирование файла (projection / predicate pushdown), планы
+всех таблиц исполняются одним pl.collect_all на всех ядрах. Затем по одному
+проходу статистики на таблицу типы сжимаются по тем же правилам, что
+в optimize_data_type, и результат отдаётся как pandas, Arrow или Polars.
+
+    datasets = lazy_load_and_optimize('datasets', filters={'orders': pl.col('order_status') == 'доставлен'})
+
+Требует пакета polars (pip install polars); для output='pandas' — ещё и pyarrow.
+"""
+
+import os
+
+import pandas as pd
+from tabulate import tabulate
+
+from .column_catalog import to_snake_case
+from .datetime_parsing import LOAD_DATE_MARKERS, infer_datetime_format, is_date_column
+from .instrumentation import span, traced
+
+
+def _import_polars():
+    try:
+        import polars as pl
+    except ImportError as e:
+        raise ImportError("Ленивый путь загрузки требует пакет polars: pip install polars") from e
+    return pl
+
+
+def _polars_format(fmt):
+    """Формат strftime → формат chrono (дробные секунды пишутся как %.f)."""
+    return fmt.replace('.%f', '%.f')
+
+
+def _date_exprs(pl, samples, sample_size=1_000):
+    """
+    Выражения разбора дат по выборкам {колонка: pl.Series}.
+
+    Формат подбирается infer_datetime_format (как при загрузке в pandas);
+    колонки без подходящего формата не трогаются.
+    """
+    exprs = []
+    for col, values in samples.items():
+        fmt = infer_datetime_format(pd.Series(values.to_list(), dtype=object), sample_size)
+        if fmt is not None:
+            exprs.append(pl.col(col).str.to_datetime(format=_polars_format(fmt), strict=False))
+    return exprs
+
+
+def _base_plan(pl, path, columns=None, predicate=None, sample_size=1_000):
+    """Сканирование CSV: snake_case-имена, выбор колонок, разбор дат, фильтр."""
+    lf = pl.scan_csv(path, infer_schema_length=10_000)
+    lf = lf.rename({col: to_snake_case(col) for col in lf.collect_schema().names()})
+    if columns is not None:
+        lf = lf.select(columns)
+
+    date_cols = [col for col, dtype in lf.collect_schema().items()
+                 if is_date_column(col, LOAD_DATE_MARKERS) and dtype == pl.String]
+    if date_cols:
+        # Выборка читает только начало файла и только эти колонки
+        sample = lf.select(pl.col(col).drop_nulls().head(sample_size).implode() for col in date_cols).collect()
+        dates = _date_exprs(pl, {col: sample[col][0] for col in date_cols}, sample_size)
+        if dates:
+            lf = lf.with_columns(dates)
+    if predicate is not None:
+        lf = lf.filter(predicate)
+    return lf
+
+
+def scan_table(path, columns=None, predicate=None, primary_key=None):
+    """
+    План очистки одной таблицы (ничего не читает до collect).
+
+    Параметры:
+    ----------
+    path : str
+        Путь к CSV
+    columns : list, optional
+        Нужные колонки (в snake_case); остальные не читаются из файла
+    predicate : pl.Expr, optional
+        Фильтр строк (по snake_case-колонкам, даты уже разобраны);
+        проталкивается в сканирование
+    primary_key : str или list, optional
+        Ключ для удаления неявных дубликатов (первая строка сохраняется)
+
+    Возвращает:
+    -----------
+    pl.LazyFrame
+    """
+    pl = _import_polars()
+    lf = _base_plan(pl, path, columns, predicate).unique(maintain_order=True)
+    if primary_key is not None:
+        lf = lf.unique(subset=primary_key, keep='first', maintain_order=True)
+    return lf
+
+
+def _stat_exprs(pl, schema, n_rows):
+    """Выражения статистики для выбора типов (одна агрегация на таблицу)."""
+    exprs = []
+    for col, dtype in schema.items():
+        c = pl.col(col)
+        if dtype.is_numeric():
+            exprs += [
+                c.min().cast(pl.Float64).alias(f'{col}__min'),
+                c.max().cast(pl.Float64).alias(f'{col}__max'),
+                ((c == 0) | (c == 1) | c.is_null()).all().alias(f'{col}__binary'),
+                c.null_count().alias(f'{col}__nulls'),
+            ]
+            if dtype.is_float():
+                exprs.append(((c % 1 == 0) | c.is_null() | c.is_nan()).all().alias(f'{col}__integral'))
+        elif dtype == pl.String and n_rows:
+            exprs.append(c.n_unique().alias(f'{col}__nunique'))
+    return exprs
+
+
+def _smallest_int(pl, low, high):
+    for dtype, info in ((pl.Int8, (-2**7, 2**7 - 1)), (pl.Int16, (-2**15, 2**15 - 1)),
+                        (pl.Int32, (-2**31, 2**31 - 1))):
+        if info[0] <= low and high <= info[1]:
+            return dtype
+    return pl.Int64
+
+
+def downcast_exprs(df):
+    """
+    Приведения типов по правилам optimize_data_type.
+
+    - строки с date/time/timestamp в имени, подошедшие под формат → Datetime
+    - числа только из 0/1 → Boolean
+    - целые → минимальный знаковый Int; целые float без пропусков — тоже в Int
+    - остальные float → Float32
+    - строки с 1 < nunique < n/2 → Categorical
+
+    Возвращает:
+    -----------
+    list[pl.Expr]
+    """
+    pl = _import_polars()
+    schema = df.schema
+    date_casts = _date_exprs(pl, {col: df[col].drop_nulls().gather_every(max(1, df.height // 1_000))
+                                  for col, dtype in schema.items() if dtype == pl.String and is_date_column(col)})
+    dates = {expr.meta.output_name() for expr in date_casts}
+    schema = {col: dtype for col, dtype in schema.items() if col not in dates}
+    exprs = _stat_exprs(pl, schema, df.height)
+    if not exprs or df.height == 0:
+        return date_casts
+    stats = df.select(exprs).row(0, named=True)
+
+    casts = date_casts
+    for col, dtype in schema.items():
+        if dtype.is_numeric():
+            low, high = stats[f'{col}__min'], stats[f'{col}__max']
+            if low is None:
+                continue
+            if stats[f'{col}__binary']:
+                casts.append(pl.col(col).cast(pl.Boolean))
+            elif dtype.is_integer() or (stats[f'{col}__integral'] and stats[f'{col}__nulls'] == 0):
+                casts.append(pl.col(col).cast(_smallest_int(pl, low, high)))
+            elif dtype.is_float():
+                casts.append(pl.col(col).cast(pl.Float32))
+        elif dtype == pl.String:
+            if 1 < stats[f'{col}__nunique'] < df.height // 2:
+                casts.append(pl.col(col).cast(pl.Categorical))
+    return casts
+
+
+def _to_pandas(df):
+    """Polars → pandas; Boolean с пропусками становится nullable 'boolean', как в optimize_numeric_type."""
+    pl = _import_polars()
+    result = df.to_pandas()
+    for col, dtype in df.schema.items():
+        if dtype == pl.Boolean and df[col].null_count():
+            result[col] = result[col].astype('boolean')
+    return result
+
+
+@traced('lazy_load_and_optimize')
+def lazy_load_and_optimize(folder_path='datasets', columns=None, filters=None, pk_dict=None,
+                           output='pandas', optimize=True, verbose=True):
+    """
+    Загружает CSV каталога ленивыми планами Polars, чистит и сжимает типы.
+
+    Параметры:
+    ----------
+    folder_path : str
+        Каталог с CSV (имя таблицы — имя файла)
+    columns : dict, optional
+        {таблица: [колонки]} — читать только эти колонки
+    filters : dict, optional
+        {таблица: pl.Expr} — фильтр строк до дедупликации
+    pk_dict : dict, optional
+        {таблица: [колонки ключа]} — удаление неявных дубликатов по ключу
+    output : str
+        'pandas', 'arrow' или 'polars'
+    optimize : bool
+        Сжимать типы (как optimize_data_type)
+
+    Возвращает:
+    -----------
+    dict: {таблица: DataFrame / pyarrow.Table / pl.DataFrame}
+    """
+    if output not in ('pandas', 'arrow', 'polars'):
+        raise ValueError("output должен быть 'pandas', 'arrow' или 'polars'")
+    pl = _import_polars()
+    if not os.path.exists(folder_path):
+        print(f"⚠️ Указанный путь {folder_path} не существует.")
+        return {}
+    files = sorted(file for file in os.listdir(folder_path) if file.endswith('.csv'))
+    if not files:
+        print(f"⚠️ В папке {folder_path} не найдено файлов CSV.")
+        return {}
+
+    columns, filters, pk_dict = columns or {}, filters or {}, pk_dict or {}
+    names = [file[:-len('.csv')] for file in files]
+    plans, counts = [], []
+    for name, file in zip(names, files):
+        path = os.path.join(folder_path, file)
+        plans.append(scan_table(path, columns.get(name), filters.get(name), pk_dict.get(name)))
+        # Строк до дедупликации (с теми же колонками и фильтром) — для отчёта
+        counts.append(_base_plan(pl, path, columns.get(name), filters.get(name)).select(pl.len()))
+
+    with span('lazy_collect', tables=len(plans)):
+        frames = pl.collect_all(plans + counts)
+    tables, before = frames[:len(plans)], [int(c.item()) for c in frames[len(plans):]]
+
+    datasets, report = {}, []
+    for name, df, n_before in zip(names, tables, before):
+        size_before = df.estimated_size()
+        if optimize:
+            with span('lazy_optimize', table=name, rows=df.height):
+                casts = downcast_exprs(df)
+                if casts:
+                    df = df.with_columns(casts)
+        report.append([name, n_before, n_before - df.height, df.width,
+                       round(size_before / 1024**2, 2), round(df.estimated_size() / 1024**2, 2)])
+
+        if output == 'pandas':
+            datasets[name] = _to_pandas(df)
+        elif output == 'arrow':
+            datasets[name] = df.to_arrow()
+        else:
+            datasets[name] = df
+
+    if verbose:
+        print("\n✅ Загружены таблицы (Polars, ленивый план):")
+        print(tabulate(report, headers=['Таблица', 'Строк', 'Удалено дубликатов', 'Колонок',
+                                        'До сжатия, МБ', 'После, МБ'],
+                       tablefmt='Pretty_Table'))
+    return datasets
+
@@ -0,0 +1,324 @@
+# src.query_service.py
+"""
+Сервис выполнения SQL-запросов с кэшем результатов на диске.
+
+- Соединения берутся из пула SQLAlchemy engine (один engine на процесс)
+- Ключ кэша: нормализованный SQL + параметры + версии используемых таблиц
+  (счётчики вставок/обновлений/удалений из pg_stat_user_tables);
+  нормализованный текст служит только ключом, выполняется исходный запрос
+- Вытеснение по TTL и по суммарному размеру кэша (сначала самые старые)
+- DataFrame собирается по колонкам, без промежуточных Row-объектов;
+  режим fetch='copy' читает результат через COPY ... TO STDOUT в pd.read_csv
+  с типами колонок из cursor.description
+- Запись кэша атомарна: файл пишется во временный и переименовывается
+  (os.replace), так что параллельный читатель не видит недописанный pickle
+
+Ограничения версий таблиц:
+- pg_stat_user_tables обновляется асинхронно: другой процесс сбрасывает свои
+  счётчики после завершения транзакции с задержкой до ~1 с (в простое — до
+  10 с), поэтому сразу после записи кэш может вернуть старый результат.
+  Чтобы прочитать только что записанные данные, используйте use_cache=False
+  или clear()
+- если версии хотя бы одной таблицы получить нельзя (нет прав, не PostgreSQL,
+  таблица не найдена), результат не кэшируется
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import time
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from .db_utils import get_engine
+
+# Версия таблицы меняется при любой вставке/изменении/удалении строк
+TABLE_VERSIONS_QUERY = """
+SELECT relname, n_tup_ins + n_tup_upd + n_tup_del AS version
+FROM pg_stat_user_tables
+WHERE relname IN :tables;
+"""
+
+_TABLE_VERSIONS = text(TABLE_VERSIONS_QUERY).bindparams(bindparam('tables', expanding=True))
+
+_TABLE_PATTERN = re.compile(r'\b(?:from|join)\s+"?([a-zA-Z_][\w]*)"?', re.IGNORECASE)
+
+# Литералы ('...', "...", $tag$...$tag$) сохраняются как есть, комментарии и пробелы схлопываются
+_SQL_TOKENS = re.compile(
+    r"(?P<literal>'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\$(?P<tag>\w*)\$.*?\$(?P=tag)\$)"
+    r"|(?P<gap>(?:\s+|--[^\n]*|/\*.*?\*/)+)",
+    re.DOTALL,
+)
+
+
+def _normalize_token(match):
+    return match.group('literal') or ' '
+
+
+def normalize_sql(query_str):
+    """
+    Канонический вид SQL для ключа кэша: без комментариев, лишних пробелов и ';' в конце.
+
+    Строковые литералы не меняются ('--' внутри строки — не комментарий).
+    """
+    return _SQL_TOKENS.sub(_normalize_token, query_str).strip().rstrip(';').strip()
+
+
+def referenced_tables(query_str):
+    """Таблицы, упомянутые после FROM/JOIN (имена CTE отбрасываются)."""
+    normalized = normalize_sql(query_str)
+    ctes = set(re.findall(r'(\w+)\s+as\s*\(', normalized, flags=re.IGNORECASE))
+    return sorted({t.lower() for t in _TABLE_PATTERN.findall(normalized)} - {c.lower() for c in ctes})
+
+
+# OID типов PostgreSQL → dtype для pd.read_csv (fetch='copy')
+_PG_DTYPES = {
+    16: 'boolean',                                     # bool
+    20: 'Int64', 21: 'Int16', 23: 'Int32',             # int8, int2, int4
+    700: 'float32', 701: 'float64', 1700: 'float64',   # float4, float8, numeric
+    25: str, 1042: str, 1043: str,                     # text, char, varchar
+}
+_PG_DATES = {1082, 1114, 1184}  # date, timestamp, timestamptz
+
+
+def _column(values):
+    """Колонка из кортежа значений; Decimal (NUMERIC) → float64, как coerce_float."""
+    first = next((value for value in values if value is not None), None)
+    if isinstance(first, Decimal):
+        return np.array(values, dtype=np.float64)
+    return values
+
+
+def _rows_to_frame(result):
+    """Собирает DataFrame по колонкам из DBAPI-кортежей (без Row-объектов и from_records)."""
+    columns = list(result.keys())
+    rows = result.cursor.fetchall() if result.cursor is not None else []
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    # Колонки по позиции: одинаковые имена в SELECT не схлопываются
+    frame = pd.DataFrame({i: _column(values) for i, values in enumerate(zip(*rows))})
+    frame.columns = columns
+    return frame
+
+
+def _copy_read_options(description):
+    """Аргументы pd.read_csv (dtype, parse_dates) по cursor.description результата."""
+    dtype, parse_dates = {}, []
+    for column in description:
+        name, type_code = column[0], column[1]
+        if type_code in _PG_DATES:
+            parse_dates.append(name)
+        elif type_code in _PG_DTYPES:
+            dtype[name] = _PG_DTYPES[type_code]
+    return {'dtype': dtype, 'parse_dates': parse_dates, 'true_values': ['t'], 'false_values': ['f']}
+
+
+class QueryService:
+    """
+    Выполнение запросов с мемоизацией результатов.
+
+    Параметры:
+    ----------
+    engine : sqlalchemy.Engine, optional
+        Подключение; по умолчанию — общий engine из db_utils.get_engine()
+    cache_dir : str
+        Каталог для кэша результатов
+    ttl : float
+        Время жизни записи кэша в секундах (None — без ограничения)
+    max_bytes : int
+        Максимальный суммарный размер кэша на диске
+    """
+
+    def __init__(self, engine=None, cache_dir='.query_cache', ttl=24 * 3600, max_bytes=512 * 1024**2):
+        self.engine = engine if engine is not None else get_engine()
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Публичный API
+    # ------------------------------------------------------------------
+    def run(self, query_str, params=None, fetch='df', tables=None, use_cache=True):
+        """
+        Выполняет SQL-запрос и возвращает результат (с кэшем).
+
+        Параметры:
+        - query_str: SQL-запрос (с :placeholder если нужны параметры)
+        - params: dict с параметрами
+        - fetch: one / all / scalar / df / copy
+        - tables: таблицы, от версий которых зависит кэш (по умолчанию — из FROM/JOIN)
+        - use_cache: False — всегда выполнять запрос
+
+        Возвращает:
+        - список строк, одну строку, скаляр или DataFrame (если fetch='df' или 'copy')
+        """
+        if fetch not in ('df', 'copy', 'all', 'one', 'scalar'):
+            raise ValueError("fetch должен быть 'all', 'one', 'scalar', 'df' или 'copy'")
+        params = params or {}
+
+        if not use_cache:
+            return self._execute(query_str, params, fetch)
+
+        if tables is None:
+            tables = referenced_tables(query_str)
+        versions = self.table_versions(tables)
+        if set(versions) != {t.lower() for t in tables}:
+            # Без версий запись нельзя инвалидировать — не кэшируем
+            self.misses += 1
+            return self._execute(query_str, params, fetch)
+        key = self.cache_key(query_str, params, fetch, versions)
+        path = os.path.join(self.cache_dir, f'{key}.pkl')
+
+        cached = self._read_cache(path)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        value = self._execute(query_str, params, fetch)
+        self._write_cache(path, value)
+        self.evict()
+        return value
+
+    def table_versions(self, tables):
+        """Текущие версии таблиц; пустой словарь, если статистика недоступна."""
+        if not tables:
+            return {}
+        try:
+            with self.engine.connect() as conn:
+                result = conn.execute(_TABLE_VERSIONS, {'tables': [t.lower() for t in tables]})
+                return {name.lower(): int(version) for name, version in result.fetchall()}
+        except Exception:
+            return {}
+
+    @staticmethod
+    def cache_key(query_str, params, fetch, versions):
+        """Хэш нормализованного SQL, параметров и версий таблиц."""
+        payload = json.dumps(
+            {'sql': normalize_sql(query_str), 'params': params, 'fetch': fetch, 'versions': versions},
+            sort_keys=True, default=str,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def evict(self):
+        """Удаляет просроченные записи и самые старые, пока кэш больше max_bytes."""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.tmp'):
+                continue  # запись, которую сейчас дописывает другой процесс
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if self.ttl is not None and now - stat.st_mtime > self.ttl:
+                os.remove(path)
+                continue
+            entries.append((stat.st_atime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        """Полностью очищает кэш."""
+        for name in os.listdir(self.cache_dir):
+            os.remove(os.path.join(self.cache_dir, name))
+
+    # ------------------------------------------------------------------
+    # Внутреннее
+    # ------------------------------------------------------------------
+    def _read_cache(self, path):
+        if not os.path.exists(path):
+            return None
+        if self.ttl is not None and time.time() - os.path.getmtime(path) > self.ttl:
+            os.remove(path)
+            return None
+        os.utime(path, (time.time(), os.path.getmtime(path)))  # отметка последнего чтения для LRU
+        return pd.read_pickle(path)
+
+    def _write_cache(self, path, value):
+        """Пишет запись во временный файл того же каталога и атомарно подменяет path."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            pd.to_pickle(value, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _execute(self, query_str, params, fetch):
+        if fetch == 'copy':
+            return _copy_to_frame(self.engine, query_str, params)
+        return _execute(self.engine, query_str, params, fetch)
+
+
+def _execute(engine, query_str, params, fetch):
+    """Выполняет запрос на соединении из пула и возвращает результат нужного вида."""
+    with engine.connect() as conn:
+        result = conn.execute(text(query_str), params)
+        if fetch == 'df':
+            return _rows_to_frame(result)
+        elif fetch == 'all':
+            return result.fetchall()
+        elif fetch == 'one':
+            return result.fetchone()
+        elif fetch == 'scalar':
+            return result.scalar()
+        raise ValueError("fetch должен быть 'all', 'one', 'scalar' или 'df'")
+
+
+def _copy_to_frame(engine, query_str, params):
+    """
+    Выгружает результат через COPY (CSV) и разбирает его в pd.read_csv по колонкам.
+
+    Типы колонок берутся из cursor.description (запрос с LIMIT 0): даты
+    разбираются, текст остаётся строками ('00123' не становится числом),
+    целые с пропусками — nullable Int.
+    """
+    statement = text(re.sub(r';\s*$', '', query_str)).bindparams(**params)
+    compiled = statement.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True})
+    buffer = io.StringIO()
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        # Перенос строки перед ')' — чтобы завершающий '--' комментарий не поглотил её
+        cursor.execute(f'SELECT * FROM ({compiled}\n) AS copy_source LIMIT 0')
+        options = _copy_read_options(cursor.description)
+        cursor.copy_expert(f'COPY ({compiled}\n) TO STDOUT WITH CSV HEADER', buffer)
+        cursor.close()
+    finally:
+        raw.close()
+    buffer.seek(0)
+    return pd.read_csv(buffer, **options)
+
+
+def run_query(engine, query_str, params=None, fetch="df"):
+    """
+    Выполняет SQL-запрос без кэша (совместимо с run_query из ноутбука метрик).
+
+    Параметры:
+    - engine: SQLAlchemy engine
+    - query_str: SQL-запрос (с :placeholder если нужны параметры)
+    - params: dict с параметрами
+    - fetch: one / all / scalar / df
+
+    Возвращает:
+    - список строк, одну строку, скаляр или DataFrame (если fetch='df')
+    """
+    return _execute(engine, query_str, params or {}, fetch)
@@ -0,0 +1,332 @@
+# src.rfm.py
+"""
+RFM-сегментация покупателей (recency, frequency, monetary).
+
+Агрегаты считаются одним groupby по customer_unique_id и складываются
+ассоциативно (max / sum / sum), поэтому один и тот же код работает:
+- целиком в памяти (rfm_aggregate)
+- пачками из БД (rfm_from_db)
+- инкрементально при поступлении новых заказов (merge_rfm, RFMAccumulator)
+- полностью на стороне Postgres (RFM_PUSHDOWN_QUERY)
+"""
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from .cohorts import code_to_month, month_code
+
+RFM_COLUMNS = ['customer_unique_id', 'last_purchase', 'frequency', 'monetary']
+
+# Доставленные заказы с суммой оплаты начиная с :since: одна строка на заказ
+RFM_ORDERS_QUERY = """
+SELECT
+    c.customer_unique_id,
+    o.order_purchase_timestamp,
+    CAST(COALESCE(SUM(op.payment_value), 0) AS DOUBLE PRECISION) AS payment_value
+FROM orders o
+JOIN customers c ON o.customer_id = c.customer_id
+LEFT JOIN order_payments op ON o.order_id = op.order_id
+WHERE o.order_status = 'доставлен'
+  AND o.order_purchase_timestamp >= :since
+GROUP BY o.order_id, c.customer_unique_id, o.order_purchase_timestamp;
+"""
+
+# Дата последнего доставленного заказа (watermark для RFMAccumulator)
+RFM_WATERMARK_QUERY = """
+SELECT MAX(order_purchase_timestamp) FROM orders WHERE order_status = 'доставлен';
+"""
+
+# Агрегаты и скоринг целиком в Postgres — клиенту уходит только результат
+RFM_PUSHDOWN_QUERY = """
+WITH order_totals AS (
+    SELECT order_id, SUM(payment_value) AS payment_value
+    FROM order_payments
+    GROUP BY order_id
+),
+rfm AS (
+    SELECT
+        c.customer_unique_id,
+        MAX(o.order_purchase_timestamp) AS last_purchase,
+        COUNT(*) AS frequency,
+        COALESCE(SUM(ot.payment_value), 0)::float AS monetary
+    FROM orders o
+    JOIN customers c ON o.customer_id = c.customer_id
+    LEFT JOIN order_totals ot ON o.order_id = ot.order_id
+    WHERE o.order_status = 'доставлен'
+    GROUP BY c.customer_unique_id
+)
+-- recency как в score_rfm: дни до дня после последней покупки
+scored AS (
+    SELECT
+        rfm.*,
+        EXTRACT(DAY FROM MAX(last_purchase) OVER () + INTERVAL '1 day' - last_purchase)::int AS recency_days
+    FROM rfm
+),
+fractions AS (
+    SELECT ARRAY(SELECT g::float8 / :bins FROM generate_series(1, :bins - 1) AS g) AS f
+),
+-- Границы квантилей с линейной интерполяцией (как np.quantile)
+edges AS (
+    SELECT
+        percentile_cont(fractions.f) WITHIN GROUP (ORDER BY recency_days) AS r_edges,
+        percentile_cont(fractions.f) WITHIN GROUP (ORDER BY frequency) AS f_edges,
+        percentile_cont(fractions.f) WITHIN GROUP (ORDER BY monetary) AS m_edges
+    FROM scored CROSS JOIN fractions
+    GROUP BY fractions.f
+)
+-- Балл = 1 + число границ строго меньше значения: равные значения получают равный балл
+SELECT
+    s.customer_unique_id,
+    s.last_purchase,
+    s.frequency,
+    s.monetary,
+    s.recency_days,
+    :bins - (SELECT COUNT(*) FROM unnest(e.r_edges) AS x WHERE x < s.recency_days) AS r_score,
+    1 + (SELECT COUNT(*) FROM unnest(e.f_edges) AS x WHERE x < s.frequency) AS f_score,
+    1 + (SELECT COUNT(*) FROM unnest(e.m_edges) AS x WHERE x < s.monetary) AS m_score
+FROM scored s CROSS JOIN edges e;
+"""
+
+# Сегменты по R и F (классическая сетка 5×5)
+SEGMENTS = [
+    ('Чемпионы',          lambda r, f: (r >= 4) & (f >= 4)),
+    ('Лояльные',          lambda r, f: (r >= 3) & (f >= 4)),
+    ('Потенциально лояльные', lambda r, f: (r >= 4) & (f >= 2)),
+    ('Новые',             lambda r, f: (r >= 4) & (f == 1)),
+    ('Требуют внимания',  lambda r, f: (r == 3) & (f <= 3)),
+    ('Под угрозой',       lambda r, f: (r <= 2) & (f >= 3)),
+    ('Спящие',            lambda r, f: (r <= 2) & (f <= 2)),
+]
+
+
+def rfm_aggregate(orders, date_col='order_purchase_timestamp', value_col='payment_value',
+                  customers=None, payments=None):
+    """
+    Считает last_purchase, frequency и monetary по customer_unique_id.
+
+    Args:
+        orders: Заказы. Если в них уже есть customer_unique_id и value_col —
+            используются как есть; иначе присоединяются customers и payments
+        date_col: Колонка с датой заказа
+        value_col: Колонка с суммой заказа
+        customers: Таблица customers (customer_id → customer_unique_id), опционально
+        payments: Таблица order_payments, опционально (суммируется по order_id)
+
+    Returns:
+        pd.DataFrame с колонками RFM_COLUMNS
+    """
+    if 'order_status' in orders.columns:
+        orders = orders[orders['order_status'] == 'доставлен']
+
+    if 'customer_unique_id' not in orders.columns:
+        if customers is None:
+            raise ValueError("В заказах нет customer_unique_id — передайте таблицу customers")
+        orders = orders.merge(customers[['customer_id', 'customer_unique_id']], on='customer_id', how='inner')
+
+    if value_col not in orders.columns:
+        if payments is None:
+            raise ValueError(f"В заказах нет {value_col} — передайте таблицу order_payments")
+        order_totals = payments.groupby('order_id', sort=False)['payment_value'].sum()
+        orders = orders.assign(**{value_col: orders['order_id'].map(order_totals).fillna(0).to_numpy()})
+
+    rfm = (
+        orders
+        .groupby('customer_unique_id', sort=False)
+        .agg(last_purchase=(date_col, 'max'),
+             frequency=(date_col, 'size'),
+             monetary=(value_col, 'sum'))
+        .reset_index()
+    )
+    return rfm[RFM_COLUMNS]
+
+
+def merge_rfm(*parts):
+    """
+    Объединяет частичные RFM-агрегаты (пачки или старое состояние + новые заказы).
+
+    Частичные агрегаты должны быть посчитаны по непересекающимся заказам.
+    """
+    parts = [p for p in parts if p is not None and not p.empty]
+    if not parts:
+        return pd.DataFrame(columns=RFM_COLUMNS)
+    if len(parts) == 1:
+        return parts[0][RFM_COLUMNS].reset_index(drop=True)
+    return (
+        pd.concat(parts, ignore_index=True)
+        .groupby('customer_unique_id', sort=False)
+        .agg(last_purchase=('last_purchase', 'max'),
+             frequency=('frequency', 'sum'),
+             monetary=('monetary', 'sum'))
+        .reset_index()
+    )
+
+
+def rfm_from_db(engine, since=None, chunksize=500_000, state=None):
+    """
+    Считает RFM по заказам из БД пачками фиксированного размера.
+
+    since/state только добавляют заказы: заказ, купленный раньше since и
+    доставленный позже, сюда не попадёт. Для регулярного дообновления —
+    RFMAccumulator.refresh.
+
+    Args:
+        engine: SQLAlchemy engine
+        since: Учитывать только заказы начиная с этой даты
+        chunksize: Размер пачки строк
+        state: Ранее посчитанный RFM по заказам до since, к которому добавляются новые
+
+    Returns:
+        pd.DataFrame с колонками RFM_COLUMNS
+    """
+    since = pd.Timestamp(since if since is not None else '1900-01-01').to_pydatetime()
+    partial = state
+    with engine.connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql(text(RFM_ORDERS_QUERY), conn, params={'since': since}, chunksize=chunksize):
+            partial = merge_rfm(partial, rfm_aggregate(chunk))
+    return partial if partial is not None else pd.DataFrame(columns=RFM_COLUMNS)
+
+
+class RFMAccumulator:
+    """
+    RFM с инкрементальным обновлением и пересчитываемым окном.
+
+    Заказ попадает в RFM, когда его доставят, — иногда позже watermark.
+    Поэтому агрегаты делятся на две части:
+    - settled — заказы, купленные до settled_until (первое число месяца
+      watermark минус lookback_months); они больше не перечитываются
+    - window — заказы начиная с settled_until; при каждом обновлении
+      перечитываются целиком, так что поздно доставленные и отменённые
+      заказы окна учитываются верно
+
+    Параметры:
+    ----------
+    lookback_months : int или None
+        Ширина пересчитываемого окна (None — каждый раз перечитывать всё)
+    date_col, value_col : str
+        Колонки заказов (как в RFM_ORDERS_QUERY)
+    """
+
+    def __init__(self, lookback_months=3, date_col='order_purchase_timestamp', value_col='payment_value'):
+        self.lookback_months = lookback_months
+        self.date_col = date_col
+        self.value_col = value_col
+        self.settled = pd.DataFrame(columns=RFM_COLUMNS)
+        self.window = pd.DataFrame(columns=RFM_COLUMNS)
+        self.settled_until = None
+
+    @property
+    def rfm(self):
+        """Текущий RFM (RFM_COLUMNS) — вход для score_rfm."""
+        return merge_rfm(self.settled, self.window)
+
+    def _cutoff(self, watermark):
+        """Новая граница settled: не раньше прежней."""
+        if watermark is None or pd.isna(watermark) or self.lookback_months is None:
+            return self.settled_until
+        cutoff = code_to_month([month_code([watermark])[0] - self.lookback_months])[0]
+        return cutoff if self.settled_until is None else max(cutoff, self.settled_until)
+
+    def _split(self, orders, cutoff):
+        """(агрегат заказов до cutoff, агрегат остальных)."""
+        dates = pd.to_datetime(orders[self.date_col])
+        old = (dates < cutoff).to_numpy() if cutoff is not None else np.zeros(len(orders), dtype=bool)
+        return (rfm_aggregate(orders[old], self.date_col, self.value_col),
+                rfm_aggregate(orders[~old], self.date_col, self.value_col))
+
+    def update(self, orders):
+        """
+        Пересчитывает окно по переданным заказам.
+
+        orders — все доставленные заказы с датой не раньше settled_until
+        (колонки customer_unique_id, date_col, value_col); более ранние отбрасываются.
+
+        Возвращает:
+        -----------
+        pd.DataFrame: текущий RFM
+        """
+        if self.settled_until is not None:
+            orders = orders[(pd.to_datetime(orders[self.date_col]) >= self.settled_until).to_numpy()]
+        watermark = pd.to_datetime(orders[self.date_col]).max() if len(orders) else None
+        cutoff = self._cutoff(watermark)
+        settled, self.window = self._split(orders, cutoff)
+        self.settled = merge_rfm(self.settled, settled)
+        self.settled_until = cutoff
+        return self.rfm
+
+    def refresh(self, engine, chunksize=500_000):
+        """Перечитывает из БД заказы начиная с settled_until пачками и пересчитывает окно."""
+        since = self.settled_until if self.settled_until is not None else pd.Timestamp('1900-01-01')
+        settled, window = None, None
+        with engine.connect() as conn:
+            cutoff = self._cutoff(pd.to_datetime(conn.execute(text(RFM_WATERMARK_QUERY)).scalar()))
+            for chunk in pd.read_sql(text(RFM_ORDERS_QUERY), conn, params={'since': since.to_pydatetime()},
+                                     chunksize=chunksize):
+                old, recent = self._split(chunk, cutoff)
+                settled, window = merge_rfm(settled, old), merge_rfm(window, recent)
+        self.settled = merge_rfm(self.settled, settled)
+        self.window = window if window is not None else pd.DataFrame(columns=RFM_COLUMNS)
+        self.settled_until = cutoff
+        return self.rfm
+
+
+def _quantile_score(values, bins):
+    """Квантильный балл 1..bins; одинаковые значения получают одинаковый балл."""
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    edges = np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1])
+    return np.searchsorted(edges, values, side='left') + 1
+
+
+def score_rfm(rfm, bins=5, snapshot_date=None):
+    """
+    Добавляет recency_days, баллы R/F/M, код RFM и сегмент.
+
+    Args:
+        rfm: Результат rfm_aggregate / merge_rfm / rfm_from_db
+        bins: Количество квантильных групп
+        snapshot_date: Дата расчёта recency (по умолчанию — день после последней покупки)
+
+    Returns:
+        pd.DataFrame с дополнительными колонками
+        'recency_days', 'r_score', 'f_score', 'm_score', 'rfm_code', 'segment'
+    """
+    rfm = rfm.copy()
+    last_purchase = pd.to_datetime(rfm['last_purchase'])
+    if snapshot_date is None:
+        snapshot_date = last_purchase.max() + pd.Timedelta(days=1)
+    rfm['recency_days'] = (pd.Timestamp(snapshot_date) - last_purchase).dt.days
+
+    # Меньше дней с последней покупки — выше балл
+    rfm['r_score'] = bins + 1 - _quantile_score(rfm['recency_days'], bins)
+    rfm['f_score'] = _quantile_score(rfm['frequency'], bins)
+    rfm['m_score'] = _quantile_score(rfm['monetary'], bins)
+    return _add_segments(rfm)
+
+
+def _add_segments(rfm):
+    """Код RFM и сегмент по готовым баллам r/f/m."""
+    rfm['rfm_code'] = rfm['r_score'] * 100 + rfm['f_score'] * 10 + rfm['m_score']
+
+    r = rfm['r_score'].to_numpy()
+    f = rfm['f_score'].to_numpy()
+    rfm['segment'] = np.select([rule(r, f) for _, rule in SEGMENTS],
+                               [name for name, _ in SEGMENTS],
+                               default='Другое')
+    return rfm
+
+
+def rfm_pushdown(engine, bins=5):
+    """
+    Считает RFM и баллы в Postgres; результат совпадает со score_rfm(rfm_aggregate(...)).
+
+    Квантили и сравнение с границами те же, что в _quantile_score, поэтому
+    одинаковые значения получают одинаковый балл (в отличие от NTILE).
+    """
+    with engine.connect() as conn:
+        result = conn.execute(text(RFM_PUSHDOWN_QUERY), {'bins': bins})
+        rfm = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    score_columns = ['r_score', 'f_score', 'm_score']
+    rfm[score_columns] = rfm[score_columns].astype(np.int64)
+    return _add_segments(rfm)
@@ -1,7 +1,11 @@
 # src/scatter_plotly.py
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.colors as pc
+import plotly.graph_objects as go
+
+from .plotly_utils import WEBGL_THRESHOLD, finish_figure, lighten_figure
 
 def scatter_quadrant_plot(
     df: pd.DataFrame,
@@ -18,9 +22,21 @@ def scatter_quadrant_plot(
     title: str = '',
     labels: dict = None,
     show_labels: bool = False,
-    show_legend: bool = True
+    show_legend: bool = True,
+    webgl_threshold: int = WEBGL_THRESHOLD,
+    max_html_bytes: int = None,
+    aggregate: str = None,
+    show: bool = False,
+    as_json: bool = False
 ):
-    df = df.copy()
+    if aggregate:
+        # Одна точка на категорию: миллионы строк сворачиваются до числа категорий
+        agg_map = {x_col: aggregate, y_col: aggregate}
+        if size_col:
+            agg_map[size_col] = 'sum'
+        df = df.groupby(category_col, observed=True, sort=False).agg(agg_map).reset_index()
+    else:
+        df = df.copy()
 
     x_mean = x_mean if x_mean is not None else df[x_col].mean()
     y_mean = y_mean if y_mean is not None else df[y_col].mean()
@@ -31,15 +47,15 @@ def scatter_quadrant_plot(
     else:
         top_categories = df[category_col].tolist()
 
-    # Назначаем цветовую группу
+    # Назначаем цветовую группу (векторные маски вместо apply по строкам)
+    x_values = df[x_col].to_numpy()
+    y_values = df[y_col].to_numpy()
     if condition == '>':
-        df['color_group'] = df.apply(lambda row: row[category_col]
-                                     if row[y_col] > y_mean and row[x_col] > x_mean
-                                     else 'Другое', axis=1)
+        mask = (y_values > y_mean) & (x_values > x_mean)
+        df['color_group'] = np.where(mask, df[category_col].to_numpy(dtype=object), 'Другое')
     elif condition == '<':
-        df['color_group'] = df.apply(lambda row: row[category_col]
-                                     if row[y_col] < y_mean and row[x_col] < x_mean
-                                     else 'Другое', axis=1)
+        mask = (y_values < y_mean) & (x_values < x_mean)
+        df['color_group'] = np.where(mask, df[category_col].to_numpy(dtype=object), 'Другое')
     else:
         df['color_group'] = df[category_col]
 
@@ -85,6 +101,7 @@ def scatter_quadrant_plot(
         labels=labels,
         title=title,
         color_discrete_map=color_discrete_map,
+        render_mode='svg',  # переход на WebGL по порогу делает lighten_figure
         height=700
     )
 
@@ -106,26 +123,31 @@ def scatter_quadrant_plot(
         annotation_position="bottom right"
     )
 
-    # Подписи на точках
+    # Подписи на точках: одна текстовая трасса вместо add_annotation на каждую точку
     if show_labels:
-        for _, row in df[df['color_group'] != 'Другое'].iterrows():
-            fig.add_annotation(
-                x=row[x_col],
-                y=row[y_col],
-                text=row[category_col],
-                showarrow=False,
-                font=dict(
-                    family="Segoe UI, sans-serif",
-                    size=14,
-                    color="black"
-                ),
-                xanchor='center',
-                yanchor='bottom',
-                yshift=9
-            )
+        labeled = df[df['color_group'] != 'Другое']
+        label_trace = go.Scattergl if len(labeled) > webgl_threshold else go.Scatter
+        fig.add_trace(label_trace(
+            x=labeled[x_col],
+            y=labeled[y_col],
+            text=labeled[category_col],
+            mode='text',
+            textposition='top center',
+            textfont=dict(
+                family="Segoe UI, sans-serif",
+                size=14,
+                color="black"
+            ),
+            hoverinfo='skip',
+            showlegend=False
+        ))
 
     fig.update_layout(showlegend=show_legend)
-    fig.update_traces(marker=dict(line=dict(width=1, color='DarkSlateGrey')))
+    fig.update_traces(marker=dict(line=dict(width=1, color='DarkSlateGrey')), selector=dict(mode='markers'))
     fig.update_layout(height=600, legend_title_text='')
 
-    return fig
+    # WebGL, облегчённый hover и ограничение размера HTML для больших выборок;
+    # точки разбиты на трассы по категориям, поэтому порог сравнивается с размером всей выборки
+    fig = lighten_figure(fig, webgl_threshold=webgl_threshold if len(df) <= webgl_threshold else 0,
+                         max_html_bytes=max_html_bytes)
+    return finish_figure(fig, show=show, as_json=as_json)
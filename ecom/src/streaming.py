@@ -0,0 +1,195 @@
+# src.streaming.py
+"""
+Потоковое чтение больших результатов через серверные курсоры.
+
+stream_query / stream_table отдают результат пачками по itersize строк
+(именованный курсор psycopg2), а агрегаторы ниже сворачивают поток
+в сводки постоянного размера, пригодные для EDA-функций пакета.
+
+Колонки NUMERIC приходят из psycopg2 как decimal.Decimal (тип object) и
+приводятся к float64 в каждой пачке, иначе числовые сводки их не видят.
+"""
+
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+
+def _decimals_to_float(frame):
+    """Колонки object со значениями Decimal → float64 (на месте)."""
+    for col in frame.columns[frame.dtypes == object]:
+        first = frame[col].first_valid_index()
+        if first is not None and isinstance(frame.at[first, col], Decimal):
+            frame[col] = frame[col].astype(np.float64)
+    return frame
+
+
+def stream_query(engine, query_str, params=None, itersize=50_000, as_arrow=False):
+    """
+    Выполняет запрос на серверном курсоре и выдаёт результат пачками.
+
+    Параметры:
+    - engine: SQLAlchemy engine
+    - query_str: SQL-запрос (с :placeholder если нужны параметры)
+    - params: dict с параметрами
+    - itersize: число строк, забираемых с сервера за раз
+    - as_arrow: выдавать pyarrow.RecordBatch вместо DataFrame
+
+    Возвращает:
+    - генератор DataFrame (или RecordBatch) по itersize строк
+    """
+    if as_arrow:
+        import pyarrow as pa
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=itersize).execute(
+            text(query_str), params or {}
+        )
+        columns = list(result.keys())
+        for rows in result.partitions(itersize):
+            data = dict(zip(columns, zip(*rows)))
+            if as_arrow:
+                yield pa.RecordBatch.from_pydict({col: list(values) for col, values in data.items()})
+            else:
+                yield _decimals_to_float(pd.DataFrame(data, columns=columns))
+
+
+def quote_identifier(engine, name):
+    """Имя таблицы/колонки в кавычках диалекта engine (кавычки внутри имени экранируются)."""
+    return engine.dialect.identifier_preparer.quote(name)
+
+
+def stream_table(engine, table_name, columns=None, itersize=50_000, as_arrow=False):
+    """Читает таблицу целиком пачками (опционально только нужные колонки)."""
+    cols = ', '.join(quote_identifier(engine, col) for col in columns) if columns else '*'
+    query = f'SELECT {cols} FROM {quote_identifier(engine, table_name)}'
+    return stream_query(engine, query, itersize=itersize, as_arrow=as_arrow)
+
+
+def _moments(batch):
+    """Частичные моменты числовых колонок одной пачки."""
+    num = batch.select_dtypes(include='number').astype(float)
+    count = num.count()
+    return pd.DataFrame({
+        'count': count,
+        'mean': num.mean(),
+        'm2': num.var(ddof=0) * count,
+        'min': num.min(),
+        'max': num.max(),
+    }).fillna({'mean': 0.0, 'm2': 0.0})
+
+
+def _merge_moments(state, part):
+    """Объединяет моменты двух пачек (формула Чана)."""
+    if state is None:
+        return part
+    state, part = state.align(part, join='outer', axis=0)
+    state = state.fillna({'count': 0, 'mean': 0.0, 'm2': 0.0})
+    part = part.fillna({'count': 0, 'mean': 0.0, 'm2': 0.0})
+    n = state['count'] + part['count']
+    safe_n = n.where(n > 0, 1)
+    delta = part['mean'] - state['mean']
+    return pd.DataFrame({
+        'count': n,
+        'mean': state['mean'] + delta * part['count'] / safe_n,
+        'm2': state['m2'] + part['m2'] + delta**2 * state['count'] * part['count'] / safe_n,
+        'min': np.fmin(state['min'], part['min']),
+        'max': np.fmax(state['max'], part['max']),
+    })
+
+
+def _finalize_moments(state):
+    if state is None:
+        return pd.DataFrame(columns=['count', 'mean', 'std', 'min', 'max'])
+    state = state.copy()
+    state['std'] = np.sqrt(state['m2'] / (state['count'] - 1).where(state['count'] > 1))
+    return state[['count', 'mean', 'std', 'min', 'max']]
+
+
+def _reservoir_step(sample, keys, batch, rng, max_sample):
+    """Добавляет пачку в приоритетную выборку и оставляет max_sample строк с наибольшими ключами."""
+    pool = batch if sample is None else pd.concat([sample, batch], ignore_index=True)
+    pool_keys = np.concatenate([keys, rng.random(len(batch))])
+    if len(pool) > max_sample:
+        top = np.argpartition(pool_keys, -max_sample)[-max_sample:]
+        pool, pool_keys = pool.iloc[top], pool_keys[top]
+    return pool.reset_index(drop=True), pool_keys
+
+
+def missing_summary(batches):
+    """
+    Доля пропусков (%) по колонкам для потока пачек.
+
+    Возвращает:
+    - pd.Series: процент пропусков по колонкам (как na_percent в load_and_inspect)
+    """
+    nulls, rows = None, 0
+    for batch in batches:
+        counts = batch.isna().sum()
+        nulls = counts if nulls is None else nulls.add(counts, fill_value=0)
+        rows += len(batch)
+    if nulls is None or rows == 0:
+        return pd.Series(dtype=float)
+    return nulls / rows * 100
+
+
+def numeric_summary(batches):
+    """
+    Количество, среднее, стандартное отклонение, минимум и максимум числовых колонок.
+
+    Моменты объединяются между пачками по формуле Чана, поэтому память
+    не зависит от размера таблицы.
+    """
+    state = None
+    for batch in batches:
+        state = _merge_moments(state, _moments(batch))
+    return _finalize_moments(state)
+
+
+def reservoir_sample(batches, max_sample=5000, random_state=42):
+    """
+    Равномерная выборка строк из потока без загрузки его в память.
+
+    Каждой строке присваивается случайный ключ, из потока сохраняются
+    max_sample строк с наибольшими ключами (приоритетная выборка).
+
+    Возвращает:
+    - pd.DataFrame: не более max_sample строк
+    """
+    rng = np.random.default_rng(random_state)
+    sample, keys = None, np.empty(0)
+    for batch in batches:
+        sample, keys = _reservoir_step(sample, keys, batch, rng, max_sample)
+    return sample if sample is not None else pd.DataFrame()
+
+
+def profile_table(engine, table_name, itersize=50_000, max_sample=5000, random_state=42):
+    """
+    Один проход по таблице: пропуски, числовые сводки и выборка для EDA.
+
+    Выборку можно передать в analyze_numeric_features / analyze_missing
+    как обычный DataFrame: {table_name: sample}.
+
+    Возвращает:
+    - dict с ключами 'rows', 'missing', 'numeric', 'sample'
+    """
+    rng = np.random.default_rng(random_state)
+    nulls, rows = None, 0
+    moments = None
+    sample, keys = None, np.empty(0)
+
+    for batch in stream_table(engine, table_name, itersize=itersize):
+        counts = batch.isna().sum()
+        nulls = counts if nulls is None else nulls.add(counts, fill_value=0)
+        rows += len(batch)
+        moments = _merge_moments(moments, _moments(batch))
+        sample, keys = _reservoir_step(sample, keys, batch, rng, max_sample)
+
+    return {
+        'rows': rows,
+        'missing': nulls / rows * 100 if rows else pd.Series(dtype=float),
+        'numeric': _finalize_moments(moments),
+        'sample': sample if sample is not None else pd.DataFrame(),
+    }
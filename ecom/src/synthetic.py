@@ -0,0 +1,377 @@
+# src.synthetic.py
+"""
+Синтетический датасет в масштабе Olist для бенчмарков.
+
+Размеры таблиц, доли пропусков, распределения статусов, оценок и связи
+между таблицами повторяют исходный датасет (после перевода в ноутбуке
+предобработки), а scale масштабирует число строк: 1 — размер Olist,
+10 и 100 — для нагрузочных замеров. Справочники (категории, сегменты,
+источники лидов, статусы) берутся из translation.json.
+
+    tables = generate_olist(scale=10, random_state=42)
+    write_tables(tables, 'bench_data')      # CSV для load_and_inspect
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Размеры таблиц при scale=1 (order_items, order_payments и order_reviews выводятся из заказов)
+BASE_SIZES = {
+    'customers': 99_441,  # = orders: в Olist у каждого заказа свой customer_id
+    'sellers': 3_095,
+    'products': 32_951,
+    'marketing_qualified': 8_000,
+    'closed_deals': 842,
+}
+
+# Внешние ключи между сгенерированными таблицами (формат validate_foreign_keys)
+OLIST_FOREIGN_KEYS = {
+    'orders': {'customer_id': 'customers(customer_id)'},
+    'order_items': {
+        'order_id': 'orders(order_id)',
+        'product_id': 'products(product_id)',
+        'seller_id': 'sellers(seller_id)',
+    },
+    'order_payments': {'order_id': 'orders(order_id)'},
+    'order_reviews': {'order_id': 'orders(order_id)'},
+    'closed_deals': {
+        'mql_id': 'marketing_qualified(mql_id)',
+        'seller_id': 'sellers(seller_id)',
+    },
+}
+
+ORDER_STATUSES = {
+    'delivered': 0.9702, 'shipped': 0.0111, 'canceled': 0.0063, 'unavailable': 0.0061,
+    'invoiced': 0.0032, 'processing': 0.0030, 'created': 0.0001, 'approved': 0.0001,
+}
+REVIEW_SCORES = {5: 0.578, 4: 0.193, 3: 0.082, 2: 0.032, 1: 0.115}
+PAYMENT_TYPES = {'credit_card': 0.739, 'boleto': 0.190, 'voucher': 0.056, 'debit_card': 0.015}
+STATES = {
+    'SP': 0.420, 'RJ': 0.129, 'MG': 0.117, 'RS': 0.055, 'PR': 0.051, 'SC': 0.037, 'BA': 0.034,
+    'DF': 0.022, 'ES': 0.020, 'GO': 0.020, 'PE': 0.017, 'CE': 0.013, 'PA': 0.010, 'MT': 0.009,
+    'MA': 0.008, 'MS': 0.007, 'PB': 0.005, 'PI': 0.005, 'RN': 0.005, 'AL': 0.004, 'SE': 0.004,
+    'TO': 0.003, 'RO': 0.003, 'AM': 0.001, 'AC': 0.001, 'AP': 0.001, 'RR': 0.001,
+}
+
+ORDERS_START = pd.Timestamp('2016-09-04')
+ORDERS_END = pd.Timestamp('2018-10-17')
+MQL_START = pd.Timestamp('2017-06-01')
+MQL_END = pd.Timestamp('2018-05-31')
+
+# Доли пропусков в closed_deals (как в исходной выгрузке)
+DEAL_NULL_RATES = {
+    'business_segment': 0.001, 'lead_type': 0.007, 'lead_behaviour_profile': 0.21,
+    'has_company': 0.925, 'has_gtin': 0.924, 'average_stock': 0.922,
+    'business_type': 0.012, 'declared_product_catalog_size': 0.918,
+}
+
+_HEX = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+
+
+def _vocabularies():
+    """Справочники из translation.json (ключ — исходное значение, значение — перевод)."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'translation.json')
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _hex_ids(rng, n):
+    """n случайных 32-символьных hex-идентификаторов (как md5 в Olist) без цикла по строкам."""
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    chars = np.empty((n, 32), dtype=np.uint8)
+    chars[:, 0::2] = _HEX[raw >> 4]
+    chars[:, 1::2] = _HEX[raw & 15]
+    return chars.view('S32').ravel().astype(str)
+
+
+def choice(rng, weights, n):
+    """n значений из словаря {значение: вес} (генератор rng, например np.random.default_rng)."""
+    values = np.array(list(weights), dtype=object)
+    p = np.fromiter(weights.values(), dtype=np.float64)
+    return values[rng.choice(len(values), size=n, p=p / p.sum())]
+
+
+def _zipf_weights(n, exponent):
+    """Веса популярности рангов 1..n: несколько крупных продавцов/товаров и длинный хвост."""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def _with_nulls(rng, values, rate):
+    """Заменяет долю rate значений на пропуски."""
+    values = pd.Series(values)
+    return values.mask(rng.random(len(values)) < rate)
+
+
+def _growing_timestamps(rng, n, start, end):
+    """Моменты в [start, end) с линейно растущей плотностью (рост маркетплейса)."""
+    span_s = (end - start).total_seconds()
+    offsets = np.sqrt(rng.random(n)) * span_s
+    return pd.Series(start + pd.to_timedelta(np.sort(offsets), unit='s').round('s'))
+
+
+def _hours(rng, n, median_hours, sigma=0.8):
+    return pd.Series(pd.to_timedelta(rng.lognormal(np.log(median_hours), sigma, n), unit='h').round('s'))
+
+
+def _locations(rng, n):
+    state = choice(rng, STATES, n)
+    city_no = rng.zipf(1.6, n) % 500
+    return pd.DataFrame({
+        'zip_code_prefix': rng.integers(1_000, 99_990, n),
+        'city': [f'{s.lower()}_city_{c}' for s, c in zip(state, city_no)],
+        'state': state,
+    })
+
+
+def generate_olist(scale=1, random_state=42):
+    """
+    Генерирует связанные таблицы Olist.
+
+    Параметры:
+    ----------
+    scale : float
+        Множитель размеров BASE_SIZES (1 — размер Olist, 10, 100 — нагрузочные)
+    random_state : int
+        Seed: одинаковые параметры дают одинаковые таблицы
+
+    Возвращает:
+    -----------
+    dict: {имя таблицы: pd.DataFrame} — customers, sellers, products, orders,
+    order_items, order_payments, order_reviews, marketing_qualified, closed_deals
+    """
+    rng = np.random.default_rng(random_state)
+    vocab = _vocabularies()
+    sizes = {name: max(int(round(size * scale)), 1) for name, size in BASE_SIZES.items()}
+
+    # ------------------------------------------------------------------
+    # customers: 96.6% customer_unique_id уникальны, остальные — повторные покупатели
+    # ------------------------------------------------------------------
+    n_customers = sizes['customers']
+    n_unique = max(int(n_customers * 0.966), 1)
+    unique_ids = _hex_ids(rng, n_unique)
+    owner = np.concatenate([np.arange(n_unique), rng.integers(0, n_unique, n_customers - n_unique)])
+    rng.shuffle(owner)
+    location = _locations(rng, n_unique).iloc[owner].reset_index(drop=True)
+    customers = pd.DataFrame({
+        'customer_id': _hex_ids(rng, n_customers),
+        'customer_unique_id': unique_ids[owner],
+        'customer_zip_code_prefix': location['zip_code_prefix'].to_numpy(),
+        'customer_city': location['city'].to_numpy(),
+        'customer_state': location['state'].to_numpy(),
+    })
+
+    # ------------------------------------------------------------------
+    # sellers и products: у товара один продавец, популярность — по Ципфу
+    # ------------------------------------------------------------------
+    n_sellers = sizes['sellers']
+    location = _locations(rng, n_sellers)
+    sellers = pd.DataFrame({
+        'seller_id': _hex_ids(rng, n_sellers),
+        'seller_zip_code_prefix': location['zip_code_prefix'].to_numpy(),
+        'seller_city': location['city'].to_numpy(),
+        'seller_state': location['state'].to_numpy(),
+    })
+
+    n_products = sizes['products']
+    categories = np.array(list(vocab['category_translation_dict']), dtype=object)
+    category = categories[rng.choice(len(categories), n_products, p=_zipf_weights(len(categories), 1.1))]
+    no_category = rng.random(n_products) < 0.0185
+    category[no_category] = None
+    product_seller = rng.choice(n_sellers, n_products, p=_zipf_weights(n_sellers, 0.9))
+    products = pd.DataFrame({
+        'product_id': _hex_ids(rng, n_products),
+        'product_category_name': category,
+        'category_name_translated': pd.Series(category).map(vocab['category_translation_dict']).to_numpy(),
+        'category_name_grouped': pd.Series(category).map(vocab['category_group_dict']).to_numpy(),
+        'product_name_lenght': rng.integers(5, 76, n_products).astype(float),
+        'product_description_lenght': np.round(rng.lognormal(6.4, 0.7, n_products)),
+        'product_photos_qty': np.minimum(rng.geometric(0.5, n_products), 20).astype(float),
+        'product_weight_g': np.round(rng.lognormal(6.6, 1.2, n_products)),
+        'product_length_cm': rng.integers(7, 106, n_products).astype(float),
+        'product_height_cm': rng.integers(2, 106, n_products).astype(float),
+        'product_width_cm': rng.integers(6, 119, n_products).astype(float),
+    })
+    # В Olist у товаров без категории нет и описательных полей
+    products.loc[no_category, ['product_name_lenght', 'product_description_lenght', 'product_photos_qty']] = np.nan
+    product_price = np.round(rng.lognormal(4.4, 0.9, n_products), 2)
+
+    # ------------------------------------------------------------------
+    # orders: один customer_id — один заказ, даты этапов по статусу
+    # ------------------------------------------------------------------
+    n_orders = n_customers
+    purchase = _growing_timestamps(rng, n_orders, ORDERS_START, ORDERS_END)
+    status_key = choice(rng, ORDER_STATUSES, n_orders)
+    approved = purchase + _hours(rng, n_orders, 10)
+    carrier = approved + _hours(rng, n_orders, 60)
+    delivered = carrier + _hours(rng, n_orders, 190, sigma=0.6)
+    estimated = (purchase + pd.to_timedelta(rng.integers(10, 45, n_orders), unit='D')).dt.normalize()
+
+    is_delivered = status_key == 'delivered'
+    approved = approved.where(~np.isin(status_key, ['created']) & (rng.random(n_orders) > 0.0013))
+    carrier = carrier.where(np.isin(status_key, ['delivered', 'shipped']) & (rng.random(n_orders) > 0.0002))
+    delivered = delivered.where(is_delivered & (rng.random(n_orders) > 0.0001))
+
+    orders = pd.DataFrame({
+        'order_id': _hex_ids(rng, n_orders),
+        'customer_id': customers['customer_id'].to_numpy()[rng.permutation(n_customers)],
+        'order_status': pd.Series(status_key).map(vocab['order_status_translation']).to_numpy(),
+        'order_purchase_timestamp': purchase,
+        'order_approved_at': approved,
+        'order_delivered_carrier_date': carrier,
+        'order_delivered_customer_date': delivered,
+        'order_estimated_delivery_date': estimated,
+    })
+
+    # ------------------------------------------------------------------
+    # order_items: 1 позиция в ~89% заказов; недоступные заказы без позиций
+    # ------------------------------------------------------------------
+    items_per_order = np.minimum(rng.geometric(0.885, n_orders), 21)
+    items_per_order[status_key == 'unavailable'] = 0
+    item_order = np.repeat(np.arange(n_orders), items_per_order)
+    n_items = len(item_order)
+    item_product = rng.choice(n_products, n_items, p=_zipf_weights(n_products, 0.7))
+    starts = np.cumsum(items_per_order) - items_per_order
+    item_price = product_price[item_product]
+    freight = np.round(np.maximum(rng.normal(0.15, 0.08, n_items) * item_price + rng.lognormal(2.6, 0.4, n_items), 0), 2)
+    order_items = pd.DataFrame({
+        'order_id': orders['order_id'].to_numpy()[item_order],
+        'order_item_id': np.arange(n_items) - np.repeat(starts, items_per_order) + 1,
+        'product_id': products['product_id'].to_numpy()[item_product],
+        'seller_id': sellers['seller_id'].to_numpy()[product_seller[item_product]],
+        'shipping_limit_date': purchase.to_numpy()[item_order] + np.timedelta64(6, 'D'),
+        'price': item_price,
+        'freight_value': freight,
+    })
+
+    # ------------------------------------------------------------------
+    # order_payments: сумма платежей = товары + доставка; ~3% заказов платят частями
+    # ------------------------------------------------------------------
+    order_total = np.bincount(item_order, weights=item_price + freight, minlength=n_orders)
+    order_total = np.where(order_total > 0, order_total, np.round(rng.lognormal(4.8, 0.8, n_orders), 2))
+    n_payments = np.where(rng.random(n_orders) < 0.03, rng.integers(2, 4, n_orders), 1)
+    pay_order = np.repeat(np.arange(n_orders), n_payments)
+    shares = rng.dirichlet(np.ones(3), n_orders)
+    share = np.where(n_payments[pay_order] == 1, 1.0,
+                     shares[pay_order, np.arange(len(pay_order)) - np.repeat(np.cumsum(n_payments) - n_payments, n_payments)])
+    share = share / np.bincount(pay_order, weights=share)[pay_order]
+    payment_type = choice(rng, PAYMENT_TYPES, len(pay_order))
+    order_payments = pd.DataFrame({
+        'order_id': orders['order_id'].to_numpy()[pay_order],
+        'payment_sequential': np.arange(len(pay_order)) - np.repeat(np.cumsum(n_payments) - n_payments, n_payments) + 1,
+        'payment_type': pd.Series(payment_type).map(vocab['payment_method_translation']).to_numpy(),
+        'payment_installments': np.where(payment_type == 'credit_card', rng.integers(1, 11, len(pay_order)), 1),
+        'payment_value': np.round(order_total[pay_order] * share, 2),
+    })
+
+    # ------------------------------------------------------------------
+    # order_reviews: отзыв есть у ~99% заказов, оценки смещены к 5,
+    # у опоздавших заказов оценки ниже
+    # ------------------------------------------------------------------
+    has_review = rng.random(n_orders) < 0.992
+    review_order = np.flatnonzero(has_review)
+    score = choice(rng, REVIEW_SCORES, len(review_order)).astype(np.int64)
+    late = (delivered > estimated + pd.Timedelta(days=1)).to_numpy()[review_order]
+    score = np.where(late & (rng.random(len(review_order)) < 0.6), rng.integers(1, 3, len(review_order)), score)
+    review_date = (delivered.fillna(estimated).iloc[review_order] + pd.Timedelta(days=1)).dt.normalize()
+    order_reviews = pd.DataFrame({
+        'review_id': _hex_ids(rng, len(review_order)),
+        'order_id': orders['order_id'].to_numpy()[review_order],
+        'review_score': score,
+        'review_creation_date': review_date.to_numpy(),
+        'review_answer_timestamp': review_date.to_numpy() + _hours(rng, len(review_order), 40).to_numpy(),
+    })
+
+    # ------------------------------------------------------------------
+    # marketing_qualified и closed_deals: ~10.5% лидов закрываются
+    # ------------------------------------------------------------------
+    n_mql = sizes['marketing_qualified']
+    n_pages = max(int(495 * min(scale, 1) ** 0.5), 1)
+    origin = pd.Series(choice(rng, {k: 1.0 / (i + 1) for i, k in enumerate(vocab['origin_translation'])}, n_mql))
+    marketing_qualified = pd.DataFrame({
+        'mql_id': _hex_ids(rng, n_mql),
+        'first_contact_date': _growing_timestamps(rng, n_mql, MQL_START, MQL_END).dt.normalize().to_numpy(),
+        'landing_page_id': _hex_ids(rng, n_pages)[rng.choice(n_pages, n_mql, p=_zipf_weights(n_pages, 1.2))],
+        'origin': _with_nulls(rng, origin.map(vocab['origin_translation']), 0.008).to_numpy(),
+    })
+
+    n_deals = min(sizes['closed_deals'], n_mql)
+    deal_mql = rng.choice(n_mql, n_deals, replace=False)
+    lag = pd.to_timedelta(np.round(rng.lognormal(3.4, 1.1, n_deals) * 24 * 3600), unit='s')
+    # Около половины закрытых продавцов ещё не продавали — их нет в sellers (как в Olist)
+    known = rng.random(n_deals) < 0.45
+    deal_seller = _hex_ids(rng, n_deals)
+    deal_seller[known] = sellers['seller_id'].to_numpy()[rng.choice(n_sellers, int(known.sum()))]
+
+    def vocab_column(name, key):
+        values = list(vocab[key].values())
+        return _with_nulls(rng, np.array(values, dtype=object)[rng.choice(len(values), n_deals,
+                                                                         p=_zipf_weights(len(values), 1.0))],
+                           DEAL_NULL_RATES[name]).to_numpy()
+
+    closed_deals = pd.DataFrame({
+        'mql_id': marketing_qualified['mql_id'].to_numpy()[deal_mql],
+        'seller_id': deal_seller,
+        'sdr_id': _hex_ids(rng, 32)[rng.integers(0, 32, n_deals)],
+        'sr_id': _hex_ids(rng, 22)[rng.integers(0, 22, n_deals)],
+        'won_date': marketing_qualified['first_contact_date'].to_numpy()[deal_mql] + lag.to_numpy(),
+        'business_segment': vocab_column('business_segment', 'business_segment_translation'),
+        'lead_type': vocab_column('lead_type', 'lead_type_translation'),
+        'lead_behaviour_profile': _with_nulls(rng, choice(rng, {'cat': 0.6, 'eagle': 0.15, 'wolf': 0.12,
+                                                                 'shark': 0.03, 'cat, wolf': 0.1}, n_deals),
+                                              DEAL_NULL_RATES['lead_behaviour_profile']).to_numpy(),
+        'has_company': _with_nulls(rng, rng.random(n_deals) < 0.9, DEAL_NULL_RATES['has_company']).to_numpy(),
+        'has_gtin': _with_nulls(rng, rng.random(n_deals) < 0.9, DEAL_NULL_RATES['has_gtin']).to_numpy(),
+        'average_stock': _with_nulls(rng, choice(rng, {'5-20': 3, '20-50': 2, '50-200': 2, '1-5': 1,
+                                                        '200+': 1, 'unknown': 1}, n_deals),
+                                     DEAL_NULL_RATES['average_stock']).to_numpy(),
+        'business_type': vocab_column('business_type', 'business_type_translation'),
+        'declared_product_catalog_size': _with_nulls(rng, np.round(rng.lognormal(4, 1.2, n_deals)),
+                                                     DEAL_NULL_RATES['declared_product_catalog_size']).to_numpy(),
+        'declared_monthly_revenue': np.where(rng.random(n_deals) < 0.95, 0.0,
+                                             np.round(rng.lognormal(11, 1.5, n_deals), -3)),
+    })
+
+    return {
+        'customers': customers,
+        'sellers': sellers,
+        'products': products,
+        'orders': orders,
+        'order_items': order_items,
+        'order_payments': order_payments,
+        'order_reviews': order_reviews,
+        'marketing_qualified': marketing_qualified,
+        'closed_deals': closed_deals,
+    }
+
+
+def write_tables(tables, folder, fmt='csv'):
+    """
+    Сохраняет таблицы в folder (по файлу на таблицу).
+
+    Параметры:
+    ----------
+    tables : dict
+        Результат generate_olist
+    fmt : str
+        'csv' (формат load_and_inspect) или 'parquet'
+
+    Возвращает:
+    -----------
+    dict: {имя таблицы: путь к файлу}
+    """
+    if fmt not in ('csv', 'parquet'):
+        raise ValueError(f"Неизвестный формат: {fmt}")
+    os.makedirs(folder, exist_ok=True)
+    paths = {}
+    for name, df in tables.items():
+        path = os.path.join(folder, f'{name}.{fmt}')
+        if fmt == 'csv':
+            df.to_csv(path, index=False)
+        else:
+            df.to_parquet(path, index=False)
+        paths[name] = path
+    return paths
@@ -2,15 +2,9 @@
 
 import pandas as pd
 import numpy as np
-import missingno as msno
 from tabulate import tabulate
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy.stats import chi2_contingency, f_oneway
-from sklearn.experimental import enable_iterative_imputer
-from sklearn.impute import IterativeImputer
-from sklearn.linear_model import LinearRegression
-import logging
+
+from .column_catalog import column_catalog
 
 def time_series_eda(df_dict, time_freq='W', figsize=(12, 4), palette='Set2', save_plots=False):
     """
@@ -19,9 +13,13 @@ def time_series_eda(df_dict, time_freq='W', figsize=(12, 4), palette='Set2', sav
     - 📉 Падение: красный
     - ➡️ Стабильность: синий
     """
+    # sklearn и графические библиотеки импортируются при первом вызове
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from sklearn.linear_model import LinearRegression
 
     def analyze_table(name, df):
-        datetime_cols = df.select_dtypes(include=['datetime']).columns
+        datetime_cols = column_catalog(df).columns('date')
         if len(datetime_cols) == 0:
             return  # Пропускаем таблицы без временных меток
 
@@ -0,0 +1,28 @@
+# tests/conftest.py
+"""Общие данные для тестов: пакет src импортируется из каталога ecom."""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(42)
+
+
+@pytest.fixture
+def orders(rng):
+    """Заказы 300 клиентов за 14 месяцев с уникальными временами оформления."""
+    n = 2_000
+    seconds = rng.choice(420 * 24 * 3600, size=n, replace=False)
+    return pd.DataFrame({
+        'customer_unique_id': rng.integers(0, 300, n),
+        'order_purchase_timestamp': pd.Timestamp('2017-01-01') + pd.to_timedelta(np.sort(seconds), unit='s'),
+        'payment_value': rng.gamma(2.0, 60.0, n).round(2),
+    })
@@ -0,0 +1,154 @@
+# tests/test_cohorts.py
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+from src.cohorts import CohortMatrix, month_code
+
+
+def brute_force(orders):
+    """Активные клиенты и выручка по (когорта, месяц жизни) прямым перебором."""
+    month = month_code(orders['order_purchase_timestamp'])
+    frame = orders.assign(month=month)
+    frame['cohort'] = frame.groupby('customer_unique_id')['month'].transform('min')
+    frame['lifetime'] = frame['month'] - frame['cohort']
+    active = frame.groupby(['cohort', 'lifetime'])['customer_unique_id'].nunique()
+    revenue = frame.groupby(['cohort', 'lifetime'])['payment_value'].sum()
+    return active, revenue, int(month.max())
+
+
+def assert_matches(matrix, orders):
+    active, revenue, last_month = brute_force(orders)
+    assert matrix.last_month == last_month
+    for (cohort, lifetime), users in active.items():
+        row = cohort - matrix.base
+        assert matrix.active[row, lifetime] == users
+        assert np.isclose(matrix.revenue[row, lifetime], revenue[(cohort, lifetime)])
+    assert matrix.active.sum() == active.sum()
+
+    retention = matrix.retention(percent=False)
+    for (cohort, lifetime), users in active.items():
+        size = active[(cohort, 0)]
+        assert np.isclose(retention[cohort - matrix.base, lifetime], users / size)
+
+
+def test_matrix_matches_brute_force(orders):
+    matrix = CohortMatrix()
+    assert matrix.update(orders) == len(orders)
+    assert_matches(matrix, orders)
+
+
+def test_incremental_updates_match_single_pass(orders):
+    matrix = CohortMatrix()
+    bounds = np.linspace(0, len(orders), 8).astype(int)
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        matrix.update(orders.iloc[start:end])
+    assert_matches(matrix, orders)
+
+    # Повторная передача уже учтённых заказов ничего не меняет
+    active = matrix.active.copy()
+    assert matrix.update(orders) == 0
+    np.testing.assert_array_equal(matrix.active, active)
+
+
+def test_unobservable_cells_are_nan(orders):
+    matrix = CohortMatrix()
+    matrix.update(orders)
+    retention = matrix.retention()
+    cohorts = matrix.base + np.arange(retention.shape[0])
+    future = matrix.lifetimes[None, :] > (matrix.last_month - cohorts)[:, None]
+    assert future.any()
+    assert np.isnan(retention[future]).all()
+    assert not np.isnan(retention[~future & (matrix.sizes[:, None] > 0)]).any()
+
+
+def test_empty_matrix_views():
+    matrix = CohortMatrix()
+    assert matrix.retention().shape == (0, 0)
+    assert matrix.ltv().shape == (0, 0)
+    assert matrix.view('active_users').shape == (0, 0)
+    assert matrix.to_frame().empty
+
+
+def test_save_load_keeps_integer_ids(orders, tmp_path):
+    head, tail = orders.iloc[:1_500], orders.iloc[1_500:]
+    matrix = CohortMatrix()
+    matrix.update(head)
+    path = tmp_path / 'cohorts.npz'
+    matrix.save(path)
+
+    loaded = CohortMatrix.load(path)
+    assert loaded._cohort.index.dtype == orders['customer_unique_id'].dtype
+    loaded.update(tail)
+    assert_matches(loaded, orders)
+
+
+def test_save_load_string_ids(orders, tmp_path):
+    orders = orders.assign(customer_unique_id=orders['customer_unique_id'].map('c{}'.format))
+    matrix = CohortMatrix()
+    matrix.update(orders.iloc[:1_000])
+    matrix.save(tmp_path / 'cohorts.npz')
+
+    loaded = CohortMatrix.load(tmp_path / 'cohorts.npz')
+    loaded.update(orders.iloc[1_000:])
+    assert_matches(loaded, orders)
+    pd.testing.assert_frame_equal(loaded.to_frame(), _full(orders).to_frame())
+
+
+def _full(orders):
+    matrix = CohortMatrix()
+    matrix.update(orders)
+    return matrix
+
+
+def olist_tables(orders, rng):
+    """orders / customers / order_payments для SQL-пути; у последних заказов статус 'в пути'."""
+    n = len(orders)
+    tables = {
+        'orders': pd.DataFrame({
+            'order_id': np.arange(n),
+            'customer_id': orders['customer_unique_id'].to_numpy() + 1_000,
+            'order_purchase_timestamp': orders['order_purchase_timestamp'].to_numpy(),
+            'order_status': np.where(np.arange(n) < n - 150, 'доставлен', 'в пути'),
+        }),
+        'customers': pd.DataFrame({
+            'customer_id': np.arange(300) + 1_000,
+            'customer_unique_id': np.arange(300),
+        }),
+        'order_payments': pd.DataFrame({
+            'order_id': np.repeat(np.arange(n), 2),
+            'payment_value': np.repeat(orders['payment_value'].to_numpy() / 2, 2),
+        }),
+    }
+    return tables
+
+
+def write(engine, tables):
+    for name, df in tables.items():
+        df.to_sql(name, engine, if_exists='replace', index=False)
+
+
+def test_refresh_counts_orders_delivered_after_watermark(orders, rng, tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "cohorts.db"}')
+    tables = olist_tables(orders, rng)
+    write(engine, tables)
+    matrix = CohortMatrix(lookback_months=3)
+    matrix.refresh(engine)
+
+    # Заказы «в пути» доставлены, один старый заказ из окна отменён
+    status = tables['orders']['order_status'].to_numpy().copy()
+    status[status == 'в пути'] = 'доставлен'
+    status[len(status) - 300] = 'отменён'
+    tables['orders']['order_status'] = status
+    write(engine, tables)
+    matrix.refresh(engine)
+    matrix.refresh(engine)
+
+    rebuilt = CohortMatrix(lookback_months=None)
+    rebuilt.refresh(engine)
+    np.testing.assert_array_equal(matrix.active, rebuilt.active)
+    np.testing.assert_allclose(matrix.revenue, rebuilt.revenue, atol=1e-6)
+    assert matrix.watermark == rebuilt.watermark
+
+    delivered = orders[status == 'доставлен']
+    assert_matches(rebuilt, delivered)
@@ -0,0 +1,67 @@
+# tests/test_dedup.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.dedup import HashIndex, deduplicate, duplicate_mask, row_hashes
+
+
+@pytest.fixture
+def frame(rng):
+    """Таблица с повторами строк, пропусками и значениями разных типов."""
+    n = 5_000
+    df = pd.DataFrame({
+        'order_id': rng.integers(0, 800, n),
+        'big_id': 2**53 + rng.integers(0, 3, n),
+        'price': rng.choice([9.99, 10.0, 15.5, np.nan], n),
+        'status': rng.choice(['доставлен', 'отменён', None], n),
+        'paid': rng.random(n) < 0.5,
+        'created_at': pd.Timestamp('2018-01-01') + pd.to_timedelta(rng.integers(0, 5, n), unit='D'),
+    })
+    return df.astype({'status': 'category'}).sample(frac=1.3, replace=True, random_state=1)
+
+
+@pytest.mark.parametrize('keep', ['first', 'last', False])
+def test_duplicate_mask_matches_pandas(frame, keep):
+    mask = duplicate_mask(row_hashes(frame), keep=keep)
+    np.testing.assert_array_equal(mask, frame.duplicated(keep=keep).to_numpy())
+
+
+def test_key_duplicates_match_pandas(frame):
+    for key in (['order_id'], ['order_id', 'price'], ['big_id', 'created_at']):
+        mask = duplicate_mask(row_hashes(frame, key))
+        np.testing.assert_array_equal(mask, frame.duplicated(subset=key).to_numpy())
+
+
+def test_large_integer_ids_are_not_merged():
+    df = pd.DataFrame({'id': np.array([2**53, 2**53 + 1, 2**63 - 1, 2**63 - 2], dtype=np.int64)})
+    assert not duplicate_mask(row_hashes(df)).any()
+
+
+def test_whole_floats_match_integers():
+    ints = pd.DataFrame({'id': pd.array([1, 2, None], dtype='Int64')})
+    floats = pd.DataFrame({'id': [1.0, 2.0, np.nan]})
+    np.testing.assert_array_equal(row_hashes(ints), row_hashes(floats))
+    assert row_hashes(pd.DataFrame({'id': [1.5]}))[0] != row_hashes(pd.DataFrame({'id': [1]}))[0]
+
+
+def test_deduplicate_matches_drop_duplicates(frame):
+    result, counts = deduplicate(frame, key='order_id')
+    expected = frame.drop_duplicates().drop_duplicates(subset='order_id')
+    pd.testing.assert_frame_equal(result, expected)
+    assert counts['full'] == frame.duplicated().sum()
+    assert counts['full'] + counts['key'] == len(frame) - len(expected)
+
+
+def test_hash_index_matches_single_pass(frame, tmp_path):
+    frame = frame.reset_index(drop=True)
+    first, second = frame.iloc[:3_000], frame.iloc[3_000:]
+    index = HashIndex()
+    deduplicate(first, key='order_id', table='orders', index=index)
+    index.save(tmp_path / 'index.npz')
+
+    # Вторая выгрузка с индексом из файла — как вторая половина одного прохода по всей таблице
+    result, counts = deduplicate(second, key='order_id', table='orders', index=HashIndex(tmp_path / 'index.npz'))
+    expected, _ = deduplicate(frame, key='order_id')
+    pd.testing.assert_frame_equal(result, expected.loc[expected.index >= 3_000])
+    assert counts['seen'] > 0
@@ -0,0 +1,31 @@
+# tests/test_drivers.py
+import numpy as np
+import pandas as pd
+import pytest
+
+go = pytest.importorskip('plotly.graph_objects')
+from plotly.subplots import make_subplots  # noqa: E402
+
+from src.drivers import add_seasonality_traces  # noqa: E402
+
+
+def test_other_categories_keep_dates_and_exact_values(rng):
+    months = pd.date_range('2017-01-01', periods=6, freq='MS')
+    frame = pd.DataFrame({
+        'category_name_translated': np.repeat([f'cat_{i}' for i in range(5)], len(months)),
+        'month': np.tile(months, 5),
+        'category_gmv': rng.uniform(100, 1000, 5 * len(months)),
+    })
+    fig = make_subplots(rows=1, cols=1)
+    add_seasonality_traces(fig, frame, row=1, title='GMV', top_n=2)
+
+    other = fig.data[0]
+    x = np.asarray(other.x)
+    assert np.issubdtype(x.dtype, np.datetime64)
+    gaps = np.isnat(x)
+    assert gaps.sum() == 3 and np.isnan(np.asarray(other.y, dtype=float)[gaps]).all()
+
+    top = set(frame[frame['month'] == months[-1]].nlargest(2, 'category_gmv')['category_name_translated'])
+    expected = frame[~frame['category_name_translated'].isin(top)].sort_values(['category_name_translated', 'month'])
+    np.testing.assert_array_equal(x[~gaps], expected['month'].to_numpy())
+    np.testing.assert_array_equal(np.asarray(other.y, dtype=float)[~gaps], expected['category_gmv'].to_numpy())
@@ -0,0 +1,66 @@
+# tests/test_export.py
+import os
+
+import pytest
+
+pytest.importorskip('tabulate')
+go = pytest.importorskip('plotly.graph_objects')
+
+from src.export import export_figures, figure_hash  # noqa: E402
+
+
+def bar(values):
+    return go.Figure(go.Bar(y=values))
+
+
+def html_name(name, values, include_plotlyjs='cdn'):
+    options = {'format': 'html', 'include_plotlyjs': include_plotlyjs}
+    return f'{name}-{figure_hash(bar(values), options)}.html'
+
+
+def export(figures, out_dir, **kwargs):
+    return export_figures(figures, out_dir=str(out_dir), formats=('html',), verbose=False, **kwargs)
+
+
+def test_unchanged_figure_is_cached(tmp_path):
+    first = export({'gmv': bar([1, 2])}, tmp_path)
+    second = export({'gmv': bar([1, 2])}, tmp_path)
+    assert first['status'].tolist() == ['rendered']
+    assert second['status'].tolist() == ['cached']
+    assert sorted(os.listdir(tmp_path)) == [html_name('gmv', [1, 2])]
+
+
+def test_cleanup_removes_only_previous_versions(tmp_path):
+    export({'gmv': bar([1, 2]), 'gmv-by-state': bar([3]), 'gmv_2': bar([4])}, tmp_path)
+    notes = tmp_path / 'gmv-notes.html'
+    notes.write_text('')
+
+    export({'gmv': bar([5, 6])}, tmp_path)
+    files = sorted(os.listdir(tmp_path))
+    assert html_name('gmv', [5, 6]) in files
+    assert html_name('gmv', [1, 2]) not in files
+    assert html_name('gmv-by-state', [3]) in files
+    assert html_name('gmv_2', [4]) in files
+    assert notes.name in files
+
+
+def test_unknown_format_fails_before_cleanup(tmp_path):
+    export({'gmv': bar([1, 2])}, tmp_path)
+    before = sorted(os.listdir(tmp_path))
+    with pytest.raises(ValueError):
+        export_figures({'gmv': bar([7])}, out_dir=str(tmp_path), formats=('html', 'bmp'), verbose=False)
+    assert sorted(os.listdir(tmp_path)) == before
+
+
+def test_cleanup_disabled_keeps_old_versions(tmp_path):
+    export({'gmv': bar([1])}, tmp_path)
+    export({'gmv': bar([2])}, tmp_path, cleanup=False)
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_render_options_are_part_of_cache_key(tmp_path):
+    export({'gmv': bar([1, 2])}, tmp_path)
+    second = export({'gmv': bar([1, 2])}, tmp_path, include_plotlyjs=True)
+    assert second['status'].tolist() == ['rendered']
+    assert sorted(os.listdir(tmp_path)) == [html_name('gmv', [1, 2], include_plotlyjs=True)]
+    assert figure_hash(bar([1]), {'scale': 1}) != figure_hash(bar([1]), {'scale': 2})
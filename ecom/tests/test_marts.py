@@ -0,0 +1,37 @@
+# tests/test_marts.py
+import numpy as np
+import pytest
+
+pytest.importorskip('tabulate')
+pytest.importorskip('duckdb')
+
+from src.concentration import SELLER_GMV_QUERY  # noqa: E402
+from src.duckdb_backend import DuckDBBackend  # noqa: E402
+from src.synthetic import generate_olist  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def db():
+    with DuckDBBackend(generate_olist(scale=0.02, random_state=3)) as backend:
+        backend.build_marts()
+        yield backend
+
+
+def test_money_columns_are_double(db):
+    assert db.run("SELECT typeof(gmv) FROM mart_customer_orders LIMIT 1", fetch='scalar') == 'DOUBLE'
+    assert db.run("SELECT typeof(revenue) FROM mart_seller_sales LIMIT 1", fetch='scalar') == 'DOUBLE'
+
+
+def test_mart_revenue_matches_items(db):
+    expected = db.run("""
+        SELECT SUM(oi.price) FROM order_items oi JOIN orders o ON oi.order_id = o.order_id
+        WHERE o.order_status = 'доставлен'
+    """, fetch='scalar')
+    assert np.isclose(db.run("SELECT SUM(revenue) FROM mart_seller_sales", fetch='scalar'), expected, rtol=1e-12)
+
+
+def test_seller_gmv_matches_concentration_query(db):
+    mart = db.run("SELECT seller_id, gmv_with_freight FROM mart_seller_sales").set_index('seller_id')
+    query = db.run(SELLER_GMV_QUERY).set_index('seller_id')
+    assert set(mart.index) == set(query.index)
+    np.testing.assert_allclose(mart.loc[query.index, 'gmv_with_freight'], query['gmv_with_freight'], rtol=1e-12)
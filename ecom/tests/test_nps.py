@@ -0,0 +1,84 @@
+# tests/test_nps.py
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from src.nps import NPSAggregator
+
+BY = ('seller_id', 'customer_state')
+END = pd.Timestamp('2018-09-01')
+
+
+@pytest.fixture
+def reviews(rng):
+    """
+    Строки (заказ × товар) с отзывами; отзыв приходит через 0–60 дней после заказа,
+    у части заказов отзыва нет.
+    """
+    n_orders = 3_000
+    order_dates = pd.Timestamp('2017-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 600 * 24, n_orders)), unit='h')
+    orders = pd.DataFrame({
+        'order_id': np.arange(n_orders),
+        'order_purchase_timestamp': order_dates,
+        'review_id': np.where(rng.random(n_orders) < 0.9, np.arange(n_orders) + 10_000, np.nan),
+        'review_score': rng.integers(1, 6, n_orders).astype(float),
+        'review_at': order_dates + pd.to_timedelta(rng.integers(0, 60, n_orders), unit='D'),
+        'customer_state': rng.choice(['SP', 'RJ', 'MG'], n_orders),
+    })
+    items = orders.loc[orders.index.repeat(rng.integers(1, 4, n_orders))].reset_index(drop=True)
+    items['seller_id'] = rng.integers(0, 40, len(items))
+    return items
+
+
+def snapshot(reviews, at):
+    """Выгрузка на момент at: заказы до at, отзывы — только уже пришедшие."""
+    rows = reviews[reviews['order_purchase_timestamp'] <= at].copy()
+    late = rows['review_at'] > at
+    rows.loc[late, ['review_id', 'review_score']] = np.nan
+    return rows.drop(columns='review_at')
+
+
+def full(rows):
+    aggregator = NPSAggregator(by=BY, lookback_months=None)
+    aggregator.update(rows)
+    return aggregator
+
+
+def assert_same(left, right):
+    pd.testing.assert_frame_equal(left.monthly(), right.monthly())
+    for dim in BY:
+        pd.testing.assert_frame_equal(left.breakdown(dim, monthly=True), right.breakdown(dim, monthly=True))
+
+
+def test_incremental_update_matches_full_recompute(reviews):
+    aggregator = NPSAggregator(by=BY, lookback_months=3)
+    for at in pd.date_range('2017-03-01', END, freq='17D').append(pd.DatetimeIndex([END])):
+        aggregator.update(snapshot(reviews, at))
+    assert_same(aggregator, full(snapshot(reviews, END)))
+
+
+def test_repeated_update_does_not_double_count(reviews):
+    rows = snapshot(reviews, END)
+    aggregator = full(rows)
+    aggregator.lookback_months = 2
+    aggregator.update(rows)
+    aggregator.update(rows)
+    assert_same(aggregator, full(rows))
+
+
+def test_refresh_matches_full_recompute(reviews, tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "nps.db"}')
+    query = """
+        SELECT order_id, order_purchase_timestamp, review_id, review_score, customer_state, seller_id
+        FROM reviews
+        WHERE order_purchase_timestamp >= :since
+        ORDER BY order_purchase_timestamp, order_id
+    """
+    aggregator = NPSAggregator(by=BY, lookback_months=3)
+    for at in pd.date_range('2017-06-01', END, freq='45D').append(pd.DatetimeIndex([END])):
+        snapshot(reviews, at).to_sql('reviews', engine, if_exists='replace', index=False)
+        aggregator.refresh(engine, query=query, chunksize=500)
+
+    expected = full(snapshot(reviews, END))
+    pd.testing.assert_frame_equal(aggregator.monthly(), expected.monthly())
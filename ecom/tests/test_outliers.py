@@ -0,0 +1,41 @@
+# tests/test_outliers.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.outliers import detect_outliers, fit_fences, masks_from_batches
+
+
+@pytest.fixture
+def deals(rng):
+    n = 2_003
+    df = pd.DataFrame({
+        'declared_monthly_revenue': rng.lognormal(10, 1.5, n),
+        'declared_product_catalog_size': rng.poisson(50, n).astype(float),
+        'flat': np.ones(n),
+    })
+    df.loc[rng.choice(n, 40, replace=False), 'declared_monthly_revenue'] = np.nan
+    return df
+
+
+def test_masks_match_iqr_rule(deals):
+    masks = detect_outliers(deals)
+    col = deals['declared_monthly_revenue']
+    q1, q3 = col.quantile([0.25, 0.75])
+    expected = (col < q1 - 1.5 * (q3 - q1)) | (col > q3 + 1.5 * (q3 - q1))
+    np.testing.assert_array_equal(masks.mask('declared_monthly_revenue', 'iqr'), expected.to_numpy())
+    assert not masks.mask('flat', 'mad').any()
+
+
+@pytest.mark.parametrize('sizes', [[2_003], [1, 7, 8, 500, 0, 1_487], [3] * 667 + [2]])
+def test_batches_match_single_pass(deals, sizes):
+    fences = fit_fences(deals)
+    bounds = np.cumsum([0] + sizes)
+    batches = [deals.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+    streamed = masks_from_batches(batches, fences)
+    single = detect_outliers(deals, fences=fences)
+    assert streamed.keys == single.keys
+    np.testing.assert_array_equal(streamed.bits, single.bits)
+    assert streamed.index.equals(single.index)
+    pd.testing.assert_frame_equal(streamed.summary(), single.summary())
@@ -0,0 +1,44 @@
+# tests/test_plotly_utils.py
+import numpy as np
+import pandas as pd
+import pytest
+
+go = pytest.importorskip('plotly.graph_objects')
+px = pytest.importorskip('plotly.express')
+
+from src.plotly_utils import lighten_figure, use_webgl  # noqa: E402
+from src.scatter_plotly import scatter_quadrant_plot  # noqa: E402
+
+
+@pytest.fixture
+def points(rng):
+    n = 20_000
+    return pd.DataFrame({
+        'x': rng.normal(0, 1, n),
+        'y': rng.normal(0, 1, n),
+        'category': rng.choice(['a', 'b'], n),
+    })
+
+
+def test_use_webgl_converts_px_scatter(points):
+    fig = px.scatter(points, x='x', y='y', render_mode='svg')
+    result = use_webgl(fig, threshold=1_000)
+    assert isinstance(result.data[0], go.Scattergl)
+    np.testing.assert_array_equal(result.data[0].x, points['x'].to_numpy())
+    assert result.layout.xaxis.title.text == 'x'
+
+
+def test_small_traces_stay_svg(points):
+    fig = px.scatter(points.head(100), x='x', y='y', render_mode='svg')
+    assert isinstance(use_webgl(fig, threshold=1_000).data[0], go.Scatter)
+
+
+def test_lighten_figure_keeps_coordinates(points):
+    fig = go.Figure(go.Scatter(x=points['x'], y=points['y'] * 1.23456789, mode='markers'))
+    result = lighten_figure(fig, webgl_threshold=1_000)
+    np.testing.assert_array_equal(result.data[0].y, points['y'].to_numpy() * 1.23456789)
+
+
+def test_quadrant_plot_above_threshold(points):
+    fig = scatter_quadrant_plot(points, 'x', 'y', webgl_threshold=5_000)
+    assert any(isinstance(trace, go.Scattergl) for trace in fig.data)
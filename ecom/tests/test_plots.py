@@ -0,0 +1,76 @@
+# tests/test_plots.py
+import json
+
+import pandas as pd
+import pytest
+
+go = pytest.importorskip('plotly.graph_objects')
+
+from src.arpu import plot_arpu_aov_dynamics  # noqa: E402
+from src.cohort_plotly import plot_cohort_analysis  # noqa: E402
+from src.cohorts import CohortMatrix  # noqa: E402
+from src.gmv import plot_gmv_dynamics  # noqa: E402
+from src.ltv import cohort_ltv, plot_cohort_ltv_analysis  # noqa: E402
+from src.plot_nps_analysis import plot_nps_analysis  # noqa: E402
+
+PALETTE = ['#636EFA', '#EF553B', '#00CC96', '#AB63FA']
+
+
+def monthly(orders):
+    months = orders.groupby(orders['order_purchase_timestamp'].dt.to_period('M'))
+    frame = pd.DataFrame({
+        'gmv': months['payment_value'].sum(),
+        'arpu': months['payment_value'].sum() / months['customer_unique_id'].nunique(),
+        'aov': months['payment_value'].mean(),
+    })
+    frame.index = frame.index.to_timestamp()
+    frame['gmv_mom_growth'] = frame['gmv'].pct_change().fillna(0) * 100
+    return frame.rename_axis('month').reset_index()
+
+
+def nps_monthly(orders, rng):
+    frame = monthly(orders)[['month']]
+    shares = rng.dirichlet([2, 3, 5], len(frame)) * 100
+    return frame.assign(detractors=shares[:, 0], neutrals=shares[:, 1], promoters=shares[:, 2],
+                        nps_proxy=shares[:, 2] - shares[:, 0], response_rate=rng.uniform(60, 90, len(frame)))
+
+
+@pytest.fixture
+def builders(orders, rng):
+    matrix = CohortMatrix()
+    matrix.update(orders)
+    return {
+        'gmv': lambda **kw: plot_gmv_dynamics(monthly(orders), PALETTE, **kw),
+        'arpu': lambda **kw: plot_arpu_aov_dynamics(monthly(orders), PALETTE, **kw),
+        'ltv': lambda **kw: plot_cohort_ltv_analysis(cohort_ltv(orders), PALETTE, **kw),
+        'nps': lambda **kw: plot_nps_analysis(nps_monthly(orders, rng), **kw),
+        'cohort': lambda **kw: plot_cohort_analysis(matrix, **kw),
+    }
+
+
+@pytest.fixture
+def shown(monkeypatch):
+    calls = []
+    monkeypatch.setattr(go.Figure, 'show', lambda fig, *args, **kwargs: calls.append(fig))
+    return calls
+
+
+@pytest.mark.parametrize('name', ['gmv', 'arpu', 'ltv', 'nps', 'cohort'])
+def test_figure_is_returned_without_show(builders, shown, name):
+    fig = builders[name]()
+    assert isinstance(fig, go.Figure)
+    assert len(fig.data) > 0
+    assert shown == []
+
+
+@pytest.mark.parametrize('name', ['gmv', 'arpu', 'ltv', 'nps', 'cohort'])
+def test_as_json_returns_figure_json(builders, shown, name):
+    fig, payload = builders[name](as_json=True)
+    assert isinstance(fig, go.Figure)
+    assert len(json.loads(payload)['data']) == len(fig.data)
+    assert shown == []
+
+
+def test_show_calls_figure_show(builders, shown):
+    fig = builders['gmv'](show=True)
+    assert shown == [fig]
@@ -0,0 +1,46 @@
+# tests/test_polars_pipeline.py
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('tabulate')
+pytest.importorskip('polars')
+
+from src.data_loader import load_and_inspect  # noqa: E402
+from src.optimize_data_types import optimize_data_type  # noqa: E402
+from src.polars_pipeline import lazy_load_and_optimize  # noqa: E402
+from src.synthetic import generate_olist, write_tables  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def loaded(tmp_path_factory):
+    tables = generate_olist(scale=0.02, random_state=1)
+    # «date» в имени, но не дата: должна остаться строкой в обоих путях
+    tables['orders']['update_mode'] = 'auto'
+    tables['orders'].loc[::3, 'update_mode'] = 'manual'
+    folder = str(tmp_path_factory.mktemp('olist'))
+    write_tables(tables, folder)
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, reports = optimize_data_type(load_and_inspect(folder, verbose=False))
+        lazy = lazy_load_and_optimize(folder, verbose=False)
+    return {name: report['dataframe'] for name, report in reports.items()}, lazy
+
+
+def test_dates_match_pandas_path(loaded):
+    eager, lazy = loaded
+    assert set(eager) == set(lazy)
+    for name, df in eager.items():
+        dates = [col for col in df.columns if pd.api.types.is_datetime64_any_dtype(df[col])]
+        assert dates == [col for col in lazy[name].columns
+                         if pd.api.types.is_datetime64_any_dtype(lazy[name][col])], name
+        for col in dates:
+            pd.testing.assert_series_equal(lazy[name][col].reset_index(drop=True),
+                                           df[col].reset_index(drop=True), check_names=False)
+
+
+def test_non_date_column_with_marker_is_kept(loaded):
+    eager, lazy = loaded
+    assert lazy['orders']['update_mode'].isna().sum() == 0
+    assert lazy['orders']['update_mode'].astype(str).tolist() == eager['orders']['update_mode'].astype(str).tolist()
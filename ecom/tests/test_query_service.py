@@ -0,0 +1,58 @@
+# tests/test_query_service.py
+import io
+import os
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from src.query_service import QueryService, _column, _copy_read_options, run_query
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "shop.db"}')
+    pd.DataFrame({'order_id': [1, 2, 3], 'status': ['a', 'b', None], 'value': [1.5, None, 3.0]}) \
+        .to_sql('orders', engine, index=False)
+    return engine
+
+
+def test_frame_is_built_column_wise(engine):
+    frame = run_query(engine, 'SELECT order_id, status, value, order_id AS order_id FROM orders ORDER BY order_id')
+    assert list(frame.columns) == ['order_id', 'status', 'value', 'order_id']
+    assert frame.iloc[:, 0].tolist() == [1, 2, 3]
+    assert frame['status'].tolist()[:2] == ['a', 'b']
+    assert np.isnan(frame['value'].iloc[1])
+
+
+def test_empty_result_keeps_columns(engine):
+    frame = run_query(engine, 'SELECT order_id, status FROM orders WHERE order_id > 10')
+    assert frame.empty
+    assert list(frame.columns) == ['order_id', 'status']
+
+
+def test_decimal_column_becomes_float():
+    assert _column((Decimal('1.5'), None, Decimal('2'))).dtype == np.float64
+    assert _column(('a', 'b')) == ('a', 'b')
+
+
+def test_copy_read_options_follow_description():
+    description = [('order_id', 20), ('zip', 1043), ('paid', 16), ('created', 1114), ('total', 1700)]
+    csv = 'order_id,zip,paid,created,total\n1,00123,t,2018-01-02 10:00:00,9.5\n,,f,,\n'
+    frame = pd.read_csv(io.StringIO(csv), **_copy_read_options(description))
+    assert str(frame['order_id'].dtype) == 'Int64'
+    assert frame['zip'].iloc[0] == '00123'
+    assert frame['paid'].tolist() == [True, False]
+    assert frame['created'].iloc[0] == pd.Timestamp('2018-01-02 10:00:00')
+    assert frame['total'].dtype == np.float64
+
+
+def test_cache_write_leaves_no_temporary_files(engine, tmp_path):
+    service = QueryService(engine, cache_dir=str(tmp_path / 'cache'))
+    first = service.run('SELECT * FROM orders', tables=[])
+    second = service.run('SELECT * FROM orders', tables=[])
+    pd.testing.assert_frame_equal(first, second)
+    assert (service.hits, service.misses) == (1, 1)
+    assert [name for name in os.listdir(service.cache_dir) if not name.endswith('.pkl')] == []
@@ -0,0 +1,77 @@
+# tests/test_rfm.py
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from src.rfm import RFMAccumulator, merge_rfm, rfm_aggregate, score_rfm
+
+
+def normalized(rfm):
+    rfm = rfm.assign(last_purchase=pd.to_datetime(rfm['last_purchase']),
+                     frequency=rfm['frequency'].astype(np.int64),
+                     monetary=rfm['monetary'].astype(float))
+    return rfm.sort_values('customer_unique_id').reset_index(drop=True)
+
+
+def test_merge_of_parts_equals_single_aggregate(orders):
+    parts = [rfm_aggregate(orders.iloc[start:start + 300]) for start in range(0, len(orders), 300)]
+    pd.testing.assert_frame_equal(normalized(merge_rfm(*parts)), normalized(rfm_aggregate(orders)))
+
+
+def test_score_rfm_handles_empty_input():
+    scored = score_rfm(rfm_aggregate(pd.DataFrame({'customer_unique_id': [], 'order_purchase_timestamp': [],
+                                                   'payment_value': []})))
+    assert scored.empty
+    assert 'segment' in scored.columns
+
+
+def test_missing_lookup_tables_raise(orders):
+    with pytest.raises(ValueError):
+        rfm_aggregate(orders.drop(columns='customer_unique_id').assign(customer_id=1))
+    with pytest.raises(ValueError):
+        rfm_aggregate(orders.drop(columns='payment_value').assign(order_id=1))
+
+
+def write_olist(engine, orders, status):
+    n = len(orders)
+    pd.DataFrame({
+        'order_id': np.arange(n),
+        'customer_id': orders['customer_unique_id'].to_numpy() + 1_000,
+        'order_purchase_timestamp': orders['order_purchase_timestamp'].to_numpy(),
+        'order_status': status,
+    }).to_sql('orders', engine, if_exists='replace', index=False)
+    pd.DataFrame({'customer_id': np.arange(300) + 1_000, 'customer_unique_id': np.arange(300)}) \
+        .to_sql('customers', engine, if_exists='replace', index=False)
+    pd.DataFrame({'order_id': np.repeat(np.arange(n), 2),
+                  'payment_value': np.repeat(orders['payment_value'].to_numpy() / 2, 2)}) \
+        .to_sql('order_payments', engine, if_exists='replace', index=False)
+
+
+def test_refresh_counts_orders_delivered_after_watermark(orders, tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "rfm.db"}')
+    n = len(orders)
+    status = np.where(np.arange(n) < n - 150, 'доставлен', 'в пути')
+    write_olist(engine, orders, status)
+    accumulator = RFMAccumulator(lookback_months=3)
+    accumulator.refresh(engine, chunksize=400)
+
+    # Заказы «в пути» доставлены (их покупка раньше watermark), один заказ окна отменён
+    status[status == 'в пути'] = 'доставлен'
+    status[n - 300] = 'отменён'
+    write_olist(engine, orders, status)
+    accumulator.refresh(engine, chunksize=400)
+    accumulator.refresh(engine, chunksize=400)
+
+    expected = rfm_aggregate(orders[status == 'доставлен'])
+    pd.testing.assert_frame_equal(normalized(accumulator.rfm), normalized(expected), check_exact=False)
+    assert accumulator.settled_until is not None
+
+
+def test_update_matches_full_aggregate(orders):
+    accumulator = RFMAccumulator(lookback_months=2)
+    dates = orders['order_purchase_timestamp']
+    for at in pd.date_range('2017-03-01', dates.max(), freq='30D').append(pd.DatetimeIndex([dates.max()])):
+        accumulator.update(orders[dates <= at])
+    pd.testing.assert_frame_equal(normalized(accumulator.rfm), normalized(rfm_aggregate(orders)),
+                                  check_exact=False)
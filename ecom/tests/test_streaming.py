@@ -0,0 +1,25 @@
+# tests/test_streaming.py
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+from src.streaming import _decimals_to_float, quote_identifier, stream_table
+
+
+def test_stream_table_quotes_identifiers(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "shop.db"}')
+    frame = pd.DataFrame({'order': np.arange(7), 'Total "gross"': np.arange(7) * 1.5, 'note': list('abcdefg')})
+    frame.to_sql('select', engine, index=False)
+
+    batches = list(stream_table(engine, 'select', columns=['order', 'Total "gross"'], itersize=3))
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    pd.testing.assert_frame_equal(pd.concat(batches, ignore_index=True), frame[['order', 'Total "gross"']])
+    assert quote_identifier(engine, 'Total "gross"') == '"Total ""gross"""'
+
+
+def test_decimals_become_float():
+    frame = _decimals_to_float(pd.DataFrame({'value': [Decimal('1.25'), None], 'name': ['a', 'b']}))
+    assert frame['value'].dtype == np.float64
+    assert frame['name'].tolist() == ['a', 'b']